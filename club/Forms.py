@@ -1,7 +1,7 @@
 from django import forms
 from django.utils import timezone
 
-from .models import Event
+from .models import Event, EventSeries
 
 
 class EventForm(forms.ModelForm):
@@ -56,3 +56,80 @@ class EventForm(forms.ModelForm):
             self.add_error("price_non_member", "Non-member price cannot be negative.")
 
         return cleaned_data
+
+
+class EventSeriesForm(forms.ModelForm):
+    class Meta:
+        model = EventSeries
+        fields = [
+            "title",
+            "description",
+            "location",
+            "event_type",
+            "distance_km",
+            "target_reps",
+            "capacity",
+            "price_non_member",
+            "price_member",
+            "start_time",
+            "end_time",
+            "frequency",
+            "interval",
+            "weekdays",
+            "starts_on",
+            "ends_on",
+            "is_active",
+        ]
+        widgets = {
+            "starts_on": forms.DateInput(attrs={"type": "date"}),
+            "ends_on": forms.DateInput(attrs={"type": "date"}),
+            "start_time": forms.TimeInput(attrs={"type": "time"}),
+            "end_time": forms.TimeInput(attrs={"type": "time"}),
+            "description": forms.Textarea(attrs={"rows": 4}),
+        }
+
+    def clean_weekdays(self):
+        weekdays = self.cleaned_data.get("weekdays", "").replace(" ", "")
+        if weekdays:
+            parts = weekdays.split(",")
+            if not all(part.isdigit() and 0 <= int(part) <= 6 for part in parts):
+                raise forms.ValidationError("Use weekday numbers 0 (Monday) to 6 (Sunday), e.g. 1,3.")
+        return weekdays
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get("start_time")
+        end_time = cleaned_data.get("end_time")
+        starts_on = cleaned_data.get("starts_on")
+        ends_on = cleaned_data.get("ends_on")
+        capacity = cleaned_data.get("capacity")
+        interval = cleaned_data.get("interval")
+
+        if start_time and end_time and end_time <= start_time:
+            self.add_error("end_time", "End time must be later than start time.")
+
+        if starts_on and ends_on and ends_on < starts_on:
+            self.add_error("ends_on", "The series cannot end before it starts.")
+
+        if capacity is not None and capacity < 1:
+            self.add_error("capacity", "Capacity must be at least 1.")
+
+        if interval is not None and interval < 1:
+            self.add_error("interval", "Interval must be at least 1.")
+
+        return cleaned_data
+
+
+class MembershipImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label="CSV file",
+        help_text=(
+            "Columns: user (username or email), plan (id or name), start_date, "
+            "and optionally end_date, status and auto_renew."
+        ),
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        help_text="Only validate the file and report errors.",
+    )
@@ -1,12 +1,25 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.db import connection, transaction
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import MembershipImportForm
+from .membership_import import import_memberships
 from .models import (
     TrainerProfile,
     ClientProfile,
+    BodyMetric,
     MembershipPlan,
     Membership,
+    DailyMetrics,
     Event,
     EventRegistration,
+    EventSeries,
 )
+from .search import match_expression
 
 
 @admin.register(MembershipPlan)
@@ -19,20 +32,139 @@ class MembershipPlanAdmin(admin.ModelAdmin):
 class MembershipAdmin(admin.ModelAdmin):
     list_display = ('user', 'plan', 'start_date', 'end_date', 'status')
     list_filter = ('plan', 'status')
+    change_list_template = 'admin/club/membership/change_list.html'
+
+    # per-row errors listed on the upload page; the rest are only counted
+    IMPORT_ERRORS_SHOWN = 200
+
+    def get_urls(self):
+        urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name='club_membership_import',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:club_membership_changelist')
+
+        report = None
+        form = MembershipImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['csv_file']
+            dry_run = form.cleaned_data['dry_run']
+            # stream the upload instead of reading it into memory
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                report = import_memberships(stream, dry_run=dry_run)
+            except (ValueError, UnicodeDecodeError) as e:
+                form.add_error('csv_file', str(e))
+            else:
+                verb = 'Would import' if dry_run else 'Imported'
+                level = messages.WARNING if report.errors else messages.SUCCESS
+                self.message_user(
+                    request,
+                    f"{verb} {report.imported} of {report.rows} memberships, "
+                    f"{len(report.errors)} rows with errors.",
+                    level,
+                )
+                if not dry_run and not report.errors:
+                    return redirect('admin:club_membership_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import memberships',
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+            'errors_shown': report.errors[:self.IMPORT_ERRORS_SHOWN] if report else [],
+        }
+        return TemplateResponse(request, 'admin/club/membership/import.html', context)
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'event_type', 'date', 'start_time', 'location', 'price_member', 'price_non_member', 'capacity', 'is_cancelled')
+    list_display = ('title', 'event_type', 'date', 'start_time', 'location', 'price_member', 'price_non_member', 'capacity', 'booked_count', 'is_cancelled')
     list_filter = ('event_type', 'date', 'is_cancelled')
     search_fields = ('title', 'location')
+    readonly_fields = ('booked_count',)
+    actions = ['recount_booked_seats']
+
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index instead of icontains scans over search_fields
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
+
+    def get_ordering(self, request):
+        # best matches first, unless a column header was clicked
+        if 'o' not in request.GET:
+            expressions = match_expression(connection, request.GET.get('q', ''))
+            if expressions is not None:
+                return [expressions[1].desc()]
+        return super().get_ordering(request)
+
+    @admin.action(description="Recount booked seats")
+    def recount_booked_seats(self, request, queryset):
+        updated = queryset.recount_booked()
+        self.message_user(request, f"Recounted booked seats for {updated} event(s).")
+
+
+@admin.register(EventSeries)
+class EventSeriesAdmin(admin.ModelAdmin):
+    list_display = ('title', 'trainer', 'frequency', 'interval', 'weekdays', 'start_time', 'starts_on', 'ends_on', 'is_active')
+    list_filter = ('frequency', 'is_active', 'event_type')
+    search_fields = ('title', 'location')
 
 
 @admin.register(EventRegistration)
 class EventRegistrationAdmin(admin.ModelAdmin):
     list_display = ('user', 'event', 'status', 'booked_at')
     list_filter = ('event', 'status')
+    actions = ['mark_booked', 'mark_cancelled']
+
+    def _set_status(self, request, queryset, status):
+        # bulk update bypasses signals, so recount the affected events afterwards
+        with transaction.atomic():
+            event_ids = set(queryset.values_list('event_id', flat=True))
+            updated = queryset.update(status=status)
+            Event.objects.filter(pk__in=event_ids).recount_booked()
+        self.message_user(request, f"Marked {updated} registration(s) as {status}.")
+
+    @admin.action(description="Mark selected registrations as booked")
+    def mark_booked(self, request, queryset):
+        self._set_status(request, queryset, 'booked')
+
+    @admin.action(description="Mark selected registrations as cancelled")
+    def mark_cancelled(self, request, queryset):
+        self._set_status(request, queryset, 'cancelled')
 
 
 admin.site.register(TrainerProfile)
 admin.site.register(ClientProfile)
+
+
+@admin.register(BodyMetric)
+class BodyMetricAdmin(admin.ModelAdmin):
+    list_display = ('client', 'date', 'weight_kg', 'height_cm')
+    list_select_related = ('client__user',)
+    search_fields = ('client__user__username',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('client',)
+
+
+@admin.register(DailyMetrics)
+class DailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'trainer', 'active_memberships', 'new_signups', 'registrations', 'attendance', 'revenue_cents')
+    list_filter = ('trainer',)
+    date_hierarchy = 'date'
+
+    # rows are rebuilt by the rollup_metrics command
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,74 @@
+"""
+Attendance check-in for event rosters.
+
+The roster is read as compact rows in one query. A check-in batch, whether
+a list of arrivals or a full attended/absent diff, is applied with a single
+UPDATE ... WHERE user_id IN (...) whose CASE sets each row's new value.
+"""
+from django.db.models import Case, Value, When
+
+from .models import EventRegistration
+
+ROSTER_FIELDS = ("user_id", "username", "first_name", "last_name", "attended")
+
+# Largest check-in batch accepted in one request
+MAX_CHECK_IN_BATCH = 1000
+
+
+class CheckInError(ValueError):
+    """A malformed check-in batch."""
+
+
+def roster(event_id):
+    """Booked registrations of the event as ROSTER_FIELDS rows, by name."""
+    return [
+        list(row)
+        for row in EventRegistration.objects
+        .filter(event_id=event_id, status="booked")
+        .order_by("user__first_name", "user__last_name", "user__username")
+        .values_list(
+            "user_id", "user__username", "user__first_name", "user__last_name", "attended"
+        )
+    ]
+
+
+def _user_ids(values, name):
+    if not isinstance(values, list) or not all(
+        isinstance(value, int) and not isinstance(value, bool) for value in values
+    ):
+        raise CheckInError(f"{name} must be a list of user ids.")
+    return set(values)
+
+
+def parse_check_in(data):
+    """
+    (attended, absent) user id sets from a check-in request body: either
+    {"user_ids": [...]} to mark arrivals, or {"attended": [...], "absent": [...]}.
+    Raises CheckInError for a malformed batch.
+    """
+    if not isinstance(data, dict):
+        raise CheckInError("Expected a JSON object.")
+    attended = _user_ids(data.get("attended", []), "attended")
+    attended |= _user_ids(data.get("user_ids", []), "user_ids")
+    absent = _user_ids(data.get("absent", []), "absent")
+    if attended & absent:
+        raise CheckInError("A user cannot be both attended and absent.")
+    if not attended and not absent:
+        raise CheckInError("Nothing to check in.")
+    if len(attended) + len(absent) > MAX_CHECK_IN_BATCH:
+        raise CheckInError(f"At most {MAX_CHECK_IN_BATCH} users per request.")
+    return attended, absent
+
+
+def check_in(event_id, attended, absent):
+    """
+    Mark the booked registrations of attended users as attended and those of
+    absent users as not, in one UPDATE. Users without a booking on the event
+    are ignored. Returns the number of registrations updated.
+    """
+    return (EventRegistration.objects
+            .filter(event_id=event_id, status="booked", user_id__in=attended | absent)
+            .update(attended=Case(
+                When(user_id__in=attended, then=Value(True)),
+                default=Value(False),
+            )))
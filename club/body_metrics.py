@@ -0,0 +1,226 @@
+"""
+Body-metric history of clients and its progress series.
+
+A client has at most one BodyMetric row per day, so a history is bounded by
+the days it spans, and a range is read with one query over the (client, date)
+index. Series longer than the requested number of points are downsampled on
+the server with Largest-Triangle-Three-Buckets, which keeps the shape of the
+curve (peaks and dips included) where plain averaging would flatten it.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .exercise_recommendations import (
+    MAX_BATCH_RECOMMENDATIONS,
+    PLAN_QUERY_RANGES,
+    BatchError,
+    calculate_bmi,
+)
+from .models import BodyMetric, ClientProfile
+
+# Days covered by each progress range; None is the whole history
+PROGRESS_RANGES = {"1m": 30, "3m": 91, "1y": 365, "all": None}
+DEFAULT_PROGRESS_RANGE = "3m"
+DEFAULT_PROGRESS_POINTS = 300
+MAX_PROGRESS_POINTS = 1000
+
+
+class MetricError(ValueError):
+    """A malformed body-metric entry."""
+
+
+def _measurement(data, field):
+    low, high, _ = PLAN_QUERY_RANGES[field]
+    value = data.get(field)
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise InvalidOperation
+        value = Decimal(str(value))
+        if not value.is_finite():
+            raise InvalidOperation
+        value = value.quantize(Decimal("0.1"))
+    except InvalidOperation:
+        raise MetricError(f"{field} must be a number.")
+    if not low <= value <= high:
+        raise MetricError(f"{field} must be between {low} and {high}.")
+    return value
+
+
+def parse_metric(data):
+    """
+    (weight_kg, height_cm, day) from a log request body {"weight_kg",
+    "height_cm"?, "date"?}; height and day are None when not given.
+    Raises MetricError for a malformed entry.
+    """
+    if not isinstance(data, dict):
+        raise MetricError("Expected a JSON object.")
+    weight_kg = _measurement(data, "weight_kg")
+    height_cm = _measurement(data, "height_cm") if data.get("height_cm") is not None else None
+    day = data.get("date")
+    if day is not None:
+        try:
+            day = date.fromisoformat(day)
+        except (TypeError, ValueError):
+            raise MetricError("date must be YYYY-MM-DD.")
+        if day > timezone.localdate():
+            raise MetricError("date cannot be in the future.")
+    return weight_kg, height_cm, day
+
+
+def latest_metric(client):
+    """The client's most recent BodyMetric, or None."""
+    return client.body_metrics.order_by("-date").first()
+
+
+def with_latest_metric(clients):
+    """
+    clients (a ClientProfile queryset) that have logged a measurement,
+    annotated with the weight_kg and height_cm of each one's latest BodyMetric,
+    read in the same query.
+    """
+    latest = BodyMetric.objects.filter(client=OuterRef("pk")).order_by("-date")
+    return (clients
+            .annotate(
+                weight_kg=Subquery(latest.values("weight_kg")[:1]),
+                height_cm=Subquery(latest.values("height_cm")[:1]),
+            )
+            .filter(weight_kg__isnull=False))
+
+
+def parse_client_batch(trainer, data):
+    """
+    (clients, weights, heights, goals, levels) columns of a batch request for
+    the trainer's own clients, {"clients": "mine" or [client id, ...], "goal"?},
+    taken from each client's latest measurements and level in one query.
+    Clients without measurements are left out. Raises BatchError for a
+    malformed request.
+    """
+    selection = data.get("clients")
+    # staff without a trainer profile have no clients of their own
+    clients = ClientProfile.objects.filter(primary_trainer=trainer)
+    if trainer is None:
+        clients = clients.none()
+    if isinstance(selection, list):
+        if not selection or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in selection
+        ):
+            raise BatchError('clients must be "mine" or a non-empty list of client ids.')
+        if len(selection) > MAX_BATCH_RECOMMENDATIONS:
+            raise BatchError(f"At most {MAX_BATCH_RECOMMENDATIONS} clients per request.")
+        clients = clients.filter(pk__in=selection)
+    elif selection != "mine":
+        raise BatchError('clients must be "mine" or a non-empty list of client ids.')
+
+    rows = list(
+        with_latest_metric(clients)
+        .order_by("pk")
+        .values_list("pk", "weight_kg", "height_cm", "level")[:MAX_BATCH_RECOMMENDATIONS]
+    )
+    goal = data.get("goal")
+    return (
+        [pk for pk, _, _, _ in rows],
+        [float(weight_kg) for _, weight_kg, _, _ in rows],
+        [float(height_cm) for _, _, height_cm, _ in rows],
+        [goal] * len(rows),
+        [level for _, _, _, level in rows],
+    )
+
+
+def log_metric(client, weight_kg, height_cm=None, day=None):
+    """
+    Record the client's measurements for day (default today), replacing any
+    already logged that day. Without a height, the latest logged one is kept.
+    Raises MetricError if there is no height to keep.
+    """
+    day = day or timezone.localdate()
+    if height_cm is None:
+        previous = client.body_metrics.filter(date__lte=day).order_by("-date").first()
+        previous = previous or latest_metric(client)
+        if previous is None:
+            raise MetricError("height_cm is required for the first entry.")
+        height_cm = previous.height_cm
+    metric, _ = BodyMetric.objects.update_or_create(
+        client=client, date=day, defaults={"weight_kg": weight_kg, "height_cm": height_cm}
+    )
+    return metric
+
+
+def lttb(xs, ys, threshold):
+    """
+    Indexes of the points of (xs, ys) that Largest-Triangle-Three-Buckets
+    keeps to draw the series with threshold (at least 3) points. xs must be
+    increasing. The first and last points are always kept.
+    """
+    count = len(xs)
+    threshold = max(threshold, 3)
+    if threshold >= count:
+        return list(range(count))
+
+    kept = [0]
+    bucket = (count - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        # the next bucket's average is the third corner of the triangle
+        next_start, next_end = end, min(int((i + 2) * bucket) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        px, py = xs[previous], ys[previous]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((px - avg_x) * (ys[j] - py) - (px - xs[j]) * (avg_y - py))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        previous = best
+    kept.append(count - 1)
+    return kept
+
+
+def _row(day, weight_kg, height_cm):
+    weight_kg, height_cm = float(weight_kg), float(height_cm)
+    return {
+        "date": day,
+        "weight_kg": weight_kg,
+        "height_cm": height_cm,
+        "bmi": calculate_bmi(weight_kg, height_cm),
+    }
+
+
+def progress(client, range_name=DEFAULT_PROGRESS_RANGE, points=DEFAULT_PROGRESS_POINTS):
+    """
+    The client's measurements over range_name (a PROGRESS_RANGES key),
+    downsampled to at most points rows, oldest first, with the latest
+    measurement and how many days were logged in the range.
+    """
+    days = PROGRESS_RANGES[range_name]
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1) if days else None
+
+    rows = client.body_metrics.order_by("date")
+    if start:
+        rows = rows.filter(date__gte=start)
+    rows = list(rows.values_list("date", "weight_kg", "height_cm"))
+
+    xs = [day.toordinal() for day, _, _ in rows]
+    ys = [float(weight_kg) for _, weight_kg, _ in rows]
+    series = [_row(*rows[index]) for index in lttb(xs, ys, points)]
+
+    # the range runs to today, so only an empty one needs another query
+    latest = rows[-1] if rows else None
+    if latest is None and start:
+        metric = latest_metric(client)
+        latest = metric and (metric.date, metric.weight_kg, metric.height_cm)
+    return {
+        "range": range_name,
+        "start": start or (rows[0][0] if rows else None),
+        "end": today,
+        "count": len(rows),
+        "latest": _row(*latest) if latest else None,
+        "series": series,
+    }
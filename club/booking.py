@@ -0,0 +1,76 @@
+"""
+Booking engine for events.
+Reserves seats with a conditional atomic UPDATE so concurrent requests
+can never take an event past its capacity.
+"""
+from enum import Enum
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .feed_cache import invalidate_trainer_feed
+from .models import Event, EventRegistration
+
+
+class BookingResult(Enum):
+    """Outcome of a booking attempt."""
+    BOOKED = "booked"
+    FULL = "full"
+    PAST = "past"
+    CANCELLED = "cancelled"
+    ALREADY_BOOKED = "already_booked"
+
+
+def book_event(user, event_id):
+    """
+    Book a seat on an event for user.
+
+    The seat is reserved by a single UPDATE that only matches while the
+    event is not cancelled and booked_count < capacity, so the database serialises competing bookings.
+    The registration row is written in the same transaction; if the user
+    already holds a booking the transaction rolls back and the seat is freed.
+
+    Raises Event.DoesNotExist if there is no event with event_id.
+    """
+    today = timezone.now().date()
+
+    try:
+        with transaction.atomic():
+            reserved = (Event.objects
+                        .filter(pk=event_id, date__gte=today, is_cancelled=False,
+                                booked_count__lt=F("capacity"))
+                        .update(booked_count=F("booked_count") + 1, updated_at=timezone.now()))
+            if reserved:
+                # queryset.update() and bulk_create() skip the counter signals,
+                # because the seat has already been counted above
+                rebooked = (EventRegistration.objects
+                            .filter(user=user, event_id=event_id, status="cancelled")
+                            .update(status="booked"))
+                if not rebooked:
+                    EventRegistration.objects.bulk_create([
+                        EventRegistration(user=user, event_id=event_id, status="booked"),
+                    ])
+                trainer_id = (Event.objects
+                              .filter(pk=event_id)
+                              .values_list("trainer_id", flat=True)
+                              .first())
+                transaction.on_commit(lambda: invalidate_trainer_feed(trainer_id))
+                return BookingResult.BOOKED
+    except IntegrityError:
+        # unique (user, event) hit: the user already has a booked registration
+        return BookingResult.ALREADY_BOOKED
+
+    return _explain_rejection(user, event_id, today)
+
+
+def _explain_rejection(user, event_id, today):
+    """Work out why the seat reservation matched no rows."""
+    event = Event.objects.only("date", "is_cancelled").get(pk=event_id)
+    if event.is_cancelled:
+        return BookingResult.CANCELLED
+    if EventRegistration.objects.filter(user=user, event_id=event_id, status="booked").exists():
+        return BookingResult.ALREADY_BOOKED
+    if event.date < today:
+        return BookingResult.PAST
+    return BookingResult.FULL
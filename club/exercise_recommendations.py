@@ -1,7 +1,323 @@
 """
 Exercise recommendation engine based on BMI and fitness level.
 Generates personalized workout plans based on user metrics.
+
+The plans live in a versioned JSON catalog (settings.EXERCISE_PLAN_CATALOG),
+keyed by BMI band, goal and client level. A plan entry applies to every goal
+and level unless it lists the ones it is for; the most specific entry wins.
+The catalog is validated and compiled into a lookup index of every
+(category, goal, level) combination, with each plan read-only and its JSON
+pre-encoded, so a request does no parsing. The file is reloaded when its
+mtime changes; a catalog that fails validation on reload is logged and the
+previous one is kept.
+
+Batches of clients have their BMIs and bands computed in one NumPy pass when
+NumPy is installed (it is optional) and in pure Python otherwise.
 """
+import hashlib
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+from types import MappingProxyType
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # BMIs are then computed in pure Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FORMAT = 1
+DEFAULT_CATALOG = Path(__file__).resolve().parent / "data" / "exercise_plans.json"
+
+PLAN_FIELDS = ("category", "focus", "weekly_plan", "nutrition_focus", "weekly_frequency")
+OPTIONAL_PLAN_FIELDS = ("important_notes",)
+DAY_FIELDS = ("day", "focus", "exercises")
+EXERCISE_FIELDS = ("name", "sets", "reps", "duration")
+# keys of a plan entry that select where it applies, not part of the plan
+SELECTORS = ("goals", "levels")
+
+# Most records accepted by one batch recommendation request
+MAX_BATCH_RECOMMENDATIONS = 10000
+
+# Query parameters of a cacheable plan lookup: accepted range and bucket size.
+# Bucketing keeps the number of distinct URLs (and cache entries) bounded.
+PLAN_QUERY_RANGES = {
+    "weight_kg": (20, 300, 0.5),
+    "height_cm": (100, 250, 1),
+}
+PLAN_CACHE_SIZE = getattr(settings, "EXERCISE_PLAN_CACHE_SIZE", 4096)
+
+
+class CatalogError(ValueError):
+    """A malformed exercise plan catalog."""
+
+
+class BatchError(ValueError):
+    """A malformed batch of recommendation records."""
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """A compiled exercise plan catalog."""
+    path: str
+    mtime_ns: int
+    version: str
+    bounds: tuple
+    categories: tuple
+    goals: tuple
+    levels: tuple
+    default_goal: str
+    default_level: str
+    disclaimer: str
+    plans: MappingProxyType
+    encoded: MappingProxyType
+    refs: MappingProxyType
+    plan_json: MappingProxyType
+
+    def category(self, bmi):
+        """BMI category of bmi."""
+        return self.categories[bisect_right(self.bounds, bmi)]
+
+    def goal(self, goal):
+        """goal if the catalog knows it, else the default goal."""
+        return goal if goal in self.goals else self.default_goal
+
+    def level(self, level):
+        """level if the catalog knows it, else the default level."""
+        return level if level in self.levels else self.default_level
+
+    def key(self, bmi, goal=None, level=None):
+        """Index key of bmi, goal and level; unknown goals and levels get the defaults."""
+        return self.category(bmi), self.goal(goal), self.level(level)
+
+
+def _require(condition, message):
+    if not condition:
+        raise CatalogError(message)
+
+
+def _names(data, field):
+    values = data.get(field)
+    _require(
+        isinstance(values, list) and values and all(isinstance(v, str) and v for v in values),
+        f"{field} must be a non-empty list of names.",
+    )
+    _require(len(set(values)) == len(values), f"{field} has duplicates.")
+    return tuple(values)
+
+
+def _text(value, where):
+    _require(isinstance(value, str) and value.strip(), f"{where} must be non-empty text.")
+
+
+def _fields(data, required, optional, where):
+    _require(isinstance(data, dict), f"{where} must be an object.")
+    missing = [field for field in required if field not in data]
+    unknown = [field for field in data if field not in required + optional]
+    _require(not missing, f"{where} is missing {', '.join(missing)}.")
+    _require(not unknown, f"{where} has unknown field {', '.join(unknown)}.")
+
+
+def _validate_plan(plan, where, catalog):
+    _fields(plan, PLAN_FIELDS, OPTIONAL_PLAN_FIELDS + SELECTORS, where)
+    _require(plan["category"] in catalog["categories"], f"{where}.category is not a band.")
+    for field in ("focus", "nutrition_focus", "weekly_frequency"):
+        _text(plan[field], f"{where}.{field}")
+    for selector, known in (("goals", catalog["goals"]), ("levels", catalog["levels"])):
+        if selector in plan:
+            values = _names(plan, selector)
+            _require(set(values) <= set(known), f"{where}.{selector} has unknown names.")
+    notes = plan.get("important_notes", [])
+    _require(isinstance(notes, list), f"{where}.important_notes must be a list.")
+    for n, note in enumerate(notes):
+        _text(note, f"{where}.important_notes[{n}]")
+
+    days = plan["weekly_plan"]
+    _require(isinstance(days, list) and days, f"{where}.weekly_plan must be a non-empty list.")
+    for d, day in enumerate(days):
+        day_where = f"{where}.weekly_plan[{d}]"
+        _fields(day, DAY_FIELDS, (), day_where)
+        _text(day["day"], f"{day_where}.day")
+        _text(day["focus"], f"{day_where}.focus")
+        exercises = day["exercises"]
+        _require(isinstance(exercises, list) and exercises, f"{day_where}.exercises must be a non-empty list.")
+        for e, exercise in enumerate(exercises):
+            exercise_where = f"{day_where}.exercises[{e}]"
+            _fields(exercise, EXERCISE_FIELDS, (), exercise_where)
+            sets = exercise["sets"]
+            _require(
+                isinstance(sets, int) and not isinstance(sets, bool) and sets > 0,
+                f"{exercise_where}.sets must be a positive whole number.",
+            )
+            for field in ("name", "reps", "duration"):
+                _text(exercise[field], f"{exercise_where}.{field}")
+
+
+def _validate(data):
+    """Validated catalog settings from parsed catalog JSON. Raises CatalogError."""
+    _require(isinstance(data, dict), "The catalog must be a JSON object.")
+    _require(data.get("format") == CATALOG_FORMAT, f"Unsupported catalog format {data.get('format')!r}.")
+    _require(isinstance(data.get("version"), (str, int)), "version must be text or a number.")
+    _text(data.get("disclaimer"), "disclaimer")
+
+    bands = data.get("bands")
+    _require(isinstance(bands, list) and bands, "bands must be a non-empty list.")
+    bounds = []
+    for b, band in enumerate(bands):
+        last = b == len(bands) - 1
+        _fields(band, ("category",) if last else ("category", "below"), (), f"bands[{b}]")
+        _text(band["category"], f"bands[{b}].category")
+        if not last:
+            below = band["below"]
+            _require(
+                isinstance(below, (int, float)) and not isinstance(below, bool)
+                and (not bounds or below > bounds[-1]),
+                f"bands[{b}].below must be a number above the previous band's.",
+            )
+            bounds.append(below)
+    categories = tuple(band["category"] for band in bands)
+    _require(len(set(categories)) == len(categories), "bands has duplicate categories.")
+
+    catalog = {
+        "version": str(data["version"]),
+        "bounds": tuple(bounds),
+        "categories": categories,
+        "goals": _names(data, "goals"),
+        "levels": _names(data, "levels"),
+        "default_goal": data.get("default_goal"),
+        "default_level": data.get("default_level"),
+        "disclaimer": data["disclaimer"],
+    }
+    _require(catalog["default_goal"] in catalog["goals"], "default_goal is not one of goals.")
+    _require(catalog["default_level"] in catalog["levels"], "default_level is not one of levels.")
+
+    plans = data.get("plans")
+    _require(isinstance(plans, list) and plans, "plans must be a non-empty list.")
+    for p, plan in enumerate(plans):
+        _validate_plan(plan, f"plans[{p}]", catalog)
+    catalog["plans"] = plans
+    return catalog
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _compile(catalog):
+    """
+    Index of every (category, goal, level) to its most specific plan, frozen,
+    to the encoded JSON running from "category" to the end of the response
+    data, and to the plan's reference (its position in the catalog), with the
+    encoded JSON of each referenced plan. Raises CatalogError for a
+    combination without a plan or with two equally specific ones.
+    """
+    compiled = []
+    for plan in catalog["plans"]:
+        source = {field: value for field, value in plan.items() if field not in SELECTORS}
+        compiled.append((plan, _freeze(source), source))
+
+    plans, encoded, refs, plan_json = {}, {}, {}, {}
+    for category, goal, level in product(catalog["categories"], catalog["goals"], catalog["levels"]):
+        matches = sorted(
+            (
+                (sum(selector in plan for selector in SELECTORS), index)
+                for index, (plan, _, _) in enumerate(compiled)
+                if plan["category"] == category
+                and goal in plan.get("goals", (goal,))
+                and level in plan.get("levels", (level,))
+            ),
+            reverse=True,
+        )
+        where = f"{category} / {goal} / {level}"
+        _require(matches, f"No plan for {where}.")
+        if len(matches) > 1 and matches[0][0] == matches[1][0]:
+            raise CatalogError(
+                f"plans[{matches[1][1]}] and plans[{matches[0][1]}] both apply to {where}."
+            )
+        index = matches[0][1]
+        _, frozen, source = compiled[index]
+        body = json.dumps({
+            "category": category,
+            "goal": goal,
+            "level": level,
+            "plan": source,
+            "disclaimer": catalog["disclaimer"],
+        })
+        # drop the opening brace; the request fields go in front
+        plans[category, goal, level] = frozen
+        encoded[category, goal, level] = body[1:].encode()
+        refs[category, goal, level] = str(index)
+        plan_json[str(index)] = json.dumps(source).encode()
+    return {
+        name: MappingProxyType(index)
+        for name, index in (("plans", plans), ("encoded", encoded), ("refs", refs), ("plan_json", plan_json))
+    }
+
+
+def load_catalog(path):
+    """Read, validate and compile the catalog file at path. Raises CatalogError."""
+    path = os.fspath(path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, encoding="utf-8") as catalog_file:
+            data = json.load(catalog_file)
+    except (OSError, ValueError) as exc:
+        raise CatalogError(f"Cannot read exercise plan catalog {path}: {exc}") from exc
+    catalog = _validate(data)
+    catalog.update(_compile(catalog))
+    return Catalog(path=path, mtime_ns=mtime_ns, **catalog)
+
+
+def _catalog_path():
+    return os.fspath(getattr(settings, "EXERCISE_PLAN_CATALOG", DEFAULT_CATALOG))
+
+
+_reload_lock = threading.Lock()
+_current = load_catalog(_catalog_path())
+
+
+def get_catalog():
+    """
+    The compiled catalog, reloaded first if the file's mtime (or the
+    configured path) changed. A catalog that fails to load is logged and the
+    previous one kept.
+    """
+    global _current
+    catalog = _current
+    path = _catalog_path()
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    if path == catalog.path and mtime_ns == catalog.mtime_ns:
+        return catalog
+
+    with _reload_lock:
+        if _current is not catalog:
+            return _current
+        try:
+            _current = load_catalog(path)
+        except CatalogError:
+            logger.exception("Keeping exercise plan catalog %s", catalog.version)
+            # remember the broken file so it is not re-read on every request
+            _current = catalog = Catalog(**{**vars(catalog), "path": path, "mtime_ns": mtime_ns})
+        else:
+            logger.info("Loaded exercise plan catalog %s from %s", _current.version, path)
+        return _current
+
 
 def calculate_bmi(weight_kg, height_cm):
     """Calculate BMI from weight (kg) and height (cm)"""
@@ -12,299 +328,213 @@ def calculate_bmi(weight_kg, height_cm):
 
 def get_bmi_category(bmi):
     """Categorize BMI into standard health categories"""
-    if bmi < 18.5:
-        return "Underweight"
-    elif bmi < 25:
-        return "Normal Weight"
-    elif bmi < 30:
-        return "Overweight"
-    else:
-        return "Obese"
+    return get_catalog().category(bmi)
 
 
-def get_recommended_exercises(bmi, goal="general_fitness"):
+def get_recommended_exercises(bmi, goal="general_fitness", level=None):
     """
-    Get personalized exercise recommendations based on BMI and fitness goal.
-    Returns a weekly workout plan with exercises, reps, and frequency.
+    Get personalized exercise recommendations based on BMI, fitness goal and
+    client level. Returns a read-only weekly workout plan with exercises,
+    reps, and frequency. Unknown goals and levels get the catalog defaults.
     """
-    
-    if bmi < 18.5:  # Underweight
-        return {
-            "category": "Underweight",
-            "focus": "Strength Building & Weight Gain",
-            "weekly_plan": [
-                {
-                    "day": "Monday",
-                    "focus": "Upper Body Strength",
-                    "exercises": [
-                        {"name": "Push-ups", "sets": 3, "reps": "10-15", "duration": "rest as needed"},
-                        {"name": "Dumbbell Bench Press", "sets": 3, "reps": "8-12", "duration": "rest 60-90s"},
-                        {"name": "Rows", "sets": 3, "reps": "10-15", "duration": "rest 60s"},
-                    ]
-                },
-                {
-                    "day": "Tuesday",
-                    "focus": "Light Cardio & Core",
-                    "exercises": [
-                        {"name": "Walking", "sets": 1, "reps": "N/A", "duration": "20-30 minutes"},
-                        {"name": "Planks", "sets": 3, "reps": "20-30 seconds", "duration": "rest 45s"},
-                    ]
-                },
-                {
-                    "day": "Wednesday",
-                    "focus": "Lower Body Strength",
-                    "exercises": [
-                        {"name": "Squats", "sets": 3, "reps": "12-15", "duration": "rest 60-90s"},
-                        {"name": "Lunges", "sets": 3, "reps": "10 per leg", "duration": "rest 60s"},
-                        {"name": "Calf Raises", "sets": 3, "reps": "15-20", "duration": "rest 45s"},
-                    ]
-                },
-                {
-                    "day": "Thursday",
-                    "focus": "Rest or Active Recovery",
-                    "exercises": [
-                        {"name": "Stretching", "sets": 1, "reps": "N/A", "duration": "15-20 minutes"},
-                    ]
-                },
-                {
-                    "day": "Friday",
-                    "focus": "Full Body Strength",
-                    "exercises": [
-                        {"name": "Deadlifts", "sets": 3, "reps": "6-10", "duration": "rest 2-3 min"},
-                        {"name": "Push-ups", "sets": 3, "reps": "10-15", "duration": "rest 60s"},
-                        {"name": "Rows", "sets": 3, "reps": "10-12", "duration": "rest 60s"},
-                    ]
-                },
-                {
-                    "day": "Saturday & Sunday",
-                    "focus": "Rest Days",
-                    "exercises": [
-                        {"name": "Light walking or yoga", "sets": 1, "reps": "N/A", "duration": "optional"},
-                    ]
-                },
-            ],
-            "nutrition_focus": "High protein intake (1.6-2.2g per kg body weight)",
-            "weekly_frequency": "4-5 sessions"
-        }
-    
-    elif bmi < 25:  # Normal Weight
-        return {
-            "category": "Normal Weight",
-            "focus": "Overall Fitness & Performance",
-            "weekly_plan": [
-                {
-                    "day": "Monday",
-                    "focus": "Cardio & Speed Work",
-                    "exercises": [
-                        {"name": "Running", "sets": 1, "reps": "N/A", "duration": "30-40 minutes"},
-                        {"name": "Sprints", "sets": 5, "reps": "100m", "duration": "rest 90s"},
-                    ]
-                },
-                {
-                    "day": "Tuesday",
-                    "focus": "Strength Training",
-                    "exercises": [
-                        {"name": "Squats", "sets": 4, "reps": "8-10", "duration": "rest 90-120s"},
-                        {"name": "Bench Press", "sets": 4, "reps": "8-10", "duration": "rest 90-120s"},
-                        {"name": "Rows", "sets": 4, "reps": "8-10", "duration": "rest 90-120s"},
-                    ]
-                },
-                {
-                    "day": "Wednesday",
-                    "focus": "HIIT & Core",
-                    "exercises": [
-                        {"name": "Burpees", "sets": 5, "reps": "15", "duration": "rest 60s"},
-                        {"name": "Mountain Climbers", "sets": 5, "reps": "20", "duration": "rest 45s"},
-                        {"name": "Plank Variations", "sets": 3, "reps": "45 seconds", "duration": "rest 45s"},
-                    ]
-                },
-                {
-                    "day": "Thursday",
-                    "focus": "Recovery & Flexibility",
-                    "exercises": [
-                        {"name": "Yoga", "sets": 1, "reps": "N/A", "duration": "45-60 minutes"},
-                    ]
-                },
-                {
-                    "day": "Friday",
-                    "focus": "Mixed Training",
-                    "exercises": [
-                        {"name": "Running with intervals", "sets": 1, "reps": "N/A", "duration": "30-40 minutes"},
-                        {"name": "Core strengthening", "sets": 3, "reps": "varied", "duration": "15 minutes"},
-                    ]
-                },
-                {
-                    "day": "Saturday",
-                    "focus": "Long Run or Sports Activity",
-                    "exercises": [
-                        {"name": "Long run or recreational sports", "sets": 1, "reps": "N/A", "duration": "45-60 minutes"},
-                    ]
-                },
-                {
-                    "day": "Sunday",
-                    "focus": "Rest Day",
-                    "exercises": [
-                        {"name": "Light stretching", "sets": 1, "reps": "N/A", "duration": "optional"},
-                    ]
-                },
-            ],
-            "nutrition_focus": "Balanced macronutrients: 40% carbs, 30% protein, 30% fats",
-            "weekly_frequency": "5-6 sessions"
-        }
-    
-    elif bmi < 30:  # Overweight
-        return {
-            "category": "Overweight",
-            "focus": "Weight Loss & Endurance Building",
-            "weekly_plan": [
-                {
-                    "day": "Monday",
-                    "focus": "Low-Impact Cardio",
-                    "exercises": [
-                        {"name": "Brisk Walking", "sets": 1, "reps": "N/A", "duration": "30-45 minutes"},
-                    ]
-                },
-                {
-                    "day": "Tuesday",
-                    "focus": "Strength Training (Light)",
-                    "exercises": [
-                        {"name": "Bodyweight Squats", "sets": 3, "reps": "15-20", "duration": "rest 60s"},
-                        {"name": "Push-ups (modified)", "sets": 3, "reps": "8-12", "duration": "rest 60s"},
-                        {"name": "Rows (light weights)", "sets": 3, "reps": "12-15", "duration": "rest 60s"},
-                    ]
-                },
-                {
-                    "day": "Wednesday",
-                    "focus": "Moderate Cardio",
-                    "exercises": [
-                        {"name": "Elliptical or Cycling", "sets": 1, "reps": "N/A", "duration": "30-40 minutes"},
-                    ]
-                },
-                {
-                    "day": "Thursday",
-                    "focus": "Active Recovery",
-                    "exercises": [
-                        {"name": "Swimming or water aerobics", "sets": 1, "reps": "N/A", "duration": "30 minutes"},
-                    ]
-                },
-                {
-                    "day": "Friday",
-                    "focus": "Circuit Training",
-                    "exercises": [
-                        {"name": "Burpees (modified)", "sets": 4, "reps": "10", "duration": "rest 60s"},
-                        {"name": "Jumping jacks", "sets": 4, "reps": "20", "duration": "rest 45s"},
-                        {"name": "Step-ups", "sets": 3, "reps": "15 per leg", "duration": "rest 60s"},
-                    ]
-                },
-                {
-                    "day": "Saturday",
-                    "focus": "Extended Cardio",
-                    "exercises": [
-                        {"name": "Jogging or brisk walking", "sets": 1, "reps": "N/A", "duration": "40-50 minutes"},
-                    ]
-                },
-                {
-                    "day": "Sunday",
-                    "focus": "Rest Day",
-                    "exercises": [
-                        {"name": "Stretching and mobility work", "sets": 1, "reps": "N/A", "duration": "15-20 minutes"},
-                    ]
-                },
-            ],
-            "nutrition_focus": "Caloric deficit with emphasis on whole foods, reduce processed items",
-            "weekly_frequency": "5-6 sessions, focus on consistency"
-        }
-    
-    else:  # Obese (BMI >= 30)
-        return {
-            "category": "Obese",
-            "focus": "Gradual Weight Loss & Building Fitness Habits",
-            "weekly_plan": [
-                {
-                    "day": "Monday",
-                    "focus": "Walking Foundation",
-                    "exercises": [
-                        {"name": "Walking", "sets": 1, "reps": "N/A", "duration": "20-30 minutes, leisurely pace"},
-                    ]
-                },
-                {
-                    "day": "Tuesday",
-                    "focus": "Strength Basics",
-                    "exercises": [
-                        {"name": "Bodyweight Squats", "sets": 2, "reps": "10-15", "duration": "rest 90s"},
-                        {"name": "Wall Push-ups", "sets": 2, "reps": "10-15", "duration": "rest 90s"},
-                    ]
-                },
-                {
-                    "day": "Wednesday",
-                    "focus": "Walking",
-                    "exercises": [
-                        {"name": "Walking", "sets": 1, "reps": "N/A", "duration": "20-30 minutes"},
-                    ]
-                },
-                {
-                    "day": "Thursday",
-                    "focus": "Flexibility & Mobility",
-                    "exercises": [
-                        {"name": "Gentle Stretching", "sets": 1, "reps": "N/A", "duration": "20 minutes"},
-                    ]
-                },
-                {
-                    "day": "Friday",
-                    "focus": "Strength Basics",
-                    "exercises": [
-                        {"name": "Bodyweight Squats", "sets": 2, "reps": "10-15", "duration": "rest 90s"},
-                        {"name": "Incline Push-ups (on bench)", "sets": 2, "reps": "8-12", "duration": "rest 90s"},
-                        {"name": "Step-ups", "sets": 2, "reps": "10 per leg", "duration": "rest 90s"},
-                    ]
-                },
-                {
-                    "day": "Saturday",
-                    "focus": "Extended Walking",
-                    "exercises": [
-                        {"name": "Walking (can split into two sessions)", "sets": 1, "reps": "N/A", "duration": "30-40 minutes"},
-                    ]
-                },
-                {
-                    "day": "Sunday",
-                    "focus": "Rest & Recovery",
-                    "exercises": [
-                        {"name": "Light stretching", "sets": 1, "reps": "N/A", "duration": "optional 10-15 minutes"},
-                    ]
-                },
-            ],
-            "nutrition_focus": "Consult a nutritionist; focus on sustainable dietary changes, portion control",
-            "weekly_frequency": "4-5 sessions, emphasis on building habit",
-            "important_notes": [
-                "Start slowly and progress gradually to avoid injury",
-                "Consult a doctor before starting this program",
-                "Focus on consistency over intensity",
-                "Consider working with a personal trainer for form and motivation"
-            ]
-        }
-
-
-def generate_exercise_plan(weight_kg, height_cm, goal="general_fitness"):
+    catalog = get_catalog()
+    return catalog.plans[catalog.key(bmi, goal, level)]
+
+
+def generate_exercise_plan(weight_kg, height_cm, goal="general_fitness", level=None):
     """
     Generate a complete personalized exercise plan based on user metrics.
-    
+
     Args:
         weight_kg: User weight in kilograms
         height_cm: User height in centimeters
         goal: Fitness goal (general_fitness, weight_loss, strength_building, etc.)
-    
+        level: Client level (beginner, intermediate, advanced)
+
     Returns:
         Dictionary containing BMI, category, and personalized weekly plan
     """
+    catalog = get_catalog()
     bmi = calculate_bmi(weight_kg, height_cm)
-    category = get_bmi_category(bmi)
-    plan = get_recommended_exercises(bmi, goal)
-    
+    category, goal, level = catalog.key(bmi, goal, level)
+
     return {
         "weight_kg": weight_kg,
         "height_cm": height_cm,
         "bmi": bmi,
         "category": category,
-        "plan": plan,
-        "disclaimer": "These recommendations are general guidelines. Consult a healthcare provider before starting any new exercise program."
+        "goal": goal,
+        "level": level,
+        "plan": catalog.plans[category, goal, level],
+        "disclaimer": catalog.disclaimer,
+    }
+
+
+def exercise_plan_json(weight_kg, height_cm, goal="general_fitness", level=None):
+    """
+    generate_exercise_plan() encoded as JSON bytes. Only weight, height and
+    BMI are encoded per call; the rest is the pre-encoded plan.
+    """
+    catalog = get_catalog()
+    bmi = calculate_bmi(weight_kg, height_cm)
+    head = json.dumps({"weight_kg": weight_kg, "height_cm": height_cm, "bmi": bmi})
+    return head[:-1].encode() + b", " + catalog.encoded[catalog.key(bmi, goal, level)]
+
+
+def parse_batch(data):
+    """
+    (weights, heights, goals, levels) columns from a batch request body,
+    {"records": [{"weight_kg", "height_cm", "goal"?, "level"?}, ...]}.
+    Raises BatchError for a malformed batch.
+    """
+    records = data.get("records") if isinstance(data, dict) else None
+    if not isinstance(records, list) or not records:
+        raise BatchError("records must be a non-empty list.")
+    if len(records) > MAX_BATCH_RECOMMENDATIONS:
+        raise BatchError(f"At most {MAX_BATCH_RECOMMENDATIONS} records per request.")
+
+    weights, heights, goals, levels = [], [], [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise BatchError(f"records[{index}] must be an object.")
+        for field, column in (("weight_kg", weights), ("height_cm", heights)):
+            value = record.get(field)
+            if (
+                not isinstance(value, (int, float)) or isinstance(value, bool)
+                or not 0 < value < float("inf")
+            ):
+                raise BatchError(f"records[{index}].{field} must be a positive number.")
+            column.append(value)
+        goals.append(record.get("goal"))
+        levels.append(record.get("level"))
+    return weights, heights, goals, levels
+
+
+def bmi_categories(weights, heights, catalog=None):
+    """
+    BMIs of the parallel weights (kg) and heights (cm), as calculate_bmi()
+    gives them, and the index of each in the catalog's categories. Computed
+    in one NumPy pass when NumPy is installed.
+    """
+    catalog = catalog or get_catalog()
+    if np is None:
+        bmis = [calculate_bmi(weight_kg, height_cm) for weight_kg, height_cm in zip(weights, heights)]
+        return bmis, [bisect_right(catalog.bounds, bmi) for bmi in bmis]
+
+    exact = np.asarray(weights, dtype=float) / (np.asarray(heights, dtype=float) / 100) ** 2
+    bmis = np.round(exact, 1)
+    # np.round scales by ten first, so it can differ from round() at a tie
+    tenths = exact * 10
+    for index in np.flatnonzero(np.abs(tenths - np.floor(tenths) - 0.5) < 1e-6):
+        bmis[index] = round(float(exact[index]), 1)
+    return bmis.tolist(), np.searchsorted(catalog.bounds, bmis, side="right").tolist()
+
+
+def _batch(weights, heights, goals, levels, clients=None):
+    """The catalog, plan references in first-use order, and per-record results."""
+    catalog = get_catalog()
+    bmis, indexes = bmi_categories(weights, heights, catalog)
+    goals = goals or [None] * len(bmis)
+    levels = levels or [None] * len(bmis)
+
+    refs, results = {}, []
+    for weight_kg, height_cm, bmi, index, goal, level, client in zip(
+        weights, heights, bmis, indexes, goals, levels, clients or [None] * len(bmis)
+    ):
+        key = (catalog.categories[index], catalog.goal(goal), catalog.level(level))
+        ref = catalog.refs[key]
+        refs[ref] = None
+        result = {"client": client} if clients else {}
+        results.append({
+            **result,
+            "weight_kg": weight_kg,
+            "height_cm": height_cm,
+            "bmi": bmi,
+            "category": key[0],
+            "goal": key[1],
+            "level": key[2],
+            "plan": ref,
+        })
+    return catalog, list(refs), results
+
+
+def batch_recommendations(weights, heights, goals=None, levels=None, clients=None):
+    """
+    Recommendations for many clients at once, from parallel lists of weights
+    (kg), heights (cm) and optional goals, levels and client ids. Each result
+    names its plan by reference; every referenced plan appears once under "plans".
+    """
+    catalog, refs, results = _batch(weights, heights, goals, levels, clients)
+    plan_of = {catalog.refs[key]: plan for key, plan in catalog.plans.items()}
+    return {
+        "catalog_version": catalog.version,
+        "plans": {ref: plan_of[ref] for ref in refs},
+        "results": results,
+        "disclaimer": catalog.disclaimer,
+    }
+
+
+def batch_recommendations_json(weights, heights, goals=None, levels=None, clients=None):
+    """batch_recommendations() encoded as JSON bytes, with the plans pre-encoded."""
+    catalog, refs, results = _batch(weights, heights, goals, levels, clients)
+    plans = b", ".join(json.dumps(ref).encode() + b": " + catalog.plan_json[ref] for ref in refs)
+    return b"".join((
+        b'{"catalog_version": ', json.dumps(catalog.version).encode(),
+        b', "plans": {', plans,
+        b'}, "results": ', json.dumps(results).encode(),
+        b', "disclaimer": ', json.dumps(catalog.disclaimer).encode(), b"}",
+    ))
+
+
+def plan_query(params):
+    """
+    Canonical plan lookup parameters from a mapping of strings: weight and
+    height bucketed, unknown goals and levels replaced by the defaults.
+    Raises ValueError for a missing or out-of-range measurement.
+    """
+    query = {}
+    for field, (low, high, step) in PLAN_QUERY_RANGES.items():
+        try:
+            value = float(params.get(field, ""))
+        except ValueError:
+            raise ValueError(f"{field} must be a number.")
+        if not low <= value <= high:
+            raise ValueError(f"{field} must be between {low} and {high}.")
+        query[field] = round(value / step) * step
+    catalog = get_catalog()
+    query["goal"] = catalog.goal(params.get("goal"))
+    query["level"] = catalog.level(params.get("level"))
+    return query
+
+
+def format_plan_query(query):
+    """plan_query() parameters as strings, in canonical URL form."""
+    return {field: f"{value:g}" if field in PLAN_QUERY_RANGES else value for field, value in query.items()}
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _cached_plan(weight_kg, height_cm, goal, level, catalog_path, catalog_mtime_ns):
+    body = b'{"success": true, "data": ' + exercise_plan_json(weight_kg, height_cm, goal, level) + b"}"
+    return body, hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def cached_exercise_plan(weight_kg, height_cm, goal, level):
+    """
+    (response body, ETag) of a plan lookup, from a bounded in-process LRU
+    cache. Entries are keyed by the catalog file too, so a reload misses.
+    """
+    catalog = get_catalog()
+    return _cached_plan(weight_kg, height_cm, goal, level, catalog.path, catalog.mtime_ns)
+
+
+def plan_cache_stats():
+    """Return hit/miss counters, the hit rate and the size of this process's plan cache."""
+    info = _cached_plan.cache_info()
+    total = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / total, 3) if total else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize,
     }
@@ -0,0 +1,202 @@
+"""
+Streaming CSV exports of client rosters, event registrations and payments.
+
+Rows are read with values_list().iterator(), so no model instances are built
+and memory use stays flat however many rows an export has. Each export
+declares its columns and the lookup each filter (date range, trainer, event,
+status) applies to; a filter an export does not support is an error.
+"""
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from payments.models import Payment
+
+from .models import ClientProfile, EventRegistration, Membership
+
+EXPORT_CHUNK_SIZE = 2000
+
+FILTERS = ("start", "end", "trainer", "event", "status")
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+@dataclass(frozen=True)
+class Export:
+    """A CSV export: (header, field) columns and the lookup of each filter."""
+    model: type
+    columns: tuple
+    ordering: tuple
+    date_lookup: str = ""
+    trainer_lookup: str = ""
+    event_lookup: str = ""
+    status_lookup: str = ""
+    annotations: dict = field(default_factory=dict)
+
+    @property
+    def header(self):
+        return [header for header, _ in self.columns]
+
+    def queryset(self, filters):
+        """values_list() queryset of the rows matching filters."""
+        rows = self.model.objects.annotate(**self.annotations)
+        lookups = {
+            "start": self.date_lookup and f"{self.date_lookup}__gte",
+            "end": self.date_lookup and f"{self.date_lookup}__lte",
+            "trainer": self.trainer_lookup,
+            "event": self.event_lookup,
+            "status": self.status_lookup,
+        }
+        for name, value in filters.items():
+            if not lookups[name]:
+                raise ValueError(f"This export cannot be filtered by {name}.")
+            rows = rows.filter(**{lookups[name]: value})
+        return (rows
+                .order_by(*self.ordering)
+                .values_list(*[column for _, column in self.columns]))
+
+
+def _latest_membership(column):
+    return Subquery(
+        Membership.objects
+        .filter(user=OuterRef("user_id"))
+        .order_by("-end_date", "-pk")
+        .values(column)[:1]
+    )
+
+
+EXPORTS = {
+    "clients": Export(
+        model=ClientProfile,
+        columns=(
+            ("username", "user__username"),
+            ("first_name", "user__first_name"),
+            ("last_name", "user__last_name"),
+            ("email", "user__email"),
+            ("level", "level"),
+            ("trainer", "primary_trainer__user__username"),
+            ("membership_status", "membership_status"),
+            ("membership_end", "membership_end"),
+            ("joined", "user__date_joined"),
+        ),
+        ordering=("user__username",),
+        annotations={
+            "membership_status": _latest_membership("status"),
+            "membership_end": _latest_membership("end_date"),
+        },
+        date_lookup="user__date_joined__date",
+        trainer_lookup="primary_trainer",
+        # the roster of one event: clients registered for it
+        event_lookup="user__eventregistration__event",
+        status_lookup="membership_status",
+    ),
+    "registrations": Export(
+        model=EventRegistration,
+        columns=(
+            ("event_date", "event__date"),
+            ("start_time", "event__start_time"),
+            ("event", "event__title"),
+            ("event_id", "event_id"),
+            ("trainer", "event__trainer__user__username"),
+            ("username", "user__username"),
+            ("first_name", "user__first_name"),
+            ("last_name", "user__last_name"),
+            ("email", "user__email"),
+            ("status", "status"),
+            ("attended", "attended"),
+            ("booked_at", "booked_at"),
+        ),
+        ordering=("event__date", "event__start_time", "event_id", "pk"),
+        date_lookup="event__date",
+        trainer_lookup="event__trainer",
+        event_lookup="event",
+        status_lookup="status",
+    ),
+    "payments": Export(
+        model=Payment,
+        columns=(
+            ("created_at", "created_at"),
+            ("paid_at", "paid_at"),
+            ("username", "user__username"),
+            ("email", "user__email"),
+            ("plan", "membership_plan__name"),
+            ("trainer", "membership_plan__trainer__user__username"),
+            ("amount_cents", "amount_cents"),
+            ("currency", "amount_currency"),
+            ("status", "status"),
+            ("payment_intent", "stripe_payment_intent_id"),
+        ),
+        ordering=("created_at", "pk"),
+        date_lookup="created_at__date",
+        trainer_lookup="membership_plan__trainer",
+        status_lookup="status",
+    ),
+}
+
+
+def parse_filters(params):
+    """
+    Filters from a mapping of strings (query parameters or command options).
+    Empty values are ignored. Raises ValueError for a malformed value.
+    """
+    filters = {}
+    for name in FILTERS:
+        value = (params.get(name) or "").strip()
+        if not value:
+            continue
+        try:
+            if name in ("start", "end"):
+                filters[name] = date.fromisoformat(value)
+            elif name in ("trainer", "event"):
+                filters[name] = int(value)
+            else:
+                filters[name] = value
+        except ValueError:
+            raise ValueError(f"Invalid {name} '{value}'.")
+    return filters
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat(timespec="seconds")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() returns what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(export, filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the CSV text of export for filters, one chunk of rows at a time.
+    Raises ValueError for a filter the export does not support.
+    """
+    rows = export.queryset(filters).iterator(chunk_size=chunk_size)
+    writer = csv.writer(_Echo())
+
+    def generate():
+        chunk = [writer.writerow(export.header)]
+        for row in rows:
+            chunk.append(writer.writerow([_cell(value) for value in row]))
+            if len(chunk) >= chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    return generate()
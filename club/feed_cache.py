@@ -0,0 +1,88 @@
+"""
+Versioned cache of upcoming-event pages for the events listing.
+
+Each trainer's feed (and the unfiltered feed shown to anonymous users) has a
+version token. Cached pages embed the token in their key, so invalidation is a
+single write: replacing the token orphans every page of that feed at once.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+ALL_TRAINERS = "all"
+
+_VERSION_KEY = "events_feed:version:{scope}"
+_PAGE_KEY = "events_feed:page:{scope}:{version}:{digest}"
+_HITS_KEY = "events_feed:hits"
+_MISSES_KEY = "events_feed:misses"
+
+
+def _timeout():
+    return getattr(settings, "EVENTS_FEED_CACHE_TIMEOUT", 300)
+
+
+def _feed_version(scope):
+    """Return the current version token of a feed, creating one if missing."""
+    key = _VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_feed_page(trainer_id, params, loader):
+    """
+    Return a cached page of the events feed, calling loader() on a miss.
+
+    trainer_id scopes the feed (None for the unfiltered listing) and params is
+    a dict of everything else that shapes the page (filters, cursor, page size).
+    """
+    scope = trainer_id or ALL_TRAINERS
+    digest = hashlib.md5(
+        repr(sorted(params.items())).encode(), usedforsecurity=False
+    ).hexdigest()
+    key = _PAGE_KEY.format(scope=scope, version=_feed_version(scope), digest=digest)
+
+    page = cache.get(key)
+    if page is not None:
+        _count(_HITS_KEY)
+        return page
+
+    _count(_MISSES_KEY)
+    page = loader()
+    cache.set(key, page, _timeout())
+    return page
+
+
+def invalidate_trainer_feed(trainer_id):
+    """Drop every cached page that can contain events of trainer_id."""
+    scopes = [ALL_TRAINERS]
+    if trainer_id:
+        scopes.append(trainer_id)
+    cache.set_many(
+        {_VERSION_KEY.format(scope=scope): uuid.uuid4().hex for scope in scopes},
+        None,
+    )
+
+
+def feed_cache_stats():
+    """Return hit/miss counters and the hit rate of the events feed cache."""
+    hits = cache.get(_HITS_KEY, 0)
+    misses = cache.get(_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 3) if total else 0.0,
+    }
@@ -0,0 +1 @@
+Forms.py
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+iCalendar (RFC 5545) feeds of upcoming events.
+Feeds are written line by line from values() rows so they can be streamed
+without building model instances.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+# Columns each VEVENT is built from
+CALENDAR_FIELDS = (
+    "id", "series_id", "title", "description", "location",
+    "date", "start_time", "end_time", "updated_at",
+)
+
+# Events without an end time are shown as one hour long
+DEFAULT_DURATION = timedelta(hours=1)
+
+PRODID = "-//SinMancha//Events//EN"
+
+
+def escape_text(value):
+    """Escape a TEXT property value."""
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """Fold a content line at 75 octets, as the spec requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74  # continuation lines start with a space
+        cut = min(limit, len(encoded))
+        # never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc(value):
+    """
+    A naive datetime in the site time zone as an iCalendar UTC time; a TZID
+    would need a VTIMEZONE block describing the zone.
+    """
+    return f"{timezone.make_aware(value).astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def vevent(row, url=None):
+    """Return the VEVENT block for an event row (a dict of CALENDAR_FIELDS)."""
+    if row["id"] is not None:
+        uid = f"event-{row['id']}@sinmancha"
+    else:
+        # unsaved series occurrence: keyed by its slot so it survives materialising
+        uid = f"series-{row['series_id']}-{row['date']:%Y%m%d}@sinmancha"
+
+    start = datetime.combine(row["date"], row["start_time"])
+    if row["end_time"] and row["end_time"] > row["start_time"]:
+        end = datetime.combine(row["date"], row["end_time"])
+    else:
+        end = start + DEFAULT_DURATION
+    stamp = row["updated_at"] or datetime.now(dt_timezone.utc)
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}",
+        f"DTSTART:{_utc(start)}",
+        f"DTEND:{_utc(end)}",
+        f"SUMMARY:{escape_text(row['title'])}",
+    ]
+    if row["location"]:
+        lines.append(f"LOCATION:{escape_text(row['location'])}")
+    if row["description"]:
+        lines.append(f"DESCRIPTION:{escape_text(row['description'])}")
+    if url:
+        lines.append(f"URL:{url}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+
+def stream_calendar(name, rows, event_url=None):
+    """
+    Yield an iCalendar document for rows, one chunk per event.
+    event_url, if given, is called with an event id and returns its page URL.
+    """
+    yield "".join(fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+        "REFRESH-INTERVAL;VALUE=DURATION:PT15M",
+        "X-PUBLISHED-TTL:PT15M",
+    ))
+    for row in rows:
+        url = event_url(row["id"]) if event_url and row["id"] is not None else None
+        yield vevent(row, url)
+    yield fold("END:VCALENDAR")
@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from club.booking import BookingResult, book_event
+from club.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure booking throughput of the booking engine. "
+        "All benchmark data is created in a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bookings",
+            type=int,
+            default=2000,
+            help="Number of booking attempts to make (default: 2000).",
+        )
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=50,
+            help="Capacity of each benchmark event (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        bookings = max(options["bookings"], 1)
+        capacity = max(options["capacity"], 1)
+
+        with transaction.atomic():
+            users = self._create_users(bookings)
+            events = self._create_events(bookings, capacity)
+
+            outcomes = {result: 0 for result in BookingResult}
+            started = time.perf_counter()
+            for index, user in enumerate(users):
+                # half of the attempts target an already full event
+                event = events[index // (capacity * 2)]
+                outcomes[book_event(user, event.id)] += 1
+            elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        rate = bookings / elapsed if elapsed else float("inf")
+        for result, count in outcomes.items():
+            self.stdout.write(f"{result.value}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{bookings} booking attempts in {elapsed:.3f}s ({rate:.0f} bookings/s)"
+        ))
+
+    def _create_users(self, count):
+        prefix = f"bench-{int(time.time())}-"
+        return User.objects.bulk_create(
+            [User(username=f"{prefix}{i}") for i in range(count)]
+        )
+
+    def _create_events(self, bookings, capacity):
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        count = bookings // (capacity * 2) + 1
+        return Event.objects.bulk_create([
+            Event(
+                title=f"Benchmark session {i}",
+                date=tomorrow + timedelta(days=i),
+                start_time=timezone.now().time(),
+                capacity=capacity,
+            )
+            for i in range(count)
+        ])
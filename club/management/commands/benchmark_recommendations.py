@@ -0,0 +1,89 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from club import exercise_recommendations
+from club.exercise_recommendations import (
+    batch_recommendations_json,
+    bmi_categories,
+    exercise_plan_json,
+    generate_exercise_plan,
+    get_catalog,
+)
+
+
+def _thaw(value):
+    """Plain dicts and lists of a read-only plan, so json can encode it."""
+    if isinstance(value, (list, tuple)):
+        return [_thaw(item) for item in value]
+    if hasattr(value, "items"):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure exercise recommendation throughput: the pre-encoded JSON "
+        "response body against encoding the whole plan on every call, and a "
+        "batch of records against one call per record."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=100000,
+            help="Number of recommendations to generate per run (default: 100000).",
+        )
+        parser.add_argument(
+            "--batch",
+            type=int,
+            default=10000,
+            help="Number of records in the batch run (default: 10000).",
+        )
+
+    def handle(self, *args, **options):
+        calls = max(options["calls"], 1)
+        # weights spread over all four BMI categories at 175 cm
+        goals = get_catalog().goals
+        requests = [(45 + i % 80, 175.0, goals[i % len(goals)]) for i in range(1000)]
+
+        def encode_per_call(weight_kg, height_cm, goal):
+            plan = generate_exercise_plan(weight_kg, height_cm, goal)
+            plan["plan"] = _thaw(plan["plan"])
+            return json.dumps({"success": True, "data": plan}, cls=DjangoJSONEncoder)
+
+        def pre_encoded(weight_kg, height_cm, goal):
+            return b'{"success": true, "data": ' + exercise_plan_json(weight_kg, height_cm, goal) + b"}"
+
+        for label, build in (("encode per call", encode_per_call), ("pre-encoded", pre_encoded)):
+            started = time.perf_counter()
+            for index in range(calls):
+                build(*requests[index % len(requests)])
+            self._report(label, calls, "calls", time.perf_counter() - started)
+
+        size = max(options["batch"], 1)
+        records = [requests[index % len(requests)] for index in range(size)]
+        weights, heights, goals = (list(column) for column in zip(*records))
+        numpy = "NumPy" if exercise_recommendations.np is not None else "pure Python"
+
+        started = time.perf_counter()
+        for record in records:
+            pre_encoded(*record)
+        self._report("one call per record", size, "records", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        bmi_categories(weights, heights)
+        self._report(f"BMI pass ({numpy})", size, "records", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        batch_recommendations_json(weights, heights, goals)
+        self._report(f"batch ({numpy})", size, "records", time.perf_counter() - started)
+
+    def _report(self, label, count, unit, elapsed):
+        rate = count / elapsed if elapsed else float("inf")
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {count} {unit} in {elapsed:.3f}s ({rate:.0f} {unit}/s)"
+        ))
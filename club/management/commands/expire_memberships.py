@@ -0,0 +1,53 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from club.models import Membership
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark active memberships whose end date has passed as expired. "
+        "Safe to run repeatedly, e.g. daily from the Heroku scheduler or cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of memberships updated per UPDATE (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count expired memberships without updating them.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        today = timezone.now().date()
+        # uses membership_status_end_idx
+        overdue = Membership.objects.filter(status="active", end_date__lt=today)
+
+        if options["dry_run"]:
+            count = overdue.count()
+            self.stdout.write(self.style.SUCCESS(f"Would expire {count} memberships."))
+            return
+
+        expired = 0
+        while True:
+            ids = list(overdue.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            # re-check the status so a row renewed meanwhile is left alone;
+            # each batch commits on its own, so locks stay short
+            expired += (Membership.objects
+                        .filter(pk__in=ids, status="active", end_date__lt=today)
+                        .update(status="expired"))
+
+        logger.info("expire_memberships: expired %d memberships", expired)
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} memberships."))
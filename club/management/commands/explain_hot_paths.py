@@ -0,0 +1,217 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from club.models import (
+    ClientProfile,
+    Event,
+    EventRegistration,
+    Membership,
+    MembershipPlan,
+    TrainerProfile,
+)
+
+# (label, url name, role of the user making the request)
+HOT_PATHS = [
+    ("events (anonymous)", "events", None),
+    ("events (client)", "events", "client"),
+    ("event detail", "event_detail", "client"),
+    ("client dashboard", "client_dashboard", "client"),
+    ("my events", "my_events", "client"),
+    ("trainer dashboard", "trainer_dashboard", "trainer"),
+    ("membership plans", "membership_plans", "client"),
+]
+
+# Static URLs do not affect query plans; don't require a collectstatic manifest
+PLAIN_STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+SEQ_SCAN_MARKERS = {
+    "sqlite": ("SCAN ",),
+    "postgresql": ("Seq Scan",),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the queries of the hot views against a seeded dataset, print their "
+        "EXPLAIN plans and flag sequential scans. The seeded data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--events",
+            type=int,
+            default=2000,
+            help="Number of events to seed (default: 2000).",
+        )
+        parser.add_argument(
+            "--trainers",
+            type=int,
+            default=10,
+            help="Number of trainers the events and clients are spread over (default: 10).",
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=200,
+            help="Number of clients to seed (default: 200).",
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error if any query plan contains a sequential scan.",
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN_MARKERS:
+            raise CommandError(f"EXPLAIN parsing is not supported for {vendor}.")
+
+        flagged = []
+        with transaction.atomic():
+            seeded = self._seed(
+                max(options["trainers"], 1), options["events"], options["clients"]
+            )
+            self._analyze()
+            for label, url_name, role in HOT_PATHS:
+                flagged.extend(self._explain_view(label, url_name, role, seeded))
+            transaction.set_rollback(True)
+
+        if flagged:
+            self.stdout.write(self.style.WARNING(
+                f"{len(flagged)} sequential scan(s) found:"
+            ))
+            for label, line in flagged:
+                self.stdout.write(f"  [{label}] {line}")
+            if options["fail_on_seq_scan"]:
+                raise CommandError("Sequential scans found in hot paths.")
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans found."))
+
+    def _seed(self, trainer_count, event_count, client_count):
+        """
+        Create trainers with clients, memberships, events and bookings.
+        The requests are made as the first trainer and one of their clients.
+        """
+        today = timezone.now().date()
+        prefix = f"explain-{timezone.now().timestamp():.0f}-"
+
+        trainer_users = User.objects.bulk_create(
+            [User(username=f"{prefix}trainer{i}") for i in range(trainer_count)]
+        )
+        trainers = TrainerProfile.objects.bulk_create(
+            [TrainerProfile(user=user) for user in trainer_users]
+        )
+        plans = MembershipPlan.objects.bulk_create([
+            MembershipPlan(trainer=trainer, name="Explain plan", price=10, billing_interval="monthly")
+            for trainer in trainers
+        ])
+
+        client_users = User.objects.bulk_create(
+            [User(username=f"{prefix}client{i}") for i in range(client_count)]
+        )
+        ClientProfile.objects.bulk_create([
+            ClientProfile(user=user, primary_trainer=trainers[i % trainer_count])
+            for i, user in enumerate(client_users)
+        ])
+        Membership.objects.bulk_create([
+            Membership(
+                user=user,
+                plan=plans[i % trainer_count],
+                start_date=today - timedelta(days=days_ago),
+                end_date=today - timedelta(days=days_ago) + timedelta(days=30),
+            )
+            for i, user in enumerate(client_users)
+            for days_ago in (0, 40, 80)
+        ])
+
+        events = Event.objects.bulk_create([
+            Event(
+                trainer=trainers[i % trainer_count],
+                title=f"Explain session {i}",
+                date=today + timedelta(days=(i - event_count // 2) // trainer_count),
+                start_time="07:00",
+                capacity=30,
+                is_cancelled=(i % 10 == 0),
+            )
+            for i in range(event_count)
+        ])
+        EventRegistration.objects.bulk_create([
+            EventRegistration(
+                user=user,
+                event=event,
+                status="booked" if (i + j) % 4 else "cancelled",
+            )
+            for i, event in enumerate(events[::5])
+            for j, user in enumerate(client_users[:20])
+        ])
+        Event.objects.filter(trainer__in=trainers).recount_booked()
+
+        return {
+            "trainer": trainer_users[0],
+            "client": client_users[0],
+            "event": events[event_count // 2 + trainer_count],
+        }
+
+    def _analyze(self):
+        """Refresh planner statistics so plans reflect the seeded data."""
+        tables = [
+            model._meta.db_table
+            for model in (Event, EventRegistration, Membership, ClientProfile)
+        ]
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+    def _explain_view(self, label, url_name, role, seeded):
+        """Request a view, EXPLAIN each SELECT it ran and return flagged plan lines."""
+        client = Client()
+        if role:
+            client.force_login(seeded[role])
+        args = [seeded["event"].pk] if url_name == "event_detail" else []
+
+        with override_settings(STORAGES=PLAIN_STATIC_STORAGES), \
+                CaptureQueriesContext(connection) as captured:
+            try:
+                response = client.get(reverse(url_name, args=args), secure=True, HTTP_HOST="localhost")
+                status = response.status_code
+            except Exception as exc:
+                status = f"error: {exc}"
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n== {label} ({len(captured.captured_queries)} queries, status {status})"
+        ))
+
+        flagged = []
+        markers = SEQ_SCAN_MARKERS[connection.vendor]
+        for query in captured.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            self.stdout.write(f"\n{sql}")
+            for line in self._plan(sql):
+                is_seq_scan = any(marker in line for marker in markers) and "CONSTANT ROW" not in line
+                if is_seq_scan:
+                    flagged.append((label, line.strip()))
+                    self.stdout.write(self.style.WARNING(f"  ! {line}"))
+                else:
+                    self.stdout.write(f"    {line}")
+        return flagged
+
+    def _plan(self, sql):
+        """Return the EXPLAIN output for sql as a list of lines."""
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            rows = cursor.fetchall()
+        # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+        return [str(row[-1]) for row in rows]
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from club.exports import EXPORTS, parse_filters, stream_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a CSV export (clients, registrations or payments) to a file or "
+        "stdout. Rows are streamed, so memory use does not grow with the export."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("export", choices=sorted(EXPORTS), help="Export to write.")
+        parser.add_argument("--start", help="First day to include (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument("--trainer", help="Only rows of this trainer profile id.")
+        parser.add_argument("--event", help="Only rows of this event id.")
+        parser.add_argument("--status", help="Only rows with this status.")
+        parser.add_argument("-o", "--output", help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            chunks = stream_csv(EXPORTS[options["export"]], parse_filters(options))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
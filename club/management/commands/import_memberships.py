@@ -0,0 +1,62 @@
+import logging
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from club.membership_import import DEFAULT_CHUNK_SIZE, import_memberships
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import memberships from a CSV file with the columns user (username or "
+        "email), plan (id or name), start_date and optionally end_date, status "
+        "and auto_renew. Missing end dates are computed from the plan's billing "
+        "interval. Invalid rows are reported by line number and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import, or - for stdin.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows validated and inserted per batch (default: {DEFAULT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the file and report errors without importing anything.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            if path == "-":
+                report = self._import(sys.stdin, options)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as stream:
+                    report = self._import(stream, options)
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for line, message in report.errors:
+            self.stderr.write(f"Line {line}: {message}")
+
+        verb = "Would import" if options["dry_run"] else "Imported"
+        summary = (f"{verb} {report.imported} of {report.rows} memberships, "
+                   f"{len(report.errors)} rows with errors.")
+        if not options["dry_run"]:
+            logger.info("import_memberships: %s", summary)
+        style = self.style.WARNING if report.errors else self.style.SUCCESS
+        self.stdout.write(style(summary))
+
+    def _import(self, stream, options):
+        return import_memberships(
+            stream,
+            dry_run=options["dry_run"],
+            chunk_size=max(options["batch_size"], 1),
+        )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from club.models import Event
+
+
+class Command(BaseCommand):
+    help = "Recompute Event.booked_count from registrations and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of events checked per batch (default: 500).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted events without updating them.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        dry_run = options["dry_run"]
+
+        checked = 0
+        fixed = 0
+        last_id = 0
+
+        while True:
+            ids = list(
+                Event.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            drifted = list(
+                Event.objects.filter(pk__in=ids)
+                .with_actual_booked()
+                .exclude(booked_count=F("actual_booked"))
+                .values_list("pk", "booked_count", "actual_booked")
+            )
+            for event_id, stored, actual in drifted:
+                self.stdout.write(f"Event {event_id}: booked_count {stored} -> {actual}")
+
+            if drifted and not dry_run:
+                with transaction.atomic():
+                    Event.objects.filter(pk__in=[row[0] for row in drifted]).recount_booked()
+            fixed += len(drifted)
+
+        verb = "would fix" if dry_run else "fixed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} events, {verb} {fixed} drifted counters."
+        ))
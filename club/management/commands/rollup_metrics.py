@@ -0,0 +1,60 @@
+import logging
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from club.metrics import rollup_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily metrics shown on the admin dashboard. By default "
+        "rolls up yesterday and today; run it nightly (or hourly for fresher "
+        "figures). Use --start to backfill a range of days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=2,
+            help="Number of days up to today to recompute (default: 2).",
+        )
+        parser.add_argument("--start", help="First day to recompute (YYYY-MM-DD), for backfills.")
+        parser.add_argument("--end", help="Last day to recompute (YYYY-MM-DD, default: today).")
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Days recomputed per transaction when backfilling (default: 31).",
+        )
+
+    def handle(self, *args, **options):
+        end = _date(options["end"]) if options["end"] else timezone.now().date()
+        if options["start"]:
+            start = _date(options["start"])
+        else:
+            start = end - timedelta(days=max(options["days"], 1) - 1)
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        chunk = timedelta(days=max(options["chunk_days"], 1))
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + chunk - timedelta(days=1), end)
+            written += rollup_metrics(chunk_start, chunk_end)
+            chunk_start = chunk_end + timedelta(days=1)
+
+        logger.info("rollup_metrics: %d rows for %s to %s", written, start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {written} rows for {start} to {end}."))
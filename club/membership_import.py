@@ -0,0 +1,236 @@
+"""
+Bulk import of memberships from a CSV file.
+
+Rows are streamed and handled in chunks. Plans are loaded once and the users
+of each chunk with a single query. End dates are then computed for the whole
+chunk from each plan's term length, and the valid rows are inserted with one
+bulk_create. Membership.save() is never called per row.
+
+Columns: user (username or email), plan (id or name) and start_date are
+required; end_date, status and auto_renew are optional.
+"""
+import csv
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Membership, MembershipPlan
+
+REQUIRED_COLUMNS = ("user", "plan", "start_date")
+DEFAULT_CHUNK_SIZE = 2000
+
+STATUSES = {value for value, _ in Membership.STATUS_CHOICES}
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"", "0", "false", "no", "n"}
+
+
+class RowError(ValueError):
+    """A CSV row that cannot be imported."""
+
+
+@dataclass
+class ImportReport:
+    """Outcome of an import. errors holds (line number, message) pairs."""
+    rows: int = 0
+    imported: int = 0
+    errors: list = field(default_factory=list)
+
+
+@dataclass
+class _Row:
+    line: int
+    user_id: int
+    plan: MembershipPlan
+    start_date: date
+    end_date: date = None
+    status: str = ""
+    auto_renew: bool = False
+
+
+def _field(record, column):
+    # short rows leave trailing columns as None
+    return (record.get(column) or "").strip()
+
+
+def _parse_date(value, column):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"Invalid {column} '{value}', expected YYYY-MM-DD.")
+
+
+def _parse_bool(value, column):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"Invalid {column} '{value}', expected yes or no.")
+
+
+class PlanLookup:
+    """Every membership plan, by id and by name."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_name = {}
+        for plan in MembershipPlan.objects.all():
+            self.by_id[str(plan.pk)] = plan
+            self.by_name.setdefault(plan.name.lower(), []).append(plan)
+
+    def get(self, value):
+        if value in self.by_id:
+            return self.by_id[value]
+        plans = self.by_name.get(value.lower())
+        if not plans:
+            raise RowError(f"Unknown plan '{value}'.")
+        if len(plans) > 1:
+            raise RowError(f"Plan name '{value}' is ambiguous, use the plan id.")
+        return plans[0]
+
+
+def _user_lookup(values):
+    """Map each username or email in values to a user id, with one query."""
+    users = (get_user_model().objects
+             .filter(Q(username__in=values) | Q(email__in=values))
+             .values_list("pk", "username", "email"))
+    by_username = {}
+    by_email = {}
+    for pk, username, email in users:
+        by_username[username] = pk
+        if email:
+            by_email.setdefault(email, []).append(pk)
+    # an email shared by several accounts cannot identify a user
+    lookup = {email: pks[0] for email, pks in by_email.items() if len(pks) == 1}
+    lookup.update(by_username)
+    return lookup
+
+
+def _fill_end_dates(rows, today):
+    """
+    Compute the missing end dates of a chunk in one pass from the term length
+    of each plan, and derive missing statuses from the end dates.
+    """
+    lengths = {row.plan.pk: row.plan.term_length for row in rows}
+    for row in rows:
+        if row.end_date is None:
+            length = lengths[row.plan.pk]
+            row.end_date = row.start_date + length if length else None
+        if not row.status:
+            ended = row.end_date is not None and row.end_date < today
+            row.status = "expired" if ended else "active"
+
+
+def _parse_chunk(records, plans, today):
+    """Validate a chunk of (line, record) pairs. Returns (rows, errors)."""
+    user_ids = _user_lookup({_field(record, "user") for _, record in records})
+
+    rows = []
+    errors = []
+    for line, record in records:
+        try:
+            user = _field(record, "user")
+            if user not in user_ids:
+                raise RowError(f"Unknown user '{user}'.")
+            row = _Row(
+                line=line,
+                user_id=user_ids[user],
+                plan=plans.get(_field(record, "plan")),
+                start_date=_parse_date(_field(record, "start_date"), "start_date"),
+            )
+            end_date = _field(record, "end_date")
+            if end_date:
+                row.end_date = _parse_date(end_date, "end_date")
+                if row.end_date < row.start_date:
+                    raise RowError("end_date is before start_date.")
+            elif row.plan.term_length is None:
+                raise RowError(f"end_date is required for plan '{row.plan.name}'.")
+            status = _field(record, "status").lower()
+            if status and status not in STATUSES:
+                raise RowError(f"Invalid status '{status}'.")
+            row.status = status
+            row.auto_renew = _parse_bool(_field(record, "auto_renew"), "auto_renew")
+        except RowError as e:
+            errors.append((line, str(e)))
+        else:
+            rows.append(row)
+
+    _fill_end_dates(rows, today)
+    return rows, errors
+
+
+def _drop_duplicates(rows, seen):
+    """
+    Split rows into new rows and errors for rows that repeat an existing
+    membership (same user, plan and start date) or an earlier row of the file.
+    """
+    user_ids = {row.user_id for row in rows if row.user_id not in seen["users"]}
+    if user_ids:
+        seen["keys"].update(
+            Membership.objects.filter(user_id__in=user_ids)
+            .values_list("user_id", "plan_id", "start_date")
+        )
+        seen["users"].update(user_ids)
+
+    new = []
+    errors = []
+    for row in rows:
+        key = (row.user_id, row.plan.pk, row.start_date)
+        if key in seen["keys"]:
+            errors.append((row.line, "Membership already exists."))
+        else:
+            seen["keys"].add(key)
+            new.append(row)
+    return new, errors
+
+
+def import_memberships(stream, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import memberships from the CSV text stream. Invalid rows are reported in
+    the returned ImportReport and skipped; valid rows are inserted, one
+    transaction per chunk, unless dry_run is set.
+
+    Raises ValueError if a required column is missing.
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+
+    plans = PlanLookup()
+    today = timezone.now().date()
+    seen = {"users": set(), "keys": set()}
+    report = ImportReport()
+    # reader.line_num is read as each row is consumed, so quoted newlines count
+    numbered = ((reader.line_num, record) for record in reader)
+
+    while True:
+        records = list(islice(numbered, chunk_size))
+        if not records:
+            break
+        report.rows += len(records)
+        rows, errors = _parse_chunk(records, plans, today)
+        rows, duplicates = _drop_duplicates(rows, seen)
+        report.errors.extend(sorted(errors + duplicates))
+        report.imported += len(rows)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            Membership.objects.bulk_create([
+                Membership(
+                    user_id=row.user_id,
+                    plan_id=row.plan.pk,
+                    start_date=row.start_date,
+                    end_date=row.end_date,
+                    status=row.status,
+                    auto_renew=row.auto_renew,
+                )
+                for row in rows
+            ])
+
+    return report
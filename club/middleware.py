@@ -0,0 +1,73 @@
+"""
+Request-scoped resolution of the current user's active membership.
+
+MembershipMiddleware sets request.membership to a lazy object that loads the
+active membership (with its plan) on first use and reuses it for the rest of
+the request. Saving a Membership of the user during the request invalidates it.
+"""
+from contextvars import ContextVar
+
+from django.utils.functional import LazyObject, empty
+
+from .models import Membership
+
+_current_resolver = ContextVar("membership_resolver", default=None)
+
+
+class MembershipResolver:
+    """Loads a user's active membership once, until invalidated."""
+
+    def __init__(self, user):
+        self.user = user
+        self.proxy = LazyMembership(self)
+        self._membership = empty
+
+    def get(self):
+        """Return the active Membership of the user, or None."""
+        if self._membership is empty:
+            if self.user.is_authenticated:
+                self._membership = Membership.objects.current_for(self.user)
+            else:
+                self._membership = None
+        return self._membership
+
+    def invalidate(self, user_id):
+        """Forget the cached membership if it belongs to user_id."""
+        if self.user.is_authenticated and self.user.pk == user_id:
+            self._membership = empty
+            self.proxy._wrapped = empty
+
+
+class LazyMembership(LazyObject):
+    """
+    Stands in for the active membership until it is first used.
+    Like request.user, test it for truth rather than comparing it to None.
+    """
+
+    def __init__(self, resolver):
+        self.__dict__["_resolver"] = resolver
+        super().__init__()
+
+    def _setup(self):
+        self._wrapped = self._resolver.get()
+
+
+def current_membership_resolver():
+    """Return the resolver of the request being handled, if any."""
+    return _current_resolver.get()
+
+
+class MembershipMiddleware:
+    """Attach request.membership. Must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        resolver = MembershipResolver(request.user)
+        request.membership = resolver.proxy
+        token = _current_resolver.set(resolver)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_resolver.reset(token)
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_booked_count(apps, schema_editor):
+    Event = apps.get_model('club', 'Event')
+    EventRegistration = apps.get_model('club', 'EventRegistration')
+    booked = (EventRegistration.objects
+              .filter(event=OuterRef('pk'), status='booked')
+              .order_by()
+              .values('event')
+              .annotate(total=Count('pk'))
+              .values('total'))
+    Event.objects.update(booked_count=Coalesce(Subquery(booked), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0002_alter_eventregistration_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_booked_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0003_event_booked_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['trainer', 'is_cancelled', 'date', 'start_time'], name='event_trainer_upcoming_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['date', 'start_time', 'id'], name='event_open_upcoming_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['user', 'status'], name='registration_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['event', 'status'], name='registration_event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'end_date', 'start_date'], name='membership_user_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['plan', 'status'], name='membership_plan_status_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='series_detached',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('event_type', models.CharField(choices=[('running_club', 'Running club'), ('class', 'Class / session'), ('challenge', 'Challenge (e.g. 1000 burpees)')], default='running_club', max_length=20)),
+                ('distance_km', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('target_reps', models.PositiveIntegerField(blank=True, null=True)),
+                ('capacity', models.PositiveIntegerField(default=20)),
+                ('price_non_member', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('price_member', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days or weeks.')),
+                ('weekdays', models.CharField(blank=True, help_text='Weekly series only: comma-separated weekdays, 0=Monday. Defaults to the weekday of the first date.', max_length=13)),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('trainer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='event_series', to='club.trainerprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'event series',
+                'ordering': ['starts_on', 'start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='club.eventseries'),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('series', 'date'), name='event_series_date_unique'),
+        ),
+    ]
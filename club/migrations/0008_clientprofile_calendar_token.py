@@ -0,0 +1,32 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def fill_calendar_tokens(apps, schema_editor):
+    ClientProfile = apps.get_model('club', 'ClientProfile')
+    profiles = list(ClientProfile.objects.only('pk'))
+    for profile in profiles:
+        profile.calendar_token = uuid.uuid4()
+    ClientProfile.objects.bulk_update(profiles, ['calendar_token'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientprofile',
+            name='calendar_token',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_calendar_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='clientprofile',
+            name='calendar_token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
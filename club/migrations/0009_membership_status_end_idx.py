@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def expire_ended_memberships(apps, schema_editor):
+    # one-off catch-up; the expire_memberships command keeps it current
+    Membership = apps.get_model('club', 'Membership')
+    Membership.objects.filter(
+        status='active', end_date__lt=timezone.now().date()
+    ).update(status='expired')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0008_clientprofile_calendar_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['status', 'end_date'], name='membership_status_end_idx'),
+        ),
+        migrations.RunPython(expire_ended_memberships, migrations.RunPython.noop),
+    ]
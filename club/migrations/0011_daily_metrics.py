@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0010_membership_renewal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('active_memberships', models.PositiveIntegerField(default=0, help_text="Memberships of the trainer's plans running on the day.")),
+                ('new_signups', models.PositiveIntegerField(default=0, help_text='Memberships started on the day, renewals excluded.')),
+                ('registrations', models.PositiveIntegerField(default=0, help_text='Event registrations made on the day.')),
+                ('attendance', models.PositiveIntegerField(default=0, help_text='Registrations marked attended for events held on the day.')),
+                ('revenue_cents', models.PositiveBigIntegerField(default=0, help_text='Succeeded plan payments made on the day.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily metrics',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['booked_at'], name='registration_booked_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailymetrics',
+            name='trainer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='club.trainerprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymetrics',
+            index=models.Index(fields=['date'], name='daily_metrics_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailymetrics',
+            constraint=models.UniqueConstraint(condition=models.Q(('trainer__isnull', False)), fields=('date', 'trainer'), name='daily_metrics_trainer_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailymetrics',
+            constraint=models.UniqueConstraint(condition=models.Q(('trainer__isnull', True)), fields=('date',), name='daily_metrics_club_day'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0011_daily_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BodyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('weight_kg', models.DecimalField(decimal_places=1, max_digits=4)),
+                ('height_cm', models.DecimalField(decimal_places=1, max_digits=4)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='body_metrics', to='club.clientprofile')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('client', 'date'), name='body_metric_client_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:26
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_occurrence_date(apps, schema_editor):
+    Event = apps.get_model('club', 'Event')
+    # the original slot was not recorded; the current date is the best guess
+    Event.objects.filter(series__isnull=False).update(occurrence_date=F('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('club', '0012_body_metric'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='event',
+            name='event_series_date_unique',
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='occurrence_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_occurrence_date, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('series', 'occurrence_date'), name='event_series_occurrence_unique'),
+        ),
+    ]
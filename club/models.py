@@ -1,8 +1,14 @@
+import uuid
 from datetime import timedelta
 from django.conf import settings
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
+from .feed_cache import invalidate_trainer_feed
+from .search import match_expression, search_terms
+
 
 class TrainerProfile(models.Model):
     """
@@ -63,6 +69,9 @@ class ClientProfile(models.Model):
         blank=True,
     )
 
+    # Secret part of the client's calendar feed URL; calendar apps cannot log in
+    calendar_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username} (client)"
 
@@ -74,12 +83,7 @@ class ClientProfile(models.Model):
         Get the currently active membership for this client.
         Returns the most recent non-expired membership if available.
         """
-        today = timezone.now().date()
-        return (Membership.objects
-                .filter(user=self.user, start_date__lte=today, end_date__gte=today)
-                .select_related("plan")
-                .order_by("-end_date")
-                .first())
+        return Membership.objects.current_for(self.user)
 
     @property
     def has_active_membership(self):
@@ -121,6 +125,63 @@ class MembershipPlan(models.Model):
     def __str__(self):
         return f"{self.name} ({self.billing_interval})"
 
+    # Length of one membership term for each billing interval
+    TERM_LENGTHS = {
+        'monthly': timedelta(days=30),
+        'yearly': timedelta(days=365),
+    }
+
+    @property
+    def term_length(self):
+        """Length of one membership term of this plan, or None if unknown."""
+        return self.TERM_LENGTHS.get(self.billing_interval)
+
+    def term_end(self, start_date):
+        """
+        End date of a membership of this plan starting on start_date.
+        Monthly: 30 days from start_date
+        Yearly: 365 days from start_date
+        """
+        length = self.term_length
+        return start_date + length if length else None
+
+
+class MembershipQuerySet(models.QuerySet):
+    """
+    Custom queryset for memberships.
+    """
+
+    def current(self, day=None):
+        """
+        Active memberships whose dates cover day (default: today).
+        The date check stays because expire_memberships runs only periodically.
+        """
+        day = day or timezone.now().date()
+        return self.filter(status="active", start_date__lte=day, end_date__gte=day)
+
+    def current_for(self, user):
+        """Return the user's current membership with its plan, or None."""
+        return (self.filter(user=user)
+                .current()
+                .select_related("plan")
+                .order_by("-end_date")
+                .first())
+
+    def due_for_renewal(self, day=None, window_days=3):
+        """
+        Auto-renewing active memberships ending within window_days of day
+        (default: today) that have not been renewed yet.
+        """
+        day = day or timezone.now().date()
+        return self.filter(
+            auto_renew=True,
+            status="active",
+            end_date__gte=day,
+            end_date__lte=day + timedelta(days=window_days),
+            plan__is_active=True,
+            renewal__isnull=True,
+        )
+
 
 class Membership(models.Model):
     """
@@ -152,8 +213,37 @@ class Membership(models.Model):
     )
     auto_renew = models.BooleanField(default=False)
 
+    # The membership this one continues; unique, so a membership renews at most once
+    renewed_from = models.OneToOneField(
+        "self",
+        on_delete=models.SET_NULL,
+        related_name="renewal",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # Set while a renewal run is charging this membership (see payments.renewals)
+    renewal_claim = models.UUIDField(null=True, blank=True, editable=False)
+    renewal_claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = MembershipQuerySet.as_manager()
+
     class Meta:
         ordering = ["-end_date"]
+        indexes = [
+            # active_membership: user = ? AND start_date <= today AND end_date >= today
+            models.Index(fields=["user", "end_date", "start_date"], name="membership_user_dates_idx"),
+            # trainer dashboard: memberships of a trainer's plans by status
+            models.Index(fields=["plan", "status"], name="membership_plan_status_idx"),
+            # expire_memberships and status counts: status = ? AND end_date < today
+            models.Index(fields=["status", "end_date"], name="membership_status_end_idx"),
+            # renewal runs: auto-renewing active memberships by end date
+            models.Index(
+                fields=["end_date"],
+                name="membership_renewal_due_idx",
+                condition=Q(auto_renew=True, status="active"),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.plan.name} ({self.status})"
@@ -161,14 +251,10 @@ class Membership(models.Model):
     def save(self, *args, **kwargs):
         """
         Auto-calculate end_date based on billing_interval.
-        Monthly: 30 days from start_date
-        Yearly: 365 days from start_date
+        See MembershipPlan.term_end().
         """
         if not self.end_date and self.plan:
-            if self.plan.billing_interval == 'monthly':
-                self.end_date = self.start_date + timedelta(days=30)
-            elif self.plan.billing_interval == 'yearly':
-                self.end_date = self.start_date + timedelta(days=365)
+            self.end_date = self.plan.term_end(self.start_date)
         super().save(*args, **kwargs)
 
     @property
@@ -178,6 +264,88 @@ class Membership(models.Model):
         return self.status == "active" and self.end_date and self.end_date >= today
 
 
+def _booked_registrations():
+    """Correlated subquery counting booked registrations of the outer event."""
+    booked = (EventRegistration.objects
+              .filter(event=OuterRef("pk"), status="booked")
+              .order_by()
+              .values("event")
+              .annotate(total=Count("pk"))
+              .values("total"))
+    return Coalesce(Subquery(booked), Value(0))
+
+
+class EventQuerySet(models.QuerySet):
+    """
+    Custom queryset for events.
+    Provides availability annotations and helpers for the booked_count counter.
+    """
+
+    def with_availability(self):
+        """
+        Annotate booked count, spots left and a full flag on each event.
+        Event.registrations_count, spots_left and is_full use these when present.
+        """
+        return self.annotate(
+            annotated_booked=F("booked_count"),
+            annotated_spots_left=Greatest(
+                F("capacity") - F("booked_count"),
+                Value(0),
+                output_field=models.IntegerField(),
+            ),
+            annotated_is_full=Case(
+                When(booked_count__gte=F("capacity"), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def adjust_booked_count(self, event_id, delta):
+        """
+        Atomically shift booked_count for one event by delta.
+        Decrements never take the counter below 0.
+        """
+        queryset = self.filter(pk=event_id)
+        if delta < 0:
+            queryset = queryset.filter(booked_count__gte=-delta)
+        return queryset.update(booked_count=F("booked_count") + delta, updated_at=timezone.now())
+
+    def with_actual_booked(self):
+        """Annotate the booked count as recomputed from registration rows."""
+        return self.annotate(actual_booked=_booked_registrations())
+
+    def recount_booked(self):
+        """
+        Recompute booked_count from registration rows for every event in the queryset.
+        Used by bulk paths that bypass model signals (queryset.update, bulk_create),
+        so it also drops the cached event feeds of the affected trainers.
+        """
+        trainer_ids = set(self.values_list("trainer_id", flat=True))
+        updated = self.update(booked_count=_booked_registrations(), updated_at=timezone.now())
+
+        def invalidate_feeds():
+            for trainer_id in trainer_ids:
+                invalidate_trainer_feed(trainer_id)
+
+        transaction.on_commit(invalidate_feeds)
+        return updated
+
+    def search(self, query, ranked=True):
+        """
+        Full-text search over title, description and location.
+        Matches are annotated with search_rank and ordered best first, unless
+        ranked is False (e.g. when the caller applies its own ordering).
+        """
+        expressions = match_expression(connections[self.db], query)
+        if expressions is None:
+            return self.none()
+        condition, rank = expressions
+        queryset = self.filter(condition)
+        if ranked:
+            queryset = queryset.annotate(search_rank=rank).order_by("-search_rank")
+        return queryset
+
+
 class Event(models.Model):
     """
     Represents a fitness event hosted by a trainer.
@@ -224,8 +392,29 @@ class Event(models.Model):
     )
 
     capacity = models.PositiveIntegerField(default=20)
+    # Denormalised count of booked registrations, kept in step by club.signals
+    booked_count = models.PositiveIntegerField(default=0, editable=False)
     is_cancelled = models.BooleanField(default=False)
 
+    # Set when this row is a materialised occurrence of a recurring series
+    series = models.ForeignKey(
+        "EventSeries",
+        on_delete=models.SET_NULL,
+        related_name="occurrences",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # The occurrence's slot in the series; unlike date it does not change when
+    # the occurrence is moved, so the slot is never expanded again
+    occurrence_date = models.DateField(null=True, blank=True, editable=False)
+    # True once the occurrence has been edited on its own; series edits then skip it
+    series_detached = models.BooleanField(default=False, editable=False)
+
+    # Bumped by every write, including the F() updates of booked_count,
+    # so it can validate cached copies of the listing
+    updated_at = models.DateTimeField(auto_now=True)
+
     # Optional pricing – leave blank for free events
     price_non_member = models.DecimalField(
         max_digits=7,
@@ -242,12 +431,46 @@ class Event(models.Model):
         help_text="Leave blank if this event is free for members.",
     )
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         ordering = ["date", "start_time"]
+        indexes = [
+            # trainer listings and dashboards: trainer = ? AND is_cancelled = ? AND date >= ?
+            models.Index(
+                fields=["trainer", "is_cancelled", "date", "start_time"],
+                name="event_trainer_upcoming_idx",
+            ),
+            # public listing (no trainer filter), already in keyset order
+            models.Index(
+                fields=["date", "start_time", "id"],
+                name="event_open_upcoming_idx",
+                condition=Q(is_cancelled=False),
+            ),
+        ]
+        constraints = [
+            # one materialised row per series occurrence, wherever it was moved to
+            models.UniqueConstraint(
+                fields=["series", "occurrence_date"], name="event_series_occurrence_unique"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date} ({self.trainer})"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the event without writing booked_count back from memory.
+        The counter is only changed through F() updates, so a stale instance
+        (e.g. an edit form opened before a booking) cannot overwrite it.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "booked_count"
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def is_past(self):
         """Check if event date has passed."""
@@ -256,8 +479,19 @@ class Event(models.Model):
 
     @property
     def registrations_count(self):
-        """Count total booked registrations for this event."""
-        return self.registrations.filter(status="booked").count()
+        """
+        Count total booked registrations for this event.
+        Uses the with_availability() annotation when the event was loaded with it.
+        """
+        annotated = getattr(self, "annotated_booked", None)
+        if annotated is not None:
+            return annotated
+        # Re-read the counter so instances loaded before a booking stay accurate
+        current = (Event.objects
+                   .filter(pk=self.pk)
+                   .values_list("booked_count", flat=True)
+                   .first())
+        return current or 0
 
     @property
     def spots_left(self):
@@ -265,14 +499,215 @@ class Event(models.Model):
         Calculate remaining spots available.
         Does not go below 0 even if registrations exceed capacity.
         """
+        annotated = getattr(self, "annotated_spots_left", None)
+        if annotated is not None:
+            return annotated
         return max(self.capacity - self.registrations_count, 0)
 
     @property
     def is_full(self):
         """Check if event has reached capacity."""
+        annotated = getattr(self, "annotated_is_full", None)
+        if annotated is not None:
+            return annotated
         return self.spots_left <= 0
 
 
+class EventSeriesQuerySet(models.QuerySet):
+    """
+    Custom queryset for recurring event series.
+    Expands series into occurrences for a date window without creating rows.
+    """
+
+    def virtual_occurrences(self, start, end):
+        """
+        Return unsaved Event instances for every occurrence between start and end
+        (inclusive) that has no Event row yet, ordered like the events listing.
+        Rows are matched on their slot, so moved and cancelled occurrences are
+        not expanded again.
+        """
+        series_list = list(self.filter(is_active=True).select_related("trainer", "trainer__user"))
+        if not series_list:
+            return []
+
+        materialised = set(
+            Event.objects
+            .filter(series__in=series_list, occurrence_date__range=(start, end))
+            .values_list("series_id", "occurrence_date")
+        )
+        occurrences = [
+            series.build_occurrence(day)
+            for series in series_list
+            for day in series.occurrence_dates(start, end)
+            if (series.pk, day) not in materialised
+        ]
+        occurrences.sort(key=lambda event: (event.date, event.start_time, -event.series_id))
+        return occurrences
+
+    def search(self, query):
+        """
+        Series whose text contains every term of query.
+        Series are few, so unlike Event.objects.search() this is not indexed.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return self.none()
+        queryset = self
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+            )
+        return queryset
+
+
+class EventSeries(models.Model):
+    """
+    A recurring event, such as a weekly running club, hosted by a trainer.
+    Occurrences are expanded on demand; an Event row is only created for an
+    occurrence when it is booked or edited, and is kept (cancelled) when the
+    occurrence is deleted.
+    """
+    FREQUENCY_CHOICES = [
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+    ]
+
+    trainer = models.ForeignKey(
+        TrainerProfile,
+        on_delete=models.CASCADE,
+        related_name="event_series",
+        null=True,
+        blank=True,
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    event_type = models.CharField(
+        max_length=20,
+        choices=Event.EVENT_TYPE_CHOICES,
+        default="running_club",
+    )
+    distance_km = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True)
+    target_reps = models.PositiveIntegerField(blank=True, null=True)
+    capacity = models.PositiveIntegerField(default=20)
+    price_non_member = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    price_member = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+
+    start_time = models.TimeField()
+    end_time = models.TimeField(blank=True, null=True)
+
+    # Recurrence rule
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default="weekly")
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Repeat every N days or weeks.",
+    )
+    weekdays = models.CharField(
+        max_length=13,
+        blank=True,
+        help_text="Weekly series only: comma-separated weekdays, 0=Monday. "
+                  "Defaults to the weekday of the first date.",
+    )
+    starts_on = models.DateField()
+    ends_on = models.DateField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventSeriesQuerySet.as_manager()
+
+    # Fields copied from the series onto each occurrence
+    OCCURRENCE_FIELDS = [
+        "trainer_id", "title", "description", "location", "event_type",
+        "distance_km", "target_reps", "capacity", "price_non_member",
+        "price_member", "start_time", "end_time",
+    ]
+
+    class Meta:
+        ordering = ["starts_on", "start_time"]
+        verbose_name_plural = "event series"
+
+    def __str__(self):
+        return f"{self.title} ({self.get_frequency_display()}, {self.trainer})"
+
+    def save(self, *args, **kwargs):
+        """
+        Save the series and push the change to its future occurrences.
+        Materialised occurrences that were not edited on their own are
+        updated with a single UPDATE, however many of them there are.
+        """
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            (Event.objects
+             .filter(series=self, series_detached=False, date__gte=timezone.now().date())
+             .update(updated_at=timezone.now(),
+                     **{field: getattr(self, field) for field in self.OCCURRENCE_FIELDS}))
+
+    def get_weekdays(self):
+        """Return the sorted weekdays (0=Monday) a weekly series runs on."""
+        days = sorted({int(day) for day in self.weekdays.split(",") if day.strip().isdigit()} & set(range(7)))
+        return days or [self.starts_on.weekday()]
+
+    def occurrence_dates(self, start, end):
+        """
+        Yield occurrence dates between start and end (inclusive), lazily.
+        Work is proportional to the window, not to the length of the series.
+        """
+        start = max(start, self.starts_on)
+        if self.ends_on:
+            end = min(end, self.ends_on)
+        if start > end:
+            return
+        interval = max(self.interval, 1)
+
+        if self.frequency == "daily":
+            day = start + timedelta(days=-(start - self.starts_on).days % interval)
+            while day <= end:
+                yield day
+                day += timedelta(days=interval)
+            return
+
+        weekdays = self.get_weekdays()
+        first_monday = self.starts_on - timedelta(days=self.starts_on.weekday())
+        week = (start - first_monday).days // 7
+        week += -week % interval  # skip ahead to the next week the series runs in
+        monday = first_monday + timedelta(weeks=week)
+        while monday <= end:
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if start <= day <= end:
+                    yield day
+            monday += timedelta(weeks=interval)
+
+    def occurs_on(self, day):
+        """Check if the series has an occurrence on day."""
+        return next(self.occurrence_dates(day, day), None) == day
+
+    def build_occurrence(self, day):
+        """Return an unsaved Event for the occurrence on day, with availability preset."""
+        event = Event(
+            series=self,
+            date=day,
+            occurrence_date=day,
+            **{field: getattr(self, field) for field in self.OCCURRENCE_FIELDS},
+        )
+        if self.trainer_id:
+            event.trainer = self.trainer
+        # nothing is booked until the occurrence is materialised
+        event.annotated_booked = 0
+        event.annotated_spots_left = self.capacity
+        event.annotated_is_full = self.capacity <= 0
+        return event
+
+    def materialize(self, day):
+        """Return the Event row for the occurrence on day, creating it if needed."""
+        Event.objects.bulk_create([self.build_occurrence(day)], ignore_conflicts=True)
+        event = Event.objects.get(series=self, occurrence_date=day)
+        trainer_id = self.trainer_id
+        transaction.on_commit(lambda: invalidate_trainer_feed(trainer_id))
+        return event
+
+
 class EventRegistration(models.Model):
     """
     Represents a client's registration for an event.
@@ -292,6 +727,109 @@ class EventRegistration(models.Model):
 
     class Meta:
         unique_together = ("user", "event")  # Prevent duplicate registrations
+        indexes = [
+            models.Index(fields=["user", "status"], name="registration_user_status_idx"),
+            models.Index(fields=["event", "status"], name="registration_event_status_idx"),
+            # daily metrics rollup: registrations made on a range of days
+            models.Index(fields=["booked_at"], name="registration_booked_at_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} -> {self.event} ({self.status})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored status so signals can detect booked/cancelled flips."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+
+class DailyMetrics(models.Model):
+    """
+    KPI snapshot of one trainer on one day, written by the rollup_metrics
+    command (see club.metrics). Rows with a null trainer cover the club's
+    own plans and events without a trainer.
+    """
+    date = models.DateField()
+    trainer = models.ForeignKey(
+        TrainerProfile,
+        on_delete=models.CASCADE,
+        related_name="daily_metrics",
+        null=True,
+        blank=True,
+    )
+
+    active_memberships = models.PositiveIntegerField(
+        default=0, help_text="Memberships of the trainer's plans running on the day."
+    )
+    new_signups = models.PositiveIntegerField(
+        default=0, help_text="Memberships started on the day, renewals excluded."
+    )
+    registrations = models.PositiveIntegerField(
+        default=0, help_text="Event registrations made on the day."
+    )
+    attendance = models.PositiveIntegerField(
+        default=0, help_text="Registrations marked attended for events held on the day."
+    )
+    revenue_cents = models.PositiveBigIntegerField(
+        default=0, help_text="Succeeded plan payments made on the day."
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name_plural = "daily metrics"
+        constraints = [
+            # NULL trainers are never equal in a plain unique constraint
+            models.UniqueConstraint(
+                fields=["date", "trainer"],
+                condition=Q(trainer__isnull=False),
+                name="daily_metrics_trainer_day",
+            ),
+            models.UniqueConstraint(
+                fields=["date"],
+                condition=Q(trainer__isnull=True),
+                name="daily_metrics_club_day",
+            ),
+        ]
+        indexes = [
+            # dashboard charts: date >= ?
+            models.Index(fields=["date"], name="daily_metrics_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.trainer or 'club'}"
+
+    @property
+    def revenue(self):
+        """Revenue in major currency units."""
+        return self.revenue_cents / 100
+
+
+class BodyMetric(models.Model):
+    """
+    A client's body measurements on one day. Logging again on the same day
+    replaces the day's row, so a history grows by at most one row a day.
+    """
+    client = models.ForeignKey(
+        ClientProfile,
+        on_delete=models.CASCADE,
+        related_name="body_metrics",
+    )
+    date = models.DateField()
+    weight_kg = models.DecimalField(max_digits=4, decimal_places=1)
+    height_cm = models.DecimalField(max_digits=4, decimal_places=1)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            # also the index of progress and latest-metric reads
+            models.UniqueConstraint(fields=["client", "date"], name="body_metric_client_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.client} {self.date}: {self.weight_kg} kg"
@@ -0,0 +1,90 @@
+"""
+Keyset (cursor) pagination for event listings.
+Pages are found with an indexed range filter on (date, start_time, id)
+instead of OFFSET, so every page costs the same however deep it is.
+"""
+import base64
+from datetime import date, time
+
+from django.db.models import Q
+
+KEYSET_ORDERING = ("date", "start_time", "id")
+
+
+def _value(event, name):
+    # events are model instances, or dicts when paginating a values() queryset
+    return event[name] if isinstance(event, dict) else getattr(event, name)
+
+
+def _tie_breaker(event):
+    # unsaved series occurrences have no id; -series_id keeps them unique and
+    # sorts them before stored events in the same time slot
+    pk = _value(event, "id")
+    return pk if pk is not None else -_value(event, "series_id")
+
+
+def sort_key(event):
+    """Position of event in the listing order."""
+    return _value(event, "date"), _value(event, "start_time"), _tie_breaker(event)
+
+
+def encode_cursor(event):
+    """Encode the sort key of event into an opaque URL-safe cursor."""
+    day, start, tie_breaker = sort_key(event)
+    raw = f"{day.isoformat()}|{start.isoformat()}|{tie_breaker}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+    Returns (date, start_time, id), or None if the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        day, start, pk = raw.split("|")
+        return date.fromisoformat(day), time.fromisoformat(start), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, cursor, page_size, virtual=None):
+    """
+    Return (events, next_cursor) for the page that follows cursor.
+    next_cursor is None on the last page. queryset may be a values()
+    queryset that includes id, series_id, date and start_time.
+
+    virtual, if given, is called as virtual(start, end) and returns unsaved
+    events (recurring series occurrences) to merge into the page. end is None
+    when the stored events run out before the page is full.
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+
+    position = decode_cursor(cursor)
+    if position:
+        day, start, pk = position
+        queryset = queryset.filter(
+            Q(date__gt=day)
+            | Q(date=day, start_time__gt=start)
+            | Q(date=day, start_time=start, id__gt=pk)
+        )
+
+    # fetch one extra row to learn whether another page exists
+    events = list(queryset[:page_size + 1])
+
+    if virtual is not None:
+        # occurrences after the last stored row fetched cannot reach this page
+        window_start = position[0] if position else None
+        window_end = _value(events[-1], "date") if len(events) > page_size else None
+        extra = virtual(window_start, window_end)
+        if position:
+            extra = [event for event in extra if sort_key(event) > position]
+        events = sorted(events + extra, key=sort_key)[:page_size + 1]
+
+    if len(events) > page_size:
+        events = events[:page_size]
+        return events, encode_cursor(events[-1])
+    return events, None
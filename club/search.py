@@ -0,0 +1,149 @@
+"""
+Full-text search over events (title, description and location).
+
+SQLite uses an FTS5 table kept in sync by triggers; Postgres uses a generated
+tsvector column with a GIN index. Both are maintained by the database itself,
+so queryset.update() and bulk_create() stay searchable without signals.
+"""
+import re
+
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "club_event_fts"
+EVENT_TABLE = "club_event"
+TEXT_SEARCH_CONFIG = "english"
+
+# Relative weight of each column: a hit in the title counts most
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 4.0)  # title, description, location
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {EVENT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {EVENT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+        END
+    """,
+    # only text changes touch the index, not booked_count updates
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, description, location ON {EVENT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+            INSERT INTO {FTS_TABLE}(rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END
+    """,
+}
+
+POSTGRES_VECTOR = (
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(location, '')), 'B') || "
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+)
+
+
+def search_terms(query):
+    """Split a user query into plain word terms, dropping any operators."""
+    return re.findall(r"\w+", query or "")
+
+
+def install_search_index(connection):
+    """Create the full-text index for events and fill it from existing rows."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"title, description, location, "
+                f"content='{EVENT_TABLE}', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"ALTER TABLE {EVENT_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS event_search_vector_idx "
+                f"ON {EVENT_TABLE} USING GIN (search_vector)"
+            )
+
+
+def uninstall_search_index(connection):
+    """Drop the full-text index created by install_search_index()."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS event_search_vector_idx")
+            cursor.execute(f"ALTER TABLE {EVENT_TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+def repair_search_index(connection):
+    """
+    Reinstall the SQLite triggers if a migration dropped them.
+    Django rebuilds SQLite tables for many schema changes, which silently
+    drops every trigger on club_event.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name = %s OR tbl_name = %s",
+            [FTS_TABLE, EVENT_TABLE],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+    if FTS_TABLE in existing and not set(SQLITE_TRIGGERS) <= existing:
+        install_search_index(connection)
+
+
+def match_expression(connection, query):
+    """
+    Return (condition, rank) expressions matching events against query,
+    or None if the query has no searchable terms.
+    Every term must match; the last term also matches as a prefix.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        condition = RawSQL(
+            f"{EVENT_TABLE}.search_vector @@ to_tsquery(%s, %s)",
+            [TEXT_SEARCH_CONFIG, tsquery],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({EVENT_TABLE}.search_vector, to_tsquery(%s, %s))",
+            [TEXT_SEARCH_CONFIG, tsquery],
+            output_field=FloatField(),
+        )
+        return condition, rank
+
+    match = " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+    condition = RawSQL(
+        f"{EVENT_TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+        [match],
+        output_field=BooleanField(),
+    )
+    # bm25() is lower for better matches
+    weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+    rank = RawSQL(
+        f"(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {EVENT_TABLE}.id)",
+        [match],
+        output_field=FloatField(),
+    )
+    return condition, rank
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import ClientProfile
+from .feed_cache import invalidate_trainer_feed
+from .middleware import current_membership_resolver
+from .models import ClientProfile, Event, EventRegistration, EventSeries, Membership
+from .search import repair_search_index
 
 @receiver(post_save, sender=User)
 def create_client_profile(sender, instance, created, **kwargs):
@@ -13,4 +17,63 @@ def create_client_profile(sender, instance, created, **kwargs):
             import logging
             logging.getLogger(__name__).exception(
                 "Failed to create ClientProfile for user %s", instance
-            )
\ No newline at end of file
+            )
+
+
+@receiver(post_save, sender=EventRegistration)
+def update_booked_count_on_save(sender, instance, created, **kwargs):
+    # keep Event.booked_count in step when a registration is booked or cancelled
+    previous = None if created else getattr(instance, "_loaded_status", None)
+    was_booked = previous == "booked"
+    is_booked = instance.status == "booked"
+    if is_booked != was_booked:
+        Event.objects.adjust_booked_count(instance.event_id, 1 if is_booked else -1)
+        _invalidate_feed_for_event(instance.event_id)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=EventRegistration)
+def update_booked_count_on_delete(sender, instance, **kwargs):
+    if getattr(instance, "_loaded_status", instance.status) == "booked":
+        Event.objects.adjust_booked_count(instance.event_id, -1)
+        _invalidate_feed_for_event(instance.event_id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_feed_on_event_change(sender, instance, **kwargs):
+    # drop cached listing pages once the change is visible to other requests
+    trainer_id = instance.trainer_id
+    transaction.on_commit(lambda: invalidate_trainer_feed(trainer_id))
+
+
+@receiver(post_save, sender=EventSeries)
+@receiver(post_delete, sender=EventSeries)
+def invalidate_feed_on_series_change(sender, instance, **kwargs):
+    # series occurrences are expanded into the listing, so cached pages are stale
+    trainer_id = instance.trainer_id
+    transaction.on_commit(lambda: invalidate_trainer_feed(trainer_id))
+
+
+def _invalidate_feed_for_event(event_id):
+    trainer_id = (Event.objects
+                  .filter(pk=event_id)
+                  .values_list("trainer_id", flat=True)
+                  .first())
+    transaction.on_commit(lambda: invalidate_trainer_feed(trainer_id))
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_request_membership(sender, instance, **kwargs):
+    # the membership resolved for this request may no longer be current
+    resolver = current_membership_resolver()
+    if resolver is not None:
+        resolver.invalidate(instance.user_id)
+
+
+@receiver(post_migrate)
+def repair_event_search_index(sender, using, **kwargs):
+    # SQLite table rebuilds during migrations drop the search triggers
+    if sender.name == "club":
+        repair_search_index(connections[using])
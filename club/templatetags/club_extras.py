@@ -14,3 +14,12 @@ def has_attr(obj, attr_name):
         return hasattr(obj, attr_name)
     except Exception:
         return False
+
+
+@register.filter
+def cents(amount):
+    """Format an amount in cents (or pennies) as major units, e.g. 1250 -> 12.50."""
+    try:
+        return f"{int(amount) / 100:.2f}"
+    except (TypeError, ValueError):
+        return ""
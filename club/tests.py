@@ -1,14 +1,27 @@
 from datetime import timedelta
-from django.test import TestCase, Client
+from unittest import skipUnless
+
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
 
 from .models import (
     TrainerProfile, ClientProfile, MembershipPlan, 
-    Membership, Event, EventRegistration
+    Membership, Event, EventRegistration, EventSeries, DailyMetrics, BodyMetric
 )
 
+try:
+    import numpy
+except ImportError:  # optional: the batch BMI pass falls back to pure Python
+    numpy = None
+
+# Rendering pages in tests should not depend on a collected staticfiles manifest.
+PLAIN_STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 
 class TrainerProfileTestCase(TestCase):
     """Test TrainerProfile model and operations"""
@@ -616,3 +629,2298 @@ class FormValidationTestCase(TestCase):
         
         # Should redirect or show error
         self.assertNotEqual(response.status_code, 200)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class EventAvailabilityTests(TestCase):
+    """Test with_availability() annotations and listing query counts"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.client_user = User.objects.create_user(username='runner', password='pw')
+        profile = self.client_user.client_profile
+        profile.primary_trainer = self.trainer
+        profile.save()
+        plan = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        Membership.objects.create(user=self.client_user, plan=plan, start_date=timezone.now().date())
+
+    def _make_events(self, count, capacity=2):
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        events = []
+        for i in range(count):
+            event = Event.objects.create(
+                trainer=self.trainer,
+                title=f'Session {i}',
+                date=tomorrow,
+                start_time=timezone.now().time(),
+                capacity=capacity,
+            )
+            EventRegistration.objects.create(user=self.client_user, event=event, status='booked')
+            events.append(event)
+        return events
+
+    def _count_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_annotation_matches_properties(self):
+        """Annotated values agree with the per-instance fallbacks"""
+        event = self._make_events(1, capacity=1)[0]
+        annotated = Event.objects.with_availability().get(pk=event.pk)
+
+        self.assertEqual(annotated.annotated_booked, 1)
+        self.assertEqual(annotated.registrations_count, event.registrations_count)
+        self.assertEqual(annotated.spots_left, 0)
+        self.assertTrue(annotated.is_full)
+
+    def test_annotation_ignores_cancelled(self):
+        """Cancelled registrations do not use up spots"""
+        event = self._make_events(1)[0]
+        registration = EventRegistration.objects.get(event=event)
+        registration.status = 'cancelled'
+        registration.save()
+        annotated = Event.objects.with_availability().get(pk=event.pk)
+
+        self.assertEqual(annotated.registrations_count, 0)
+        self.assertEqual(annotated.spots_left, 2)
+        self.assertFalse(annotated.is_full)
+
+    def test_annotated_properties_do_not_query(self):
+        """Properties read the annotation instead of counting rows"""
+        self._make_events(3)
+        events = list(Event.objects.with_availability())
+        with self.assertNumQueries(0):
+            for event in events:
+                event.registrations_count
+                event.spots_left
+                event.is_full
+
+    def test_events_page_query_count_is_constant(self):
+        """EventsView query count does not grow with the number of events"""
+        self.client.login(username='runner', password='pw')
+        self._make_events(1)
+        baseline = self._count_queries(reverse('events'))
+        self._make_events(10)
+        self.assertEqual(self._count_queries(reverse('events')), baseline)
+
+    def test_client_dashboard_query_count_is_constant(self):
+        """client_dashboard query count does not grow with the number of events"""
+        self.client.login(username='runner', password='pw')
+        self._make_events(1)
+        baseline = self._count_queries(reverse('client_dashboard'))
+        self._make_events(10)
+        self.assertEqual(self._count_queries(reverse('client_dashboard')), baseline)
+
+    def test_trainer_dashboard_query_count_is_constant(self):
+        """trainer_dashboard query count does not grow with the number of events"""
+        self.client.login(username='coach', password='pw')
+        self._make_events(1)
+        baseline = self._count_queries(reverse('trainer_dashboard'))
+        self._make_events(10)
+        self.assertEqual(self._count_queries(reverse('trainer_dashboard')), baseline)
+
+    def test_event_detail_uses_annotation(self):
+        """EventDetailView loads availability with the event itself"""
+        event = self._make_events(1, capacity=1)[0]
+        self.client.login(username='runner', password='pw')
+        response = self.client.get(reverse('event_detail', args=[event.id]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['event'].annotated_booked, 1)
+        self.assertContains(response, 'Fully booked')
+
+
+class EventBookedCounterTests(TestCase):
+    """Test the denormalised Event.booked_count column"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.event = Event.objects.create(
+            trainer=self.trainer,
+            title='Track Night',
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=timezone.now().time(),
+            capacity=5,
+        )
+        self.users = [
+            User.objects.create_user(username=f'runner{i}', password='pw')
+            for i in range(3)
+        ]
+
+    def _stored_count(self):
+        return Event.objects.values_list('booked_count', flat=True).get(pk=self.event.pk)
+
+    def test_booking_increments_counter(self):
+        """Creating a booked registration increments booked_count"""
+        EventRegistration.objects.create(user=self.users[0], event=self.event)
+        EventRegistration.objects.create(user=self.users[1], event=self.event)
+        self.assertEqual(self._stored_count(), 2)
+
+    def test_cancel_and_rebook_adjust_counter(self):
+        """Flipping status between booked and cancelled moves the counter"""
+        EventRegistration.objects.create(user=self.users[0], event=self.event)
+        registration = EventRegistration.objects.get(user=self.users[0])
+        registration.status = 'cancelled'
+        registration.save()
+        self.assertEqual(self._stored_count(), 0)
+        registration.status = 'booked'
+        registration.save()
+        self.assertEqual(self._stored_count(), 1)
+
+    def test_resaving_booked_registration_keeps_counter(self):
+        """Saving a registration without changing status does not double count"""
+        registration = EventRegistration.objects.create(user=self.users[0], event=self.event)
+        registration.attended = True
+        registration.save()
+        self.assertEqual(self._stored_count(), 1)
+
+    def test_delete_decrements_counter(self):
+        """Deleting booked registrations, singly or in bulk, decrements the counter"""
+        for user in self.users:
+            EventRegistration.objects.create(user=user, event=self.event)
+        EventRegistration.objects.filter(user=self.users[0]).first().delete()
+        EventRegistration.objects.filter(event=self.event).delete()
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_stale_event_save_keeps_counter(self):
+        """Saving an event loaded before a booking does not overwrite booked_count"""
+        stale = Event.objects.get(pk=self.event.pk)
+        EventRegistration.objects.create(user=self.users[0], event=self.event)
+        stale.title = 'Track Night (updated)'
+        stale.save()
+        self.assertEqual(self._stored_count(), 1)
+
+    def test_capacity_reads_counter(self):
+        """is_full and spots_left follow the counter column"""
+        Event.objects.filter(pk=self.event.pk).update(booked_count=5)
+        event = Event.objects.with_availability().get(pk=self.event.pk)
+        self.assertTrue(event.is_full)
+        self.assertEqual(event.spots_left, 0)
+
+    def test_recount_booked_after_bulk_update(self):
+        """recount_booked() repairs counters after a bulk update"""
+        for user in self.users:
+            EventRegistration.objects.create(user=user, event=self.event)
+        EventRegistration.objects.filter(event=self.event).update(status='cancelled')
+        self.assertEqual(self._stored_count(), 3)
+        Event.objects.filter(pk=self.event.pk).recount_booked()
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """reconcile_event_counters recomputes drifted counters in batches"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        EventRegistration.objects.create(user=self.users[0], event=self.event)
+        other = Event.objects.create(
+            trainer=self.trainer,
+            title='Hill Repeats',
+            date=timezone.now().date() + timedelta(days=2),
+            start_time=timezone.now().time(),
+        )
+        Event.objects.filter(pk=self.event.pk).update(booked_count=4)
+        Event.objects.filter(pk=other.pk).update(booked_count=2)
+
+        out = StringIO()
+        call_command('reconcile_event_counters', '--dry-run', stdout=out)
+        self.assertIn('would fix 2', out.getvalue())
+        self.assertEqual(self._stored_count(), 4)
+
+        out = StringIO()
+        call_command('reconcile_event_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('fixed 2', out.getvalue())
+        self.assertEqual(self._stored_count(), 1)
+        self.assertEqual(Event.objects.get(pk=other.pk).booked_count, 0)
+
+
+class BookingEngineTests(TestCase):
+    """Test the book_event() booking service and join_event view"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.event = Event.objects.create(
+            trainer=self.trainer,
+            title='Challenge Day',
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=timezone.now().time(),
+            capacity=1,
+        )
+        self.user = User.objects.create_user(username='runner', password='pw')
+        self.other = User.objects.create_user(username='runner2', password='pw')
+
+    def test_book_event_books_seat(self):
+        """A successful booking creates the registration and takes a seat"""
+        from club.booking import BookingResult, book_event
+
+        self.assertIs(book_event(self.user, self.event.id), BookingResult.BOOKED)
+        self.assertTrue(EventRegistration.objects.filter(user=self.user, status='booked').exists())
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 1)
+
+    def test_book_event_full(self):
+        """A full event rejects further bookings without writing anything"""
+        from club.booking import BookingResult, book_event
+
+        book_event(self.user, self.event.id)
+        self.assertIs(book_event(self.other, self.event.id), BookingResult.FULL)
+        self.assertFalse(EventRegistration.objects.filter(user=self.other).exists())
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 1)
+
+    def test_book_event_already_booked(self):
+        """Booking twice reports already booked and keeps a single seat"""
+        from club.booking import BookingResult, book_event
+
+        Event.objects.filter(pk=self.event.pk).update(capacity=5)
+        book_event(self.user, self.event.id)
+        self.assertIs(book_event(self.user, self.event.id), BookingResult.ALREADY_BOOKED)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 1)
+
+    def test_book_event_past(self):
+        """Past events cannot be booked"""
+        from club.booking import BookingResult, book_event
+
+        Event.objects.filter(pk=self.event.pk).update(date=timezone.now().date() - timedelta(days=1))
+        self.assertIs(book_event(self.user, self.event.id), BookingResult.PAST)
+
+    def test_book_event_cancelled(self):
+        """Cancelled events cannot be booked and keep their seats"""
+        from club.booking import BookingResult, book_event
+
+        Event.objects.filter(pk=self.event.pk).update(is_cancelled=True)
+        self.assertIs(book_event(self.user, self.event.id), BookingResult.CANCELLED)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 0)
+        self.assertFalse(EventRegistration.objects.exists())
+
+    def test_book_event_rebooks_cancelled(self):
+        """A cancelled registration is flipped back to booked"""
+        from club.booking import BookingResult, book_event
+
+        registration = EventRegistration.objects.create(user=self.user, event=self.event)
+        registration.status = 'cancelled'
+        registration.save()
+        self.assertIs(book_event(self.user, self.event.id), BookingResult.BOOKED)
+        registration.refresh_from_db()
+        self.assertEqual(registration.status, 'booked')
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 1)
+
+    def test_book_event_missing_event(self):
+        """Unknown events raise DoesNotExist"""
+        from club.booking import book_event
+
+        with self.assertRaises(Event.DoesNotExist):
+            book_event(self.user, self.event.id + 999)
+
+    def test_join_event_view_uses_booking_engine(self):
+        """join_event books through the service and reports a full event"""
+        plan = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        for user in (self.user, self.other):
+            Membership.objects.create(user=user, plan=plan, start_date=timezone.now().date())
+
+        self.client.login(username='runner', password='pw')
+        self.client.post(reverse('join_event', args=[self.event.id]), secure=True)
+        self.client.login(username='runner2', password='pw')
+        response = self.client.post(reverse('join_event', args=[self.event.id]), secure=True)
+
+        self.assertRedirects(response, reverse('events'), fetch_redirect_response=False)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).booked_count, 1)
+        self.assertEqual(EventRegistration.objects.filter(event=self.event).count(), 1)
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    """Stress book_event() from many threads at once"""
+
+    def test_concurrent_bookings_never_exceed_capacity(self):
+        """Competing threads can fill the event but never overbook it"""
+        import threading
+        from django.db import OperationalError, connection
+        from club.booking import BookingResult, book_event
+
+        capacity = 5
+        trainer = TrainerProfile.objects.create(
+            user=User.objects.create(username='coach')
+        )
+        event = Event.objects.create(
+            trainer=trainer,
+            title='Flash Challenge',
+            date=timezone.now().date() + timedelta(days=1),
+            start_time=timezone.now().time(),
+            capacity=capacity,
+        )
+        User.objects.bulk_create(
+            [User(username=f'racer{i}') for i in range(25)]
+        )
+        users = list(User.objects.filter(username__startswith='racer'))
+
+        results = []
+        results_lock = threading.Lock()
+        start = threading.Barrier(len(users))
+
+        def attempt(user):
+            try:
+                start.wait()
+                while True:
+                    try:
+                        result = book_event(user, event.id)
+                        break
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting; retry
+                        continue
+                with results_lock:
+                    results.append(result)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        booked_rows = EventRegistration.objects.filter(event=event, status='booked').count()
+        self.assertEqual(len(results), len(users))
+        self.assertEqual(results.count(BookingResult.BOOKED), capacity)
+        self.assertEqual(results.count(BookingResult.FULL), len(users) - capacity)
+        self.assertEqual(booked_rows, capacity)
+        self.assertEqual(event.booked_count, capacity)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class EventsPaginationTests(TestCase):
+    """Test keyset and offset pagination of the events listing"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        # several events share a date and start time so the id tie-breaker matters
+        self.events = Event.objects.bulk_create([
+            Event(
+                trainer=self.trainer,
+                title=f'Session {i:02d}',
+                date=tomorrow + timedelta(days=i // 4),
+                start_time='07:00' if i % 2 else '18:00',
+                event_type='running_club' if i % 3 == 0 else 'class',
+                distance_km=5 if i % 3 == 0 else None,
+            )
+            for i in range(30)
+        ])
+        self.expected_order = list(
+            Event.objects.order_by('date', 'start_time', 'id').values_list('id', flat=True)
+        )
+
+    def _walk(self, params=None):
+        """Follow next-page links and return the ids seen, in order."""
+        from urllib.parse import parse_qs
+
+        params = dict(params or {})
+        seen = []
+        for _ in range(10):
+            response = self.client.get(reverse('events'), params, secure=True)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(event.id for event in response.context['events'])
+            next_query = response.context['next_page_query']
+            if not next_query:
+                return seen
+            params = {key: values[0] for key, values in parse_qs(next_query).items()}
+        self.fail('pagination did not terminate')
+
+    def test_keyset_pages_cover_all_events_in_order(self):
+        """Walking the cursor returns every event once, in listing order"""
+        self.assertEqual(self._walk(), self.expected_order)
+
+    def test_offset_fallback_matches_keyset(self):
+        """?page=N offset pagination returns the same order"""
+        self.assertEqual(self._walk({'page': 1}), self.expected_order)
+
+    def test_filters_are_kept_across_pages(self):
+        """Type filters apply to every page"""
+        expected = list(
+            Event.objects.filter(event_type='running_club')
+            .order_by('date', 'start_time', 'id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(self._walk({'type': 'running_club'}), expected)
+
+    def test_fragment_renders_cards_only(self):
+        """fragment=1 returns the next batch of cards without the page layout"""
+        from club.pagination import encode_cursor
+
+        cursor = encode_cursor(Event.objects.get(pk=self.expected_order[11]))
+        response = self.client.get(
+            reverse('events'), {'cursor': cursor, 'fragment': '1'}, secure=True
+        )
+        self.assertTemplateUsed(response, 'partials/events_page.html')
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'class="event-card"', count=12)
+        self.assertContains(response, 'data-load-more')
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        """A malformed cursor is ignored rather than erroring"""
+        response = self.client.get(reverse('events'), {'cursor': '!!bad'}, secure=True)
+        self.assertEqual(
+            [event.id for event in response.context['events']],
+            self.expected_order[:12],
+        )
+
+    def test_page_query_count_is_constant_with_depth(self):
+        """Deep pages cost the same number of queries as the first page"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from club.pagination import encode_cursor
+
+        deep_cursor = encode_cursor(Event.objects.get(pk=self.expected_order[-5]))
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(reverse('events'), secure=True)
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(reverse('events'), {'cursor': deep_cursor}, secure=True)
+        self.assertEqual(len(first.captured_queries), len(deep.captured_queries))
+
+
+class ExplainHotPathsCommandTests(TestCase):
+    """Test the explain_hot_paths index advisor command"""
+
+    def test_command_explains_views_and_rolls_back(self):
+        """Each hot view is explained and the seeded data is discarded"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command(
+            'explain_hot_paths', '--events', '40', '--clients', '6', '--trainers', '2',
+            stdout=out,
+        )
+        output = out.getvalue()
+
+        for label in ('events (anonymous)', 'client dashboard', 'trainer dashboard'):
+            self.assertIn(f'== {label}', output)
+        self.assertIn('SEARCH club_event', output)
+        self.assertNotIn('status error', output)
+        self.assertEqual(Event.objects.count(), 0)
+        self.assertEqual(User.objects.count(), 0)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class EventsFeedCacheTests(TestCase):
+    """Test the per-trainer events feed cache and its invalidation"""
+
+    def setUp(self):
+        """Create test data"""
+        from django.core.cache import cache
+
+        cache.clear()
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        other_user = User.objects.create_user(username='coach2', password='pw')
+        self.other_trainer = TrainerProfile.objects.create(user=other_user)
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.event = Event.objects.create(
+            trainer=self.trainer,
+            title='Monday Tempo',
+            date=self.tomorrow,
+            start_time='07:00',
+            capacity=2,
+        )
+        plan = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        self.runners = []
+        for name in ('runner1', 'runner2'):
+            user = User.objects.create_user(username=name, password='pw')
+            user.client_profile.primary_trainer = self.trainer
+            user.client_profile.save()
+            Membership.objects.create(user=user, plan=plan, start_date=timezone.now().date())
+            self.runners.append(user)
+
+    def _get(self, username, params=None):
+        self.client.login(username=username, password='pw')
+        return self.client.get(reverse('events'), params or {}, secure=True)
+
+    def test_second_request_is_served_from_cache(self):
+        """Clients of the same trainer share one cached feed page"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from club.feed_cache import feed_cache_stats
+
+        self._get('runner1')
+        self.client.login(username='runner2', password='pw')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('events'), secure=True)
+
+        self.assertContains(response, 'Monday Tempo')
+        self.assertFalse(any('FROM "club_event"' in q['sql'] for q in ctx.captured_queries))
+        stats = feed_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_joined_ids_overlay_is_per_user(self):
+        """The cached page is shared but the joined state is per user"""
+        from club.booking import book_event
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book_event(self.runners[0], self.event.id)
+
+        self.assertContains(self._get('runner1'), 'Joined ✓')
+        response = self._get('runner2')
+        self.assertContains(response, 'Join Event')
+        self.assertNotContains(response, 'Joined ✓')
+
+    def test_booking_invalidates_feed(self):
+        """Spots left are refreshed after a booking commits"""
+        from club.booking import book_event
+
+        self.assertContains(self._get('runner2'), '2 spots')
+        with self.captureOnCommitCallbacks(execute=True):
+            book_event(self.runners[0], self.event.id)
+        self.assertContains(self._get('runner2'), '1 spots')
+
+    def test_event_save_invalidates_feed(self):
+        """New and edited events show up once the change commits"""
+        self._get('runner1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(
+                trainer=self.trainer, title='Hill Sprints', date=self.tomorrow, start_time='08:00'
+            )
+        self.assertContains(self._get('runner1'), 'Hill Sprints')
+
+    def test_other_trainer_changes_keep_feed(self):
+        """Changes to another trainer's events do not evict this feed"""
+        from club.feed_cache import feed_cache_stats
+
+        self._get('runner1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(
+                trainer=self.other_trainer, title='Elsewhere', date=self.tomorrow, start_time='08:00'
+            )
+        self._get('runner1')
+        self.assertEqual(feed_cache_stats()['hits'], 1)
+
+    def test_filters_are_cached_separately(self):
+        """Each filter combination has its own cache entry"""
+        Event.objects.create(
+            trainer=self.trainer, title='Long Run', date=self.tomorrow, start_time='09:00',
+            event_type='running_club', distance_km=15,
+        )
+        self._get('runner1')
+        response = self._get('runner1', {'type': 'running_club'})
+        self.assertContains(response, 'Long Run')
+        self.assertNotContains(response, 'Monday Tempo')
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class EventSeriesTests(TestCase):
+    """Test recurring event series and their lazily materialised occurrences"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.today = timezone.now().date()
+        # the Monday of next week, so every occurrence is in the future
+        self.monday = self.today + timedelta(days=7 - self.today.weekday())
+        self.series = EventSeries.objects.create(
+            trainer=self.trainer,
+            title='Tempo Club',
+            start_time='07:00',
+            capacity=2,
+            frequency='weekly',
+            weekdays='0,2',
+            starts_on=self.monday,
+        )
+
+        self.client_user = User.objects.create_user(username='runner', password='pw')
+        self.client_user.client_profile.primary_trainer = self.trainer
+        self.client_user.client_profile.save()
+        plan = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        Membership.objects.create(user=self.client_user, plan=plan, start_date=self.today)
+
+    def test_weekly_occurrences_respect_interval_and_weekdays(self):
+        """Fortnightly series on Monday and Wednesday"""
+        self.series.interval = 2
+        end = self.monday + timedelta(days=27)
+        self.assertEqual(list(self.series.occurrence_dates(self.monday, end)), [
+            self.monday,
+            self.monday + timedelta(days=2),
+            self.monday + timedelta(days=14),
+            self.monday + timedelta(days=16),
+        ])
+        # a window starting mid-series skips the off weeks
+        self.assertEqual(
+            next(self.series.occurrence_dates(self.monday + timedelta(days=3), end)),
+            self.monday + timedelta(days=14),
+        )
+
+    def test_daily_occurrences_stop_at_ends_on(self):
+        """Every third day until the series ends"""
+        self.series.frequency = 'daily'
+        self.series.interval = 3
+        self.series.ends_on = self.monday + timedelta(days=7)
+        self.assertEqual(
+            list(self.series.occurrence_dates(self.monday + timedelta(days=1), self.monday + timedelta(days=30))),
+            [self.monday + timedelta(days=3), self.monday + timedelta(days=6)],
+        )
+        self.assertTrue(self.series.occurs_on(self.monday + timedelta(days=6)))
+        self.assertFalse(self.series.occurs_on(self.monday + timedelta(days=9)))
+
+    def test_listing_shows_occurrences_without_creating_rows(self):
+        """Occurrences appear on the events page but are not stored"""
+        self.client.login(username='runner', password='pw')
+        response = self.client.get(reverse('events'), secure=True)
+
+        events = response.context['events']
+        self.assertEqual(len(events), 12)
+        self.assertEqual(events[0].date, self.monday)
+        self.assertEqual(events[1].date, self.monday + timedelta(days=2))
+        self.assertContains(
+            response,
+            reverse('join_occurrence', args=[self.series.id, self.monday.isoformat()]),
+        )
+        self.assertFalse(Event.objects.exists())
+
+    def test_pagination_merges_stored_and_virtual_events(self):
+        """Walking the cursor returns stored events and occurrences in order, once each"""
+        from urllib.parse import parse_qs
+
+        self.series.ends_on = self.monday + timedelta(weeks=5, days=2)
+        self.series.save()
+        self.series.materialize(self.monday + timedelta(days=7))
+        for offset in (1, 7, 20, 40):
+            Event.objects.create(
+                trainer=self.trainer, title=f'One-off {offset}',
+                date=self.monday + timedelta(days=offset), start_time='07:00',
+            )
+
+        self.client.login(username='runner', password='pw')
+        params, seen = {}, []
+        for _ in range(10):
+            response = self.client.get(reverse('events'), params, secure=True)
+            seen.extend((event.date, event.pk) for event in response.context['events'])
+            next_query = response.context['next_page_query']
+            if not next_query:
+                break
+            params = {key: values[0] for key, values in parse_qs(next_query).items()}
+
+        # 12 occurrences (one of them stored) plus 4 one-off events
+        self.assertEqual(len(seen), 16)
+        self.assertEqual(len(set(seen)), 16)
+        self.assertEqual([day for day, _ in seen], sorted(day for day, _ in seen))
+
+    def test_joining_an_occurrence_materialises_and_books_it(self):
+        """The first booking creates the Event row; later bookings reuse it"""
+        self.client.login(username='runner', password='pw')
+        url = reverse('join_occurrence', args=[self.series.id, self.monday.isoformat()])
+
+        self.client.post(url, secure=True)
+        self.client.post(url, secure=True)
+
+        event = Event.objects.get()
+        self.assertEqual((event.series_id, event.date, event.title), (self.series.id, self.monday, 'Tempo Club'))
+        self.assertEqual(event.booked_count, 1)
+        self.assertTrue(EventRegistration.objects.filter(user=self.client_user, event=event).exists())
+
+    def test_join_rejects_dates_outside_the_series(self):
+        """Tuesdays, past dates and bad dates are 404s and create nothing"""
+        self.client.login(username='runner', password='pw')
+        for day in (
+            (self.monday + timedelta(days=1)).isoformat(),
+            (self.monday - timedelta(days=14)).isoformat(),
+            'not-a-date',
+        ):
+            response = self.client.post(
+                reverse('join_occurrence', args=[self.series.id, day]), secure=True
+            )
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(Event.objects.exists())
+
+    def test_series_edit_updates_future_occurrences_in_one_query(self):
+        """Editing a series rewrites stored occurrences except detached ones"""
+        first = self.series.materialize(self.monday)
+        second = self.series.materialize(self.monday + timedelta(days=2))
+        Event.objects.filter(pk=second.pk).update(series_detached=True, title='Special')
+
+        self.series.title = 'Intervals'
+        self.series.capacity = 10
+        with self.assertNumQueries(2):
+            self.series.save()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.title, first.capacity), ('Intervals', 10))
+        self.assertEqual(second.title, 'Special')
+
+    def test_editing_an_occurrence_detaches_it(self):
+        """The edit form creates nothing; saving it stores the detached occurrence"""
+        self.client.login(username='coach', password='pw')
+        url = reverse('edit_occurrence', args=[self.series.id, self.monday.isoformat()])
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].initial['title'], 'Tempo Club')
+        self.assertFalse(Event.objects.exists())
+
+        self.client.post(url, {
+            'title': 'Moved indoors',
+            'event_type': 'running_club',
+            'date': self.monday.isoformat(),
+            'start_time': '07:00',
+            'capacity': 2,
+        }, secure=True)
+        event = Event.objects.get()
+        self.assertEqual((event.title, event.occurrence_date), ('Moved indoors', self.monday))
+        self.assertTrue(event.series_detached)
+
+        response = self.client.get(url, secure=True)
+        self.assertRedirects(response, reverse('edit_event', args=[event.id]), fetch_redirect_response=False)
+
+    def test_moved_and_deleted_occurrences_are_not_expanded_again(self):
+        """A stored occurrence hides its original slot wherever it moved, even once deleted"""
+        wednesday = self.monday + timedelta(days=2)
+        moved = self.series.materialize(self.monday)
+        Event.objects.filter(pk=moved.pk).update(date=self.monday + timedelta(days=1))
+        deleted = self.series.materialize(wednesday)
+
+        self.client.login(username='coach', password='pw')
+        self.client.post(reverse('delete_event', args=[deleted.id]), secure=True)
+
+        deleted.refresh_from_db()
+        self.assertTrue(deleted.is_cancelled)
+        week = EventSeries.objects.virtual_occurrences(self.monday, self.monday + timedelta(days=6))
+        self.assertEqual(week, [])
+        self.assertEqual(self.series.materialize(self.monday), moved)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class EventSearchTests(TestCase):
+    """Test full-text search over events"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        self.tempo = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run', date=tomorrow, start_time='07:00',
+            location='Riverside Park',
+        )
+        self.strength = Event.objects.create(
+            trainer=self.trainer, title='Strength Class', date=tomorrow, start_time='08:00',
+            description='Warm up with an easy run before the circuit.',
+        )
+        self.yoga = Event.objects.create(
+            trainer=self.trainer, title='Yoga', date=tomorrow, start_time='09:00',
+            location='Studio 2',
+        )
+
+    def _titles(self, query):
+        return [event.title for event in Event.objects.search(query)]
+
+    def test_title_matches_rank_above_description_matches(self):
+        """Both events mention running; the title hit comes first"""
+        self.assertEqual(self._titles('run'), ['Tempo Run', 'Strength Class'])
+
+    def test_prefix_and_stemmed_matching(self):
+        """The last term matches as a prefix and words are stemmed"""
+        self.assertEqual(self._titles('river'), ['Tempo Run'])
+        self.assertEqual(self._titles('running'), ['Tempo Run', 'Strength Class'])
+        self.assertEqual(self._titles('tempo riv'), ['Tempo Run'])
+
+    def test_operators_are_ignored(self):
+        """Punctuation in user input cannot break the query"""
+        self.assertEqual(self._titles('"studio" -(*'), ['Yoga'])
+        self.assertEqual(self._titles('!!!'), [])
+
+    def test_index_follows_saves_updates_and_deletes(self):
+        """Saves, queryset updates and deletes are reflected in results"""
+        self.yoga.title = 'Sunrise Yoga'
+        self.yoga.save()
+        self.assertEqual(self._titles('sunrise'), ['Sunrise Yoga'])
+
+        Event.objects.filter(pk=self.yoga.pk).update(location='Beach')
+        self.assertEqual(self._titles('beach'), ['Sunrise Yoga'])
+        self.assertEqual(self._titles('studio'), [])
+
+        self.tempo.delete()
+        self.assertEqual(self._titles('run'), ['Strength Class'])
+
+    def test_repair_reinstalls_dropped_triggers(self):
+        """A migration that rebuilds club_event gets its triggers back"""
+        from django.db import connection
+        from club.search import SQLITE_TRIGGERS, repair_search_index
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        repair_search_index(connection)
+
+        self.yoga.title = 'Sunrise Yoga'
+        self.yoga.save()
+        self.assertEqual(self._titles('sunrise'), ['Sunrise Yoga'])
+
+    def test_events_page_filters_by_query(self):
+        """?q= narrows the listing and keeps date order"""
+        response = self.client.get(reverse('events'), {'q': 'run'}, secure=True)
+        self.assertEqual(
+            [event.title for event in response.context['events']],
+            ['Tempo Run', 'Strength Class'],
+        )
+        self.assertContains(response, 'value="run"')
+
+    def test_admin_search_uses_index(self):
+        """The admin changelist search returns ranked matches"""
+        User.objects.create_superuser(username='admin', password='pw')
+        self.client.login(username='admin', password='pw')
+        response = self.client.get(
+            reverse('admin:club_event_changelist'), {'q': 'run'}, secure=True
+        )
+        self.assertEqual(
+            [event.title for event in response.context['cl'].result_list],
+            ['Tempo Run', 'Strength Class'],
+        )
+
+
+class EventsApiTests(TestCase):
+    """Test the conditional-GET JSON events API"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        other_user = User.objects.create_user(username='coach2', password='pw')
+        self.other_trainer = TrainerProfile.objects.create(user=other_user)
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run', date=self.tomorrow, start_time='07:00',
+            capacity=3, event_type='running_club', distance_km=8,
+        )
+        Event.objects.create(
+            trainer=self.other_trainer, title='Yoga', date=self.tomorrow, start_time='09:00',
+            event_type='class',
+        )
+        self.url = reverse('api_events')
+
+    def test_returns_upcoming_events_as_json(self):
+        """Rows carry the listing fields and availability"""
+        response = self.client.get(self.url, {'trainer': self.trainer.id}, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        data = response.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(len(data['events']), 1)
+        row = data['events'][0]
+        self.assertEqual(row['title'], 'Tempo Run')
+        self.assertEqual(row['date'], self.tomorrow.isoformat())
+        self.assertEqual((row['capacity'], row['booked'], row['spots_left']), (3, 0, 3))
+
+    def test_filters_and_cursor_pagination(self):
+        """The events page filters apply and cursors walk every page"""
+        response = self.client.get(self.url, {'type': 'class'}, secure=True)
+        self.assertEqual([row['title'] for row in response.json()['events']], ['Yoga'])
+
+        first = self.client.get(self.url, {'limit': 1}, secure=True).json()
+        second = self.client.get(
+            self.url, {'limit': 1, 'cursor': first['next_cursor']}, secure=True
+        ).json()
+        self.assertEqual(
+            [row['title'] for row in first['events'] + second['events']],
+            ['Tempo Run', 'Yoga'],
+        )
+        self.assertIsNone(second['next_cursor'])
+
+    def test_unchanged_listing_is_not_modified_without_listing_query(self):
+        """A matching If-None-Match gets 304 from the validator queries alone"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        etag = self.client.get(self.url, secure=True)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertTrue(all('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_bookings_and_edits_change_the_etag(self):
+        """Counter updates and saves both produce a new ETag"""
+        from club.booking import book_event
+
+        etag = self.client.get(self.url, secure=True)['ETag']
+
+        runner = User.objects.create_user(username='runner', password='pw')
+        book_event(runner, self.event.id)
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['events'][0]['booked'], 1)
+
+        etag = response['ETag']
+        self.event.title = 'Tempo Intervals'
+        self.event.save()
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_series_occurrences_are_included(self):
+        """Recurring series occurrences are listed with no id"""
+        EventSeries.objects.create(
+            trainer=self.trainer, title='Daily Stretch', start_time='06:00',
+            frequency='daily', starts_on=self.tomorrow, ends_on=self.tomorrow,
+        )
+        rows = self.client.get(self.url, {'trainer': self.trainer.id}, secure=True).json()['events']
+        self.assertEqual([(row['title'], row['id']) for row in rows], [
+            ('Daily Stretch', None), ('Tempo Run', self.event.id),
+        ])
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CalendarFeedTests(TestCase):
+    """Test the iCalendar feeds for trainers and clients"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(
+            username='coach', password='pw', first_name='Ana', last_name='Sousa'
+        )
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run, 8km', date=self.tomorrow, start_time='07:00',
+            location='Riverside Park', description='Bring water;\nwe start on time.',
+        )
+        Event.objects.create(
+            trainer=self.trainer, title='Old Session', date=self.tomorrow - timedelta(days=5),
+            start_time='07:00',
+        )
+        self.runner = User.objects.create_user(username='runner', password='pw')
+
+    def _body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_trainer_feed_streams_upcoming_events(self):
+        """Upcoming events and series occurrences are listed as VEVENTs"""
+        EventSeries.objects.create(
+            trainer=self.trainer, title='Daily Stretch', start_time='06:00', end_time='06:30',
+            frequency='daily', starts_on=self.tomorrow, ends_on=self.tomorrow + timedelta(days=1),
+        )
+        response = self.client.get(
+            reverse('trainer_calendar', args=[self.trainer.id]), secure=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self._body(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('X-WR-CALNAME:SinMancha – Ana Sousa', body)
+        self.assertIn(f'UID:event-{self.event.id}@sinmancha', body)
+        self.assertIn('SUMMARY:Tempo Run\\, 8km', body)
+        self.assertIn('DESCRIPTION:Bring water\\;\\nwe start on time.', body)
+        self.assertIn(f'DTSTART:{self.tomorrow:%Y%m%d}T070000Z', body)
+        self.assertIn(f'DTEND:{self.tomorrow:%Y%m%d}T080000Z', body)
+        self.assertNotIn('Old Session', body)
+        self.assertEqual(body.count('SUMMARY:Daily Stretch'), 2)
+
+    @override_settings(TIME_ZONE='Europe/Lisbon')
+    def test_times_are_written_in_utc(self):
+        """Local event times are converted to UTC, so no VTIMEZONE is needed"""
+        from datetime import date, time
+        from .ical import vevent
+
+        row = {
+            'id': 1, 'series_id': None, 'title': 'Tempo Run', 'description': '', 'location': '',
+            'date': date(2026, 7, 1), 'start_time': time(7, 0), 'end_time': None, 'updated_at': None,
+        }
+        block = vevent(row)
+        self.assertIn('DTSTART:20260701T060000Z', block)
+        self.assertIn('DTEND:20260701T070000Z', block)
+        self.assertNotIn('TZID', block)
+
+    def test_client_feed_lists_booked_events_only(self):
+        """The client feed follows bookings and cancellations"""
+        token = self.runner.client_profile.calendar_token
+        url = reverse('client_calendar', args=[token])
+        registration = EventRegistration.objects.create(user=self.runner, event=self.event)
+
+        first = self.client.get(url, secure=True)
+        self.assertIn('Tempo Run', self._body(first))
+
+        registration.status = 'cancelled'
+        registration.save()
+        second = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('Tempo Run', self._body(second))
+
+    def test_unknown_token_is_not_found(self):
+        """Guessing a token gives nothing away"""
+        import uuid
+
+        response = self.client.get(
+            reverse('client_calendar', args=[uuid.uuid4()]), secure=True
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_polling_an_unchanged_feed_costs_one_query(self):
+        """A matching ETag is answered with 304 after a single query"""
+        url = reverse('trainer_calendar', args=[self.trainer.id])
+        etag = self.client.get(url, secure=True)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.event.title = 'Tempo Run, 10km'
+        self.event.save()
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_long_lines_are_folded(self):
+        """Content lines are folded at 75 octets without splitting characters"""
+        from club.ical import fold
+
+        folded = fold('DESCRIPTION:' + 'é' * 80)
+        lines = folded.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)),
+                         'DESCRIPTION:' + 'é' * 80)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class RequestMembershipTests(TestCase):
+    """Test that request.membership resolves the active membership once per request"""
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.plan = MembershipPlan.objects.create(
+            name='Monthly', price=10, billing_interval='monthly', trainer=self.trainer
+        )
+        self.user = User.objects.create_user(username='runner', password='pw')
+        self.user.client_profile.primary_trainer = self.trainer
+        self.user.client_profile.save()
+        self.client.login(username='runner', password='pw')
+        self.event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run',
+            date=timezone.now().date() + timedelta(days=1), start_time='07:00',
+        )
+
+    def _activate(self):
+        return Membership.objects.create(
+            user=self.user, plan=self.plan, start_date=timezone.now().date()
+        )
+
+    def _membership_queries(self, method, url):
+        """Make a request and return it with the number of membership lookups it ran."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, secure=True)
+        lookups = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "club_membership"' in q['sql']
+        ]
+        return response, len(lookups)
+
+    def test_membership_plans_view(self):
+        """The plans page resolves the membership once"""
+        self._activate()
+        response, lookups = self._membership_queries('get', reverse('membership_plans'))
+        self.assertContains(response, 'Current plan')
+        self.assertEqual(lookups, 1)
+
+    def test_activate_membership(self):
+        """Activation checks the membership once"""
+        response, lookups = self._membership_queries(
+            'get', reverse('activate_membership', args=[self.plan.id])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(lookups, 1)
+        self.assertTrue(Membership.objects.filter(user=self.user).exists())
+
+    def test_join_event(self):
+        """Joining an event checks the membership once"""
+        self._activate()
+        response, lookups = self._membership_queries(
+            'post', reverse('join_event', args=[self.event.id])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(lookups, 1)
+        self.assertTrue(EventRegistration.objects.filter(user=self.user, event=self.event).exists())
+
+    @override_settings(STRIPE_SECRET_KEY='sk_test_dummy')
+    def test_create_checkout_session(self):
+        """Checkout refuses a second membership after one lookup"""
+        self._activate()
+        response, lookups = self._membership_queries(
+            'post', reverse('payments:create_checkout', args=[self.plan.id])
+        )
+        self.assertRedirects(response, reverse('membership_plans'), fetch_redirect_response=False)
+        self.assertEqual(lookups, 1)
+
+    def test_client_dashboard(self):
+        """The dashboard resolves the membership once"""
+        self._activate()
+        response, lookups = self._membership_queries('get', reverse('client_dashboard'))
+        self.assertContains(response, 'Monthly')
+        self.assertEqual(lookups, 1)
+
+    def test_pages_that_do_not_need_it_skip_the_lookup(self):
+        """The membership is only loaded when used"""
+        response, lookups = self._membership_queries('get', reverse('my_events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups, 0)
+
+    def test_saving_a_membership_invalidates_it(self):
+        """A membership saved during the request is seen by later reads"""
+        from django.http import HttpResponse
+        from club.middleware import MembershipMiddleware
+
+        seen = []
+
+        def view(request):
+            seen.append(bool(request.membership))
+            self._activate()
+            seen.append(bool(request.membership))
+            return HttpResponse()
+
+        request = type('Request', (), {'user': self.user})()
+        MembershipMiddleware(view)(request)
+        self.assertEqual(seen, [False, True])
+
+
+class ExpireMembershipsCommandTests(TestCase):
+    """Test the expire_memberships maintenance command"""
+
+    def setUp(self):
+        """Create test data"""
+        self.today = timezone.now().date()
+        self.plan = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        self.user = User.objects.create_user(username='runner', password='pw')
+
+    def _membership(self, days_ago, status='active'):
+        start = self.today - timedelta(days=days_ago)
+        return Membership.objects.create(
+            user=self.user, plan=self.plan, start_date=start,
+            end_date=start + timedelta(days=30), status=status,
+        )
+
+    def _run(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('expire_memberships', *args, stdout=out)
+        return out.getvalue()
+
+    def test_expires_ended_memberships_in_batches(self):
+        """Only active memberships past their end date change"""
+        ended = [self._membership(days_ago) for days_ago in (31, 45, 90)]
+        current = self._membership(10)
+        cancelled = self._membership(60, status='cancelled')
+
+        output = self._run('--batch-size', '2')
+
+        self.assertIn('Expired 3 memberships.', output)
+        self.assertEqual(
+            set(Membership.objects.filter(status='expired').values_list('pk', flat=True)),
+            {membership.pk for membership in ended},
+        )
+        current.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual((current.status, cancelled.status), ('active', 'cancelled'))
+
+    def test_second_run_changes_nothing(self):
+        """The command is idempotent"""
+        self._membership(40)
+        self._run()
+        self.assertIn('Expired 0 memberships.', self._run())
+
+    def test_dry_run_leaves_rows_alone(self):
+        """--dry-run only reports"""
+        self._membership(40)
+        self.assertIn('Would expire 1 memberships.', self._run('--dry-run'))
+        self.assertFalse(Membership.objects.filter(status='expired').exists())
+
+    def test_cancelled_membership_is_not_current(self):
+        """Only active memberships count as current, whatever their dates"""
+        self._membership(5, status='cancelled')
+        self.assertIsNone(self.user.client_profile.active_membership)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ImportMembershipsTests(TestCase):
+    """Test the bulk membership CSV import"""
+
+    def setUp(self):
+        """Create test data"""
+        self.monthly = MembershipPlan.objects.create(name='Monthly', price=10, billing_interval='monthly')
+        self.yearly = MembershipPlan.objects.create(name='Yearly', price=100, billing_interval='yearly')
+        self.runner = User.objects.create_user(username='runner', email='runner@example.com', password='pw')
+        self.lifter = User.objects.create_user(username='lifter', password='pw')
+        self.today = timezone.now().date()
+
+    def _import(self, text, **kwargs):
+        from io import StringIO
+        from .membership_import import import_memberships
+
+        return import_memberships(StringIO(text), **kwargs)
+
+    def test_imports_rows_and_computes_end_dates(self):
+        """End dates come from the plan interval unless given"""
+        start = self.today.isoformat()
+        report = self._import(
+            'user,plan,start_date,end_date,auto_renew\n'
+            f'runner@example.com,Monthly,{start},,yes\n'
+            f'lifter,{self.yearly.pk},{start},,\n'
+            f'runner,yearly,2020-01-01,2020-06-30,no\n',
+            chunk_size=2,
+        )
+
+        self.assertEqual((report.rows, report.imported, report.errors), (3, 3, []))
+        monthly = Membership.objects.get(plan=self.monthly)
+        self.assertEqual(
+            (monthly.user, monthly.end_date, monthly.status, monthly.auto_renew),
+            (self.runner, self.today + timedelta(days=30), 'active', True),
+        )
+        self.assertEqual(
+            Membership.objects.get(user=self.lifter).end_date, self.today + timedelta(days=365)
+        )
+        # a membership that already ended is imported as expired
+        past = Membership.objects.get(start_date='2020-01-01')
+        self.assertEqual((past.end_date.isoformat(), past.status), ('2020-06-30', 'expired'))
+
+    def test_reports_invalid_rows_by_line(self):
+        """Bad rows are skipped with their line numbers; good rows still import"""
+        report = self._import(
+            'user,plan,start_date,status\n'
+            'ghost,Monthly,2025-01-01,\n'
+            'runner,Platinum,2025-01-01,\n'
+            'runner,Monthly,01/02/2025,\n'
+            'runner,Monthly,2025-01-01,paused\n'
+            'runner,Monthly,2025-01-01,\n'
+            'runner,Monthly,2025-01-01,\n'
+        )
+
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line for line, _ in report.errors], [2, 3, 4, 5, 7])
+        self.assertIn("Unknown user 'ghost'", report.errors[0][1])
+        self.assertEqual(report.errors[-1][1], 'Membership already exists.')
+        self.assertEqual(Membership.objects.count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        """A dry run validates and counts without inserting"""
+        report = self._import('user,plan,start_date\nrunner,Monthly,2025-01-01\n', dry_run=True)
+        self.assertEqual(report.imported, 1)
+        self.assertFalse(Membership.objects.exists())
+
+    def test_missing_column_is_rejected(self):
+        """A file without a required column is refused outright"""
+        with self.assertRaisesMessage(ValueError, 'start_date'):
+            self._import('user,plan\nrunner,Monthly\n')
+
+    def test_command_reports_errors(self):
+        """The management command prints a summary and per-row errors"""
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('user,plan,start_date\nrunner,Monthly,2025-01-01\nghost,Monthly,2025-01-01\n')
+        self.addCleanup(os.unlink, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_memberships', f.name, stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 of 2 memberships, 1 rows with errors.', out.getvalue())
+        self.assertIn("Line 3: Unknown user 'ghost'.", err.getvalue())
+        self.assertEqual(Membership.objects.count(), 1)
+
+    def test_admin_upload(self):
+        """Staff can upload a CSV from the membership changelist"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        User.objects.create_superuser(username='admin', password='pw')
+        self.client.login(username='admin', password='pw')
+        url = reverse('admin:club_membership_import')
+        self.assertContains(
+            self.client.get(reverse('admin:club_membership_changelist'), secure=True), url
+        )
+
+        upload = SimpleUploadedFile('members.csv', b'user,plan,start_date\nrunner,Monthly,2025-01-01\n')
+        response = self.client.post(url, {'csv_file': upload}, secure=True)
+
+        self.assertRedirects(response, reverse('admin:club_membership_changelist'), fetch_redirect_response=False)
+        self.assertEqual(Membership.objects.get().user, self.runner)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class TrainerDashboardTests(TestCase):
+    """Test the aggregated trainer dashboard"""
+
+    # session, user, trainer profile, summary, upcoming, past, clients, series
+    QUERY_BUDGET = 8
+
+    def setUp(self):
+        """Create test data"""
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.plan = MembershipPlan.objects.create(
+            trainer=self.trainer, name='Monthly', price=10, billing_interval='monthly'
+        )
+        self.today = timezone.now().date()
+        self.clients = 0
+        self.client.login(username='coach', password='pw')
+
+    def _add_history(self, count):
+        """Add count past events, upcoming events and clients with memberships."""
+        for i in range(count):
+            self.clients += 1
+            user = User.objects.create_user(username=f'client{self.clients}', password='pw')
+            profile = user.client_profile
+            profile.primary_trainer = self.trainer
+            profile.save()
+            Membership.objects.create(
+                user=user, plan=self.plan, start_date=self.today - timedelta(days=40 * (i % 2)),
+            )
+            Event.objects.create(
+                trainer=self.trainer, title=f'Past {i}',
+                date=self.today - timedelta(days=i + 1), start_time='07:00', capacity=5,
+            )
+            Event.objects.create(
+                trainer=self.trainer, title=f'Next {i}',
+                date=self.today + timedelta(days=i + 1), start_time='07:00', capacity=5,
+            )
+
+    def _get(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('trainer_dashboard'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_summary_counts(self):
+        """The summary counts clients, events and active memberships"""
+        self._add_history(3)
+        Event.objects.create(
+            trainer=self.trainer, title='Called off', date=self.today, start_time='07:00',
+            is_cancelled=True, booked_count=4,
+        )
+        Event.objects.filter(title='Next 0').update(booked_count=2)
+
+        response, _ = self._get()
+
+        self.assertEqual(response.context['summary'], {
+            'client_count': 3,
+            'event_count': 7,
+            'upcoming_count': 4,
+            'past_count': 3,
+            'upcoming_booked': 2,
+            'active_memberships': 3,
+        })
+
+    def test_events_are_split_and_bounded(self):
+        """Upcoming events run forward, past events backward, both capped"""
+        from .views import DASHBOARD_EVENTS_LIMIT
+
+        self._add_history(DASHBOARD_EVENTS_LIMIT + 2)
+        response, _ = self._get()
+
+        upcoming = [event.title for event in response.context['upcoming_events']]
+        past = [event.title for event in response.context['past_events']]
+        self.assertEqual(upcoming, [f'Next {i}' for i in range(DASHBOARD_EVENTS_LIMIT)])
+        self.assertEqual(past, [f'Past {i}' for i in range(DASHBOARD_EVENTS_LIMIT)])
+
+    def test_clients_show_membership_status(self):
+        """Recent clients carry the status of their latest membership"""
+        self._add_history(2)
+        response, _ = self._get()
+
+        statuses = {
+            client.user.username: (client.membership_status, client.membership_end)
+            for client in response.context['clients']
+        }
+        self.assertEqual(statuses['client1'], ('active', self.today + timedelta(days=30)))
+        self.assertEqual(statuses['client2'], ('active', self.today - timedelta(days=10)))
+        self.assertContains(response, 'Active until')
+        self.assertContains(response, 'Expired')
+
+    def test_query_count_is_constant(self):
+        """The page stays within its query budget however long the history is"""
+        self._add_history(1)
+        _, small = self._get()
+        self._add_history(25)
+        _, large = self._get()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.QUERY_BUDGET)
+
+    def test_staff_without_profile(self):
+        """Staff without a trainer profile get the club-wide summary"""
+        User.objects.create_user(username='boss', password='pw', is_staff=True)
+        Event.objects.create(title='Open Day', date=self.today, start_time='10:00')
+        self.client.login(username='boss', password='pw')
+
+        response, _ = self._get()
+
+        self.assertEqual(response.context['summary']['upcoming_count'], 1)
+        self.assertEqual(response.context['summary']['client_count'], 1)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, EVENTS_FEED_CACHE_TIMEOUT=0)
+class DailyMetricsTests(TestCase):
+    """Test the daily metrics rollup and the admin dashboard that reads it"""
+
+    def setUp(self):
+        """Create test data"""
+        from payments.models import Payment
+
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        trainer_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=trainer_user)
+        self.plan = MembershipPlan.objects.create(trainer=self.trainer, name='Monthly', price=10)
+        house_plan = MembershipPlan.objects.create(name='Club', price=5)
+        self.runner = User.objects.create_user(username='runner', password='pw')
+        walker = User.objects.create_user(username='walker', password='pw')
+
+        # runner joined yesterday; walker's house membership ended the day before
+        Membership.objects.create(user=self.runner, plan=self.plan, start_date=self.yesterday)
+        Membership.objects.create(
+            user=walker, plan=house_plan, start_date=self.today - timedelta(days=40),
+            end_date=self.today - timedelta(days=2), status='expired',
+        )
+        event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run', date=self.yesterday, start_time='07:00',
+        )
+        EventRegistration.objects.create(user=self.runner, event=event, attended=True)
+        EventRegistration.objects.create(user=walker, event=event)
+        Payment.objects.create(
+            user=self.runner, stripe_payment_intent_id='pi_1', membership_plan=self.plan,
+            amount_cents=1000, status='succeeded', paid_at=timezone.now() - timedelta(days=1),
+        )
+        Payment.objects.create(
+            user=walker, stripe_payment_intent_id='pi_2', membership_plan=self.plan,
+            amount_cents=1000, status='failed',
+        )
+
+    def _rows(self):
+        return {
+            (row.date, row.trainer_id): (
+                row.active_memberships, row.new_signups, row.registrations,
+                row.attendance, row.revenue_cents,
+            )
+            for row in DailyMetrics.objects.all()
+        }
+
+    def test_rollup_per_trainer_and_day(self):
+        """Each metric lands on its day and trainer; empty days get no row"""
+        from .metrics import rollup_metrics
+
+        written = rollup_metrics(self.today - timedelta(days=3), self.today)
+
+        self.assertEqual(written, len(self._rows()))
+        rows = self._rows()
+        self.assertEqual(rows[self.yesterday, self.trainer.pk], (1, 1, 0, 1, 1000))
+        self.assertEqual(rows[self.today, self.trainer.pk], (1, 0, 2, 0, 0))
+        # the house plan membership ran until two days ago
+        self.assertEqual(rows[self.today - timedelta(days=2), None], (1, 0, 0, 0, 0))
+        self.assertNotIn((self.yesterday, None), rows)
+
+    def test_rollup_is_idempotent(self):
+        """Rerunning a range replaces its rows instead of adding to them"""
+        from .metrics import rollup_metrics
+
+        rollup_metrics(self.yesterday, self.today)
+        first = self._rows()
+        rollup_metrics(self.yesterday, self.today)
+        self.assertEqual(self._rows(), first)
+
+    def test_backfill_command(self):
+        """--start backfills a range in chunks"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        start = self.today - timedelta(days=45)
+        call_command('rollup_metrics', '--start', start.isoformat(), '--chunk-days', '7', stdout=out)
+
+        self.assertIn(f'for {start} to {self.today}.', out.getvalue())
+        # walker's membership ran for 39 days, runner's for the last two
+        self.assertEqual(DailyMetrics.objects.filter(trainer=None).count(), 39)
+        self.assertEqual(DailyMetrics.objects.filter(trainer=self.trainer).count(), 2)
+
+    def test_admin_dashboard_reads_rollup(self):
+        """The dashboard shows rolled-up figures in a fixed number of queries"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .metrics import rollup_metrics
+
+        User.objects.create_user(username='boss', password='pw', is_staff=True)
+        self.client.login(username='boss', password='pw')
+        url = reverse('admin_dashboard')
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.context['active_memberships'], 0)
+
+        rollup_metrics(self.today - timedelta(days=40), self.today)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, secure=True)
+
+        self.assertEqual(response.context['active_memberships'], 1)
+        self.assertEqual(response.context['totals']['registrations'], 2)
+        self.assertEqual(response.context['revenue_total'], 10)
+        self.assertEqual(len(response.context['days']), 30)
+        self.assertFalse(any('club_membership' in query['sql'] for query in ctx.captured_queries))
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CsvExportTests(TestCase):
+    """Test the streaming CSV exports"""
+
+    def setUp(self):
+        """Create test data"""
+        from payments.models import Payment
+
+        self.today = timezone.now().date()
+        coach_user = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=coach_user)
+        other = TrainerProfile.objects.create(user=User.objects.create_user(username='coach2', password='pw'))
+        plan = MembershipPlan.objects.create(trainer=self.trainer, name='Monthly', price=10)
+
+        self.runner = User.objects.create_user(
+            username='runner', password='pw', first_name='=HYPERLINK("x")', email='runner@example.com'
+        )
+        profile = self.runner.client_profile
+        profile.primary_trainer = self.trainer
+        profile.save()
+        Membership.objects.create(user=self.runner, plan=plan, start_date=self.today)
+
+        self.event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run', date=self.today, start_time='07:00',
+        )
+        other_event = Event.objects.create(
+            trainer=other, title='Yoga', date=self.today, start_time='09:00',
+        )
+        EventRegistration.objects.create(user=self.runner, event=self.event, attended=True)
+        EventRegistration.objects.create(user=self.runner, event=other_event, status='cancelled')
+        Payment.objects.create(
+            user=self.runner, stripe_payment_intent_id='pi_1', membership_plan=plan,
+            amount_cents=1000, status='succeeded',
+        )
+
+    def _csv(self, response):
+        import csv
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        return list(csv.DictReader(body.splitlines()))
+
+    def test_trainer_gets_only_own_rows(self):
+        """Trainers cannot export another trainer's data"""
+        self.client.login(username='coach', password='pw')
+        rows = self._csv(self.client.get(
+            reverse('export_csv', args=['registrations']),
+            {'trainer': 999}, secure=True,
+        ))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            (rows[0]['event'], rows[0]['username'], rows[0]['attended'], rows[0]['status']),
+            ('Tempo Run', 'runner', 'yes', 'booked'),
+        )
+        # cells that spreadsheets would run as formulas are neutralised
+        self.assertEqual(rows[0]['first_name'], "'=HYPERLINK(\"x\")")
+
+    def test_filters(self):
+        """Staff can filter by trainer, event, status and date range"""
+        User.objects.create_user(username='boss', password='pw', is_staff=True)
+        self.client.login(username='boss', password='pw')
+        url = reverse('export_csv', args=['registrations'])
+
+        self.assertEqual(len(self._csv(self.client.get(url, secure=True))), 2)
+        self.assertEqual(len(self._csv(self.client.get(url, {'status': 'cancelled'}, secure=True))), 1)
+        self.assertEqual(len(self._csv(self.client.get(url, {'event': self.event.pk}, secure=True))), 1)
+        tomorrow = (self.today + timedelta(days=1)).isoformat()
+        self.assertEqual(self._csv(self.client.get(url, {'start': tomorrow}, secure=True)), [])
+
+        clients = self._csv(self.client.get(
+            reverse('export_csv', args=['clients']), {'status': 'active'}, secure=True,
+        ))
+        self.assertEqual([(row['username'], row['trainer']) for row in clients], [('runner', 'coach')])
+
+    def test_bad_filters_are_rejected(self):
+        """Malformed or unsupported filters get a 400, unknown exports a 404"""
+        self.client.login(username='coach', password='pw')
+        self.assertEqual(
+            self.client.get(reverse('export_csv', args=['payments']), {'event': 1}, secure=True).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(reverse('export_csv', args=['payments']), {'start': 'soon'}, secure=True).status_code, 400
+        )
+        self.assertEqual(self.client.get(reverse('export_csv', args=['users']), secure=True).status_code, 404)
+
+    def test_clients_cannot_export(self):
+        """Only trainers and staff reach the exports"""
+        self.client.login(username='runner', password='pw')
+        response = self.client.get(reverse('export_csv', args=['clients']), secure=True)
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_streams_to_stdout(self):
+        """The management command writes the same CSV"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('export_csv', 'payments', '--trainer', str(self.trainer.pk), stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['created_at', 'paid_at', 'username'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('1000,USD,succeeded,pi_1', lines[1])
+
+
+class EventRosterTests(TestCase):
+    """Test the attendance roster and bulk check-in API"""
+
+    def setUp(self):
+        """Create test data"""
+        coach = User.objects.create_user(username='coach', password='pw')
+        self.trainer = TrainerProfile.objects.create(user=coach)
+        other = User.objects.create_user(username='coach2', password='pw')
+        TrainerProfile.objects.create(user=other)
+        self.event = Event.objects.create(
+            trainer=self.trainer, title='Tempo Run', date=timezone.now().date(),
+            start_time='07:00', capacity=60,
+        )
+        self.runners = [
+            User.objects.create_user(username=f'runner{i}', password='pw', first_name=f'R{i}')
+            for i in range(4)
+        ]
+        for runner in self.runners[:3]:
+            EventRegistration.objects.create(user=runner, event=self.event)
+        EventRegistration.objects.create(user=self.runners[3], event=self.event, status='cancelled')
+        self.url = reverse('event_roster', args=[self.event.pk])
+        self.client.login(username='coach', password='pw')
+
+    def _post(self, body):
+        import json
+        return self.client.post(self.url, json.dumps(body), content_type='application/json', secure=True)
+
+    def _attended(self):
+        return set(
+            EventRegistration.objects.filter(event=self.event, attended=True)
+            .values_list('user__username', flat=True)
+        )
+
+    def test_roster_lists_booked_clients(self):
+        """GET returns compact rows of booked clients only"""
+        data = self.client.get(self.url, secure=True).json()['data']
+
+        self.assertEqual(data['fields'], ['user_id', 'username', 'first_name', 'last_name', 'attended'])
+        self.assertEqual([row[1] for row in data['roster']], ['runner0', 'runner1', 'runner2'])
+        self.assertFalse(any(row[4] for row in data['roster']))
+
+    def test_batch_check_in_is_one_update(self):
+        """A list of arrivals is applied in one UPDATE"""
+        ids = [self.runners[0].pk, self.runners[1].pk, self.runners[3].pk]
+        with self.assertNumQueries(6):  # session, user, profile, event, update, roster
+            response = self._post({'user_ids': ids})
+
+        data = response.json()['data']
+        self.assertEqual(data['updated'], 2)
+        # runner3 cancelled, so cannot be checked in
+        self.assertEqual(data['unknown'], [self.runners[3].pk])
+        self.assertEqual(self._attended(), {'runner0', 'runner1'})
+        self.assertEqual([row[4] for row in data['roster']], [True, True, False])
+
+    def test_attended_absent_diff(self):
+        """A diff can also undo a check-in"""
+        self._post({'user_ids': [self.runners[0].pk]})
+        self._post({'attended': [self.runners[2].pk], 'absent': [self.runners[0].pk]})
+        self.assertEqual(self._attended(), {'runner2'})
+
+    def test_rejects_bad_batches(self):
+        """Malformed bodies are rejected without touching the roster"""
+        for body in ({}, {'user_ids': 'all'}, {'user_ids': [True]},
+                     {'attended': [self.runners[0].pk], 'absent': [self.runners[0].pk]}):
+            response = self._post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertFalse(response.json()['success'])
+        self.assertEqual(self._attended(), set())
+
+    def test_only_the_events_trainer(self):
+        """Other trainers get a 404 and clients a 403"""
+        self.client.login(username='coach2', password='pw')
+        self.assertEqual(self.client.get(self.url, secure=True).status_code, 404)
+        self.client.login(username='runner0', password='pw')
+        self.assertEqual(self._post({'user_ids': [self.runners[0].pk]}).status_code, 403)
+        self.assertEqual(self._attended(), set())
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ClientBookingsTests(TestCase):
+    """Test the bounded client dashboard and My Events pages"""
+
+    def setUp(self):
+        """Create test data"""
+        coach = User.objects.create_user(username='coach', password='pw', first_name='Paula')
+        self.trainer = TrainerProfile.objects.create(user=coach)
+        self.runner = User.objects.create_user(username='runner', password='pw')
+        self.today = timezone.now().date()
+        self.days = 0
+        self.client.login(username='runner', password='pw')
+
+    def _book(self, count, future=True, status='booked'):
+        """Register the runner for count events before or after today."""
+        for _ in range(count):
+            self.days += 1
+            offset = timedelta(days=self.days)
+            event = Event.objects.create(
+                trainer=self.trainer, title=f'Run {self.days}',
+                date=self.today + offset if future else self.today - offset, start_time='07:00',
+            )
+            EventRegistration.objects.create(user=self.runner, event=event, status=status)
+
+    def _get(self, url, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_dashboard_shows_next_bookings(self):
+        """The dashboard lists the next bookings in date order plus counts"""
+        from .views import CLIENT_DASHBOARD_BOOKINGS
+
+        self._book(CLIENT_DASHBOARD_BOOKINGS + 2)
+        self._book(3, future=False)
+        self._book(1, status='cancelled')
+
+        response, _ = self._get(reverse('client_dashboard'))
+
+        dates = [reg.event.date for reg in response.context['my_registrations']]
+        self.assertEqual(len(dates), CLIENT_DASHBOARD_BOOKINGS)
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(response.context['more_upcoming'], 2)
+        self.assertEqual(response.context['registration_count'], CLIENT_DASHBOARD_BOOKINGS + 6)
+        self.assertContains(response, 'with Paula')
+
+    def test_my_events_paginates_history(self):
+        """Past and cancelled bookings are paged, newest first"""
+        from .views import MY_EVENTS_PAGE_SIZE
+
+        self._book(2)
+        self._book(MY_EVENTS_PAGE_SIZE + 1, future=False)
+        self._book(1, status='cancelled')
+
+        response, _ = self._get(reverse('my_events'))
+        self.assertEqual(len(response.context['upcoming']), 2)
+        history = response.context['registrations']
+        self.assertEqual(len(history), MY_EVENTS_PAGE_SIZE)
+        self.assertEqual(history[0].status, 'cancelled')
+        self.assertEqual(response.context['page_obj'].paginator.count, MY_EVENTS_PAGE_SIZE + 2)
+
+        response, _ = self._get(reverse('my_events'), page=2)
+        self.assertEqual(len(response.context['registrations']), 2)
+
+    def test_query_counts_do_not_grow_with_history(self):
+        """Years of bookings cost the same queries as a handful"""
+        self._book(2)
+        self._book(2, future=False)
+        _, dashboard = self._get(reverse('client_dashboard'))
+        _, my_events = self._get(reverse('my_events'))
+
+        self._book(10)
+        self._book(40, future=False)
+        self.assertEqual(self._get(reverse('client_dashboard'))[1], dashboard)
+        self.assertEqual(self._get(reverse('my_events'))[1], my_events)
+
+
+class ExerciseRecommendationTests(TestCase):
+    """Test the precompiled exercise plan catalog and its API"""
+
+    def setUp(self):
+        """Create test data"""
+        User.objects.create_user(username='runner', password='pw')
+        self.client.login(username='runner', password='pw')
+
+    def _post(self, **data):
+        import json
+        return self.client.post(
+            reverse('api_exercise_recommendations'), data=json.dumps(data),
+            content_type='application/json', secure=True,
+        )
+
+    def test_bmi_categories(self):
+        """Category boundaries match the standard BMI bands"""
+        from .exercise_recommendations import get_bmi_category
+
+        self.assertEqual(get_bmi_category(18.4), 'Underweight')
+        self.assertEqual(get_bmi_category(18.5), 'Normal Weight')
+        self.assertEqual(get_bmi_category(25), 'Overweight')
+        self.assertEqual(get_bmi_category(30), 'Obese')
+
+    def test_plans_are_read_only_and_shared(self):
+        """Each call returns the same compiled plan, which cannot be changed"""
+        from .exercise_recommendations import get_recommended_exercises
+
+        plan = get_recommended_exercises(22)
+        self.assertIs(get_recommended_exercises(23, 'endurance'), plan)
+        self.assertIs(get_recommended_exercises(23, 'unknown'), plan)
+        self.assertEqual(plan['category'], 'Normal Weight')
+        with self.assertRaises(TypeError):
+            plan['focus'] = 'Nothing'
+        with self.assertRaises(TypeError):
+            plan['weekly_plan'][0]['exercises'][0]['sets'] = 0
+
+    def test_api_splices_request_fields_into_plan(self):
+        """The API returns the request fields around the pre-encoded plan"""
+        response = self._post(weight_kg=95, height_cm=175, goal='weight_loss')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        body = response.json()
+        self.assertTrue(body['success'])
+        data = body['data']
+        self.assertEqual((data['weight_kg'], data['height_cm'], data['bmi']), (95.0, 175.0, 31.0))
+        self.assertEqual(data['category'], 'Obese')
+        self.assertEqual(data['plan']['category'], 'Obese')
+        self.assertEqual(len(data['plan']['weekly_plan']), 7)
+        self.assertIn('important_notes', data['plan'])
+        self.assertIn('disclaimer', data)
+
+    def test_api_rejects_bad_input(self):
+        """Non-positive or malformed measurements are a 400"""
+        self.assertEqual(self._post(weight_kg=0, height_cm=175).status_code, 400)
+        self.assertEqual(self._post(weight_kg='heavy', height_cm=175).status_code, 400)
+
+
+class ExercisePlanCatalogTests(TestCase):
+    """Test loading, validating and hot reloading the exercise plan catalog"""
+
+    def setUp(self):
+        """Create test data"""
+        import json
+        import tempfile
+        from .exercise_recommendations import DEFAULT_CATALOG
+
+        with open(DEFAULT_CATALOG, encoding='utf-8') as catalog_file:
+            self.data = json.load(catalog_file)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/plans.json'
+        self.mtime = 1_000_000_000_000_000_000
+
+    def _write(self, data):
+        """Write data as the catalog with a new mtime"""
+        import json
+        import os
+
+        with open(self.path, 'w', encoding='utf-8') as catalog_file:
+            json.dump(data, catalog_file)
+        self.mtime += 1_000_000_000
+        os.utime(self.path, ns=(self.mtime, self.mtime))
+
+    def _plan(self, **fields):
+        """A copy of the Normal Weight plan with fields replaced"""
+        import copy
+
+        plan = copy.deepcopy(self.data['plans'][1])
+        plan.update(fields)
+        return plan
+
+    def _load(self, data):
+        from .exercise_recommendations import load_catalog
+
+        self._write(data)
+        return load_catalog(self.path)
+
+    def test_default_catalog_covers_every_combination(self):
+        """The shipped catalog compiles a plan for every band, goal and level"""
+        catalog = self._load(self.data)
+        self.assertEqual(
+            len(catalog.plans),
+            len(catalog.categories) * len(catalog.goals) * len(catalog.levels),
+        )
+        self.assertEqual(catalog.key(22, 'nonsense', None), ('Normal Weight', 'general_fitness', 'beginner'))
+
+    def test_most_specific_plan_wins(self):
+        """Goal and level specific plans override the band's general plan"""
+        self.data['plans'] += [
+            self._plan(goals=['endurance'], focus='Endurance'),
+            self._plan(goals=['endurance'], levels=['advanced'], focus='Advanced endurance'),
+            self._plan(levels=['advanced'], focus='Advanced'),
+        ]
+        catalog = self._load(self.data)
+
+        def focus(goal, level):
+            return catalog.plans[catalog.key(22, goal, level)]['focus']
+
+        self.assertEqual(focus('endurance', 'advanced'), 'Advanced endurance')
+        self.assertEqual(focus('endurance', 'beginner'), 'Endurance')
+        self.assertEqual(focus('weight_loss', 'advanced'), 'Advanced')
+        self.assertEqual(focus('weight_loss', 'beginner'), 'Overall Fitness & Performance')
+        self.assertNotIn('goals', catalog.plans[catalog.key(22, 'endurance', 'advanced')])
+
+    def test_invalid_catalogs_are_rejected(self):
+        """Gaps, ties and malformed plans are errors naming the problem"""
+        from .exercise_recommendations import CatalogError
+
+        broken = [
+            ({'plans': self.data['plans'][:3]}, 'No plan for Obese'),
+            ({'plans': self.data['plans'] + [self._plan(goals=['endurance'])] * 2}, 'both apply'),
+            ({'plans': [self._plan(levels=['expert'])] + self.data['plans']}, 'unknown names'),
+            ({'plans': [self._plan(weekly_plan=[{'day': 'Monday', 'focus': 'Run', 'exercises': [
+                {'name': 'Run', 'sets': 0, 'reps': 'N/A', 'duration': '5 minutes'},
+            ]}])] + self.data['plans']}, 'sets must be'),
+            ({'plans': [self._plan(intensity='high')] + self.data['plans']}, 'unknown field intensity'),
+            ({'format': 2}, 'Unsupported catalog format'),
+            ({'default_goal': 'flexibility'}, 'default_goal'),
+        ]
+        for changes, message in broken:
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(CatalogError, message):
+                    self._load({**self.data, **changes})
+
+    def test_reloads_when_file_changes(self):
+        """An edited catalog is picked up; a broken edit keeps the last good one"""
+        from .exercise_recommendations import get_catalog, get_recommended_exercises
+
+        self._write({**self.data, 'version': 'one'})
+        with override_settings(EXERCISE_PLAN_CATALOG=self.path):
+            self.assertEqual(get_catalog().version, 'one')
+            self.assertIs(get_catalog(), get_catalog())
+
+            self.data['plans'][1]['focus'] = 'Updated'
+            self._write({**self.data, 'version': 'two'})
+            self.assertEqual(get_catalog().version, 'two')
+            self.assertEqual(get_recommended_exercises(22)['focus'], 'Updated')
+
+            self._write({**self.data, 'version': 'three', 'plans': []})
+            with self.assertLogs('club.exercise_recommendations', 'ERROR'):
+                self.assertEqual(get_catalog().version, 'two')
+            self.assertEqual(get_catalog().version, 'two')
+
+    def test_api_uses_client_level(self):
+        """The API picks the plan for the client's level and goal"""
+        import json
+
+        self.data['plans'].append(self._plan(levels=['advanced'], focus='Advanced'))
+        self._write(self.data)
+        user = User.objects.create_user(username='runner', password='pw')
+        ClientProfile.objects.filter(user=user).update(level='advanced')
+        self.client.login(username='runner', password='pw')
+
+        with override_settings(EXERCISE_PLAN_CATALOG=self.path):
+            response = self.client.post(
+                reverse('api_exercise_recommendations'),
+                data=json.dumps({'weight_kg': 70, 'height_cm': 175, 'goal': 'endurance'}),
+                content_type='application/json', secure=True,
+            )
+
+        data = response.json()['data']
+        self.assertEqual((data['goal'], data['level']), ('endurance', 'advanced'))
+        self.assertEqual(data['plan']['focus'], 'Advanced')
+
+
+class BatchRecommendationTests(TestCase):
+    """Test batch exercise recommendations for a trainer's roster"""
+
+    def setUp(self):
+        """Create test data"""
+        coach = User.objects.create_user(username='coach', password='pw')
+        TrainerProfile.objects.create(user=coach)
+        User.objects.create_user(username='runner', password='pw')
+        self.url = reverse('api_exercise_recommendations_batch')
+
+    def _post(self, username, body):
+        import json
+
+        self.client.login(username=username, password='pw')
+        return self.client.post(self.url, json.dumps(body), content_type='application/json', secure=True)
+
+    # (weight_kg, height_cm, BMI, category); the x.x5 BMIs are ties, where
+    # np.round() alone would give 7.6, 7.6, 25.0 and 30.0
+    BMI_CASES = [
+        (70, 175, 22.9, 'Normal Weight'),
+        (50, 175, 16.3, 'Underweight'),
+        (95, 175, 31.0, 'Obese'),
+        (56.6, 175, 18.5, 'Normal Weight'),
+        (30.2, 200, 7.5, 'Underweight'),
+        (30.6, 200, 7.7, 'Underweight'),
+        (99.8, 200, 24.9, 'Normal Weight'),
+        (119.8, 200, 29.9, 'Overweight'),
+    ]
+
+    def _assert_bmi_pass(self):
+        from .exercise_recommendations import bmi_categories, get_catalog
+
+        weights, heights, expected, names = zip(*self.BMI_CASES)
+        bmis, indexes = bmi_categories(list(weights), list(heights))
+
+        self.assertEqual(bmis, list(expected))
+        categories = get_catalog().categories
+        self.assertEqual([categories[i] for i in indexes], list(names))
+
+    @skipUnless(numpy, 'NumPy is not installed')
+    def test_numpy_bmi_pass(self):
+        """The vectorised BMI pass rounds ties like round() and bins on the bounds"""
+        from . import exercise_recommendations
+
+        self.assertIsNotNone(exercise_recommendations.np)
+        self._assert_bmi_pass()
+
+    def test_pure_python_bmi_pass(self):
+        """Without NumPy the BMI pass gives the same results"""
+        from unittest import mock
+        from . import exercise_recommendations
+
+        with mock.patch.object(exercise_recommendations, 'np', None):
+            self._assert_bmi_pass()
+
+    def test_results_reference_each_plan_once(self):
+        """Clients sharing a plan share one plan entry"""
+        from .exercise_recommendations import batch_recommendations
+
+        batch = batch_recommendations(
+            [60, 62, 95, 64], [175, 175, 175, 175], ['endurance', None, 'weight_loss', 'nonsense'],
+        )
+
+        results = batch['results']
+        self.assertEqual([r['category'] for r in results], ['Normal Weight', 'Normal Weight', 'Obese', 'Normal Weight'])
+        self.assertEqual([r['goal'] for r in results], ['endurance', 'general_fitness', 'weight_loss', 'general_fitness'])
+        self.assertEqual(len(batch['plans']), 2)
+        self.assertEqual(len({r['plan'] for r in results}), 2)
+        self.assertEqual(batch['plans'][results[2]['plan']]['category'], 'Obese')
+
+    def test_trainer_gets_batch(self):
+        """A trainer gets per-client results and the plans they reference"""
+        records = [{'weight_kg': 50 + i % 60, 'height_cm': 175} for i in range(300)]
+        response = self._post('coach', {'records': records})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(len(data['results']), 300)
+        self.assertEqual(set(data['plans']), {r['plan'] for r in data['results']})
+        self.assertEqual(len(data['plans']), 4)
+        self.assertEqual(data['results'][0]['bmi'], 16.3)
+        self.assertIn('weekly_plan', data['plans'][data['results'][0]['plan']])
+
+    def test_trainer_batch_of_own_clients(self):
+        """"clients" reads each of the trainer's clients' latest metric in one query"""
+        from .body_metrics import parse_client_batch
+
+        trainer = TrainerProfile.objects.get(user__username='coach')
+        other = TrainerProfile.objects.create(user=User.objects.create_user(username='coach2', password='pw'))
+        today = timezone.now().date()
+        profiles = []
+        for name, coach, level in (('a', trainer, 'advanced'), ('b', trainer, 'beginner'),
+                                   ('c', trainer, 'beginner'), ('d', other, 'beginner')):
+            user = User.objects.create_user(username=name, password='pw')
+            ClientProfile.objects.filter(user=user).update(primary_trainer=coach, level=level)
+            profiles.append(user.client_profile)
+        BodyMetric.objects.create(client=profiles[0], date=today - timedelta(days=9), weight_kg=95, height_cm=175)
+        BodyMetric.objects.create(client=profiles[0], date=today, weight_kg=70, height_cm=175)
+        BodyMetric.objects.create(client=profiles[1], date=today, weight_kg=50, height_cm=175)
+        BodyMetric.objects.create(client=profiles[3], date=today, weight_kg=80, height_cm=175)
+
+        with self.assertNumQueries(1):
+            clients, weights, _, goals, levels = parse_client_batch(trainer, {'clients': 'mine', 'goal': 'endurance'})
+        self.assertEqual(clients, [profiles[0].pk, profiles[1].pk])
+        self.assertEqual((weights, goals, levels), ([70.0, 50.0], ['endurance'] * 2, ['advanced', 'beginner']))
+
+        response = self._post('coach', {'clients': [profiles[1].pk, profiles[3].pk]})
+        results = response.json()['data']['results']
+        self.assertEqual([(r['client'], r['category']) for r in results], [(profiles[1].pk, 'Underweight')])
+        for body in ({'clients': 'all'}, {'clients': []}, {'clients': ['1']}):
+            with self.subTest(body=body):
+                self.assertEqual(self._post('coach', body).status_code, 400)
+
+    def test_rejects_clients_and_bad_batches(self):
+        """Only trainers may batch, and malformed records are a 400"""
+        self.assertEqual(self._post('runner', {'records': [{'weight_kg': 70, 'height_cm': 175}]}).status_code, 403)
+
+        for body in (
+            {'records': []},
+            {'records': [{'weight_kg': 70}]},
+            {'records': [{'weight_kg': 70, 'height_cm': '175'}]},
+            {'records': [{'weight_kg': -1, 'height_cm': 175}]},
+            [{'weight_kg': 70, 'height_cm': 175}],
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self._post('coach', body).status_code, 400)
+        response = self._post('coach', {'records': [{'weight_kg': 70, 'height_cm': 175}, {'weight_kg': 0, 'height_cm': 175}]})
+        self.assertIn('records[1].weight_kg', response.json()['error'])
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ExercisePlanApiTests(TestCase):
+    """Test the cacheable GET exercise plan API"""
+
+    def setUp(self):
+        """Create test data"""
+        self.url = reverse('api_exercise_plan')
+
+    def _get(self, query, **headers):
+        return self.client.get(f'{self.url}?{query}', secure=True, headers=headers)
+
+    def test_canonical_query_returns_cacheable_plan(self):
+        """The plan is public, with an ETag and no per-user Vary"""
+        response = self._get('weight_kg=70.5&height_cm=175&goal=endurance&level=advanced')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['weight_kg'], data['height_cm'], data['goal'], data['level']), (70.5, 175.0, 'endurance', 'advanced'))
+        self.assertEqual(data['category'], 'Normal Weight')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_revalidation_is_not_modified(self):
+        """A matching If-None-Match gets a 304"""
+        query = 'weight_kg=70.5&height_cm=175&goal=endurance&level=advanced'
+        etag = self._get(query)['ETag']
+        self.assertEqual(self._get(query, if_none_match=etag).status_code, 304)
+
+    def test_other_queries_redirect_to_bucketed_url(self):
+        """Raw measurements and unknown options redirect to the canonical query"""
+        response = self._get('height_cm=174.6&weight_kg=70.34&goal=nonsense')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response['Location'],
+            f'{self.url}?weight_kg=70.5&height_cm=175&goal=general_fitness&level=beginner',
+        )
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_invalid_measurements_are_rejected(self):
+        """Missing or out-of-range measurements are a 400"""
+        for query in ('height_cm=175', 'weight_kg=heavy&height_cm=175', 'weight_kg=70&height_cm=400', 'weight_kg=nan&height_cm=175'):
+            with self.subTest(query=query):
+                response = self._get(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    def test_lookups_are_served_from_lru_cache(self):
+        """Repeated lookups hit the server-side cache"""
+        from .exercise_recommendations import cached_exercise_plan, plan_cache_stats
+
+        before = plan_cache_stats()
+        first = cached_exercise_plan(81.5, 181.0, 'weight_loss', 'intermediate')
+        self.assertIs(cached_exercise_plan(81.5, 181.0, 'weight_loss', 'intermediate'), first)
+        after = plan_cache_stats()
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['hits'], before['hits'] + 1)
+        self.assertLessEqual(after['size'], after['max_size'])
+
+    def test_plan_page_uses_get_api(self):
+        """The exercise plan page points its script at the GET API with the client's level"""
+        user = User.objects.create_user(username='runner', password='pw')
+        ClientProfile.objects.filter(user=user).update(level='intermediate')
+        self.client.login(username='runner', password='pw')
+
+        response = self.client.get(reverse('exercise_plan'), secure=True)
+        self.assertContains(response, reverse('api_exercise_plan'))
+        self.assertContains(response, "window.exercisePlanLevel = 'intermediate'")
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class BodyMetricTests(TestCase):
+    """Test the body-metric history and its progress series"""
+
+    def setUp(self):
+        """Create test data"""
+        self.user = User.objects.create_user(username='runner', password='pw')
+        self.profile = self.user.client_profile
+        self.today = timezone.localdate()
+        self.url = reverse('api_body_metrics')
+        self.client.login(username='runner', password='pw')
+
+    def _history(self, days):
+        """Log a daily weight for the last days days, with a spike in the middle"""
+        BodyMetric.objects.bulk_create([
+            BodyMetric(
+                client=self.profile, date=self.today - timedelta(days=days - 1 - i),
+                weight_kg=95 if i == days // 2 else 80 + i % 7 / 10, height_cm=175,
+            )
+            for i in range(days)
+        ])
+
+    def _post(self, body):
+        import json
+
+        return self.client.post(self.url, json.dumps(body), content_type='application/json', secure=True)
+
+    def test_logging_keeps_one_row_per_day(self):
+        """Logging again on a day replaces it, and height carries over"""
+        self.assertEqual(self._post({'weight_kg': 81.25, 'height_cm': 175}).status_code, 200)
+        response = self._post({'weight_kg': 80.5})
+
+        self.assertEqual(response.status_code, 200)
+        metric = BodyMetric.objects.get(client=self.profile)
+        self.assertEqual((metric.date, float(metric.weight_kg), float(metric.height_cm)), (self.today, 80.5, 175.0))
+
+    def test_rejects_bad_entries(self):
+        """Missing first height, bad numbers and future dates are a 400"""
+        tomorrow = (self.today + timedelta(days=1)).isoformat()
+        for body in (
+            {'weight_kg': 80},
+            {'weight_kg': 'NaN', 'height_cm': 175},
+            {'weight_kg': 500, 'height_cm': 175},
+            {'weight_kg': 80, 'height_cm': 175, 'date': tomorrow},
+            {'weight_kg': 80, 'height_cm': 175, 'date': 'yesterday'},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self._post(body).status_code, 400)
+        self.assertFalse(BodyMetric.objects.exists())
+
+    def test_progress_is_downsampled(self):
+        """Years of daily logs come back as at most the requested points"""
+        self._history(1000)
+
+        data = self.client.get(self.url, {'range': 'all', 'points': 100}, secure=True).json()['data']
+        self.assertEqual(data['count'], 1000)
+        self.assertEqual(len(data['series']), 100)
+        dates = [point['date'] for point in data['series']]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(dates[-1], self.today.isoformat())
+        self.assertIn(95.0, [point['weight_kg'] for point in data['series']])
+        self.assertEqual((data['latest']['weight_kg'], data['latest']['bmi']), (80.5, 26.3))
+
+        data = self.client.get(self.url, {'range': '1m'}, secure=True).json()['data']
+        self.assertEqual((data['count'], len(data['series'])), (30, 30))
+
+    def test_progress_is_one_query(self):
+        """Reading a range costs one query however long the history"""
+        from .body_metrics import progress
+
+        self._history(400)
+        with self.assertNumQueries(1):
+            progress(self.profile, 'all', 50)
+
+    def test_only_clients_have_metrics(self):
+        """Users without a client profile get a 403 and bad ranges a 400"""
+        self.assertEqual(self.client.get(self.url, {'range': '5y'}, secure=True).status_code, 400)
+        ClientProfile.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(self.url, secure=True).status_code, 403)
+
+    def test_plan_page_starts_from_latest_metric(self):
+        """The plan page hands the latest metric to its script"""
+        self._history(3)
+        response = self.client.get(reverse('exercise_plan'), secure=True)
+        self.assertContains(response, 'id="latestMetric"')
+        self.assertContains(response, '"height_cm": 175.0')
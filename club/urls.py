@@ -16,6 +16,12 @@ urlpatterns = [
     path("events/<int:event_id>/delete/", views.delete_event, name="delete_event"),
     path("events/<int:event_id>/join/", views.join_event, name="join_event"),
     path("events/<int:event_id>/leave/", views.leave_event, name="leave_event"),
+    path("events/<int:event_id>/roster/", views.event_roster, name="event_roster"),
+
+    path("series/create/", views.create_series, name="create_series"),
+    path("series/<int:series_id>/edit/", views.edit_series, name="edit_series"),
+    path("series/<int:series_id>/<str:day>/join/", views.join_occurrence, name="join_occurrence"),
+    path("series/<int:series_id>/<str:day>/edit/", views.edit_occurrence, name="edit_occurrence"),
 
     path("dashboard/", views.dashboard, name="dashboard"),
     path("client/dashboard/", views.client_dashboard, name="client_dashboard"),
@@ -24,5 +30,12 @@ urlpatterns = [
 
     path("my-events/", views.my_events, name="my_events"),
     path("exercise-plan/", views.exercise_plan_page, name="exercise_plan"),
+    path("api/events/", views.events_api, name="api_events"),
+    path("calendar/trainer/<int:trainer_id>.ics", views.trainer_calendar, name="trainer_calendar"),
+    path("calendar/client/<uuid:token>.ics", views.client_calendar, name="client_calendar"),
+    path("exports/<slug:name>.csv", views.export_csv, name="export_csv"),
     path("api/exercise-recommendations/", views.get_exercise_recommendations, name="api_exercise_recommendations"),
+    path("api/body-metrics/", views.body_metrics_api, name="api_body_metrics"),
+    path("api/exercise-recommendations/plan/", views.exercise_plan_api, name="api_exercise_plan"),
+    path("api/exercise-recommendations/batch/", views.batch_exercise_recommendations, name="api_exercise_recommendations_batch"),
 ]
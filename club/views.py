@@ -1,31 +1,81 @@
 # club/views.py
 
+import hashlib
 import json
 import logging
+from datetime import date, timedelta
+from itertools import chain
 
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
-from django.views.decorators.http import require_http_methods
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_http_methods
+from django.views.decorators.vary import vary_on_cookie, vary_on_headers
 from django.views.generic import DetailView, ListView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from .exercise_recommendations import generate_exercise_plan
-from .forms import EventForm
+from .attendance import ROSTER_FIELDS, CheckInError, check_in, parse_check_in, roster
+from .body_metrics import (
+    DEFAULT_PROGRESS_POINTS,
+    DEFAULT_PROGRESS_RANGE,
+    MAX_PROGRESS_POINTS,
+    PROGRESS_RANGES,
+    MetricError,
+    latest_metric,
+    log_metric,
+    parse_client_batch,
+    parse_metric,
+    progress,
+)
+from .booking import BookingResult, book_event
+from .exercise_recommendations import (
+    BatchError,
+    batch_recommendations_json,
+    cached_exercise_plan,
+    exercise_plan_json,
+    format_plan_query,
+    parse_batch,
+    plan_cache_stats,
+    plan_query,
+)
+from .exports import EXPORTS, parse_filters, stream_csv
+from .feed_cache import feed_cache_stats, get_feed_page
+from .forms import EventForm, EventSeriesForm
+from .ical import CALENDAR_FIELDS, stream_calendar
+from .metrics import METRIC_FIELDS, daily_totals
 from .models import (
     ClientProfile,
     Event,
     EventRegistration,
+    EventSeries,
     Membership,
     MembershipPlan,
+    TrainerProfile,
 )
+from .pagination import KEYSET_ORDERING, keyset_page
 
 logger = logging.getLogger(__name__)
 
+# How far ahead recurring series are expanded on the events listing
+SERIES_LISTING_HORIZON = timedelta(days=365)
+
 
 def is_trainer(user):
     return user.is_staff or getattr(user, "trainer_profile", None) is not None
@@ -61,7 +111,7 @@ class MembershipPlansView(ListView):
             profile = getattr(self.request.user, "client_profile", None)
 
         if profile:
-            active_membership = getattr(profile, "active_membership", None)
+            active_membership = self.request.membership or None
 
         context["profile"] = profile
         context["active_membership"] = active_membership
@@ -77,7 +127,7 @@ def activate_membership(request, plan_id):
         messages.error(request, "You need a client profile to activate a membership.")
         return redirect("membership_plans")
 
-    if getattr(profile, "has_active_membership", False):
+    if request.membership:
         messages.error(request, "You already have an active membership.")
         return redirect("membership_plans")
 
@@ -95,10 +145,70 @@ def activate_membership(request, plan_id):
 # EVENTS
 # -------------------------
 
+def listing_filters(request):
+    """
+    Filters for the upcoming events listing, taken from the request,
+    as lookups shared by Event and EventSeries.
+    """
+    filters = {}
+
+    if request.user.is_authenticated:
+        profile = getattr(request.user, "client_profile", None)
+        if profile:
+            trainer_id = getattr(profile, "primary_trainer_id", None)
+            if trainer_id:
+                filters["trainer_id"] = trainer_id
+
+    type_filter = request.GET.get("type")
+    if type_filter:
+        filters["event_type"] = type_filter
+
+    min_distance = request.GET.get("min_distance")
+    if min_distance:
+        try:
+            filters["distance_km__gte"] = float(min_distance)
+        except ValueError:
+            pass
+
+    max_distance = request.GET.get("max_distance")
+    if max_distance:
+        try:
+            filters["distance_km__lte"] = float(max_distance)
+        except ValueError:
+            pass
+
+    return filters
+
+
+def upcoming_events(filters, search_query=""):
+    """Upcoming, not cancelled events matching filters and the search query."""
+    queryset = Event.objects.filter(
+        date__gte=timezone.now().date(),
+        is_cancelled=False,
+        **filters,
+    )
+    if search_query:
+        # matches are listed by date like the rest of the listing
+        queryset = queryset.search(search_query, ranked=False)
+    return queryset
+
+
+def series_occurrences(filters, search_query, start, end):
+    """Unsaved occurrences of matching recurring series between start and end."""
+    today = timezone.now().date()
+    start = max(start or today, today)
+    end = end or today + SERIES_LISTING_HORIZON
+    series = EventSeries.objects.filter(**filters)
+    if search_query:
+        series = series.search(search_query)
+    return series.virtual_occurrences(start, end)
+
+
 class EventsView(ListView):
     model = Event
     template_name = "events.html"
     context_object_name = "events"
+    paginate_by = 12
 
     def dispatch(self, request, *args, **kwargs):
         try:
@@ -108,49 +218,92 @@ class EventsView(ListView):
             messages.error(request, "Sorry, something went wrong loading events.")
             return redirect("home")
 
-    def get_queryset(self):
-        try:
-            queryset = Event.objects.filter(
-                date__gte=timezone.now().date(),
-                is_cancelled=False,
-            ).select_related("trainer", "trainer__user")
+    # trainer whose feed is listed (None = all trainers) and whether the
+    # listing may be served from the events feed cache
+    feed_trainer_id = None
+    feed_cacheable = False
+    search_query = ""
 
-            if self.request.user.is_authenticated:
-                profile = getattr(self.request.user, "client_profile", None)
-                if profile:
-                    trainer = getattr(profile, "primary_trainer", None)
-                    if trainer:
-                        queryset = queryset.filter(trainer=trainer)
-
-            type_filter = self.request.GET.get("type")
-            if type_filter:
-                queryset = queryset.filter(event_type=type_filter)
-
-            min_distance = self.request.GET.get("min_distance")
-            if min_distance:
-                try:
-                    queryset = queryset.filter(distance_km__gte=float(min_distance))
-                except ValueError:
-                    pass
-
-            max_distance = self.request.GET.get("max_distance")
-            if max_distance:
-                try:
-                    queryset = queryset.filter(distance_km__lte=float(max_distance))
-                except ValueError:
-                    pass
+    def get_listing_filters(self):
+        filters = listing_filters(self.request)
+        self.feed_trainer_id = filters.get("trainer_id")
+        return filters
 
+    def get_queryset(self):
+        try:
+            self.listing_filters = self.get_listing_filters()
+            self.search_query = self.request.GET.get("q", "").strip()
+            queryset = (upcoming_events(self.listing_filters, self.search_query)
+                        .select_related("trainer", "trainer__user")
+                        .with_availability()
+                        .order_by(*KEYSET_ORDERING))
+
+            self.feed_cacheable = True
             return queryset
         except Exception:
             logger.exception("EventsView.get_queryset failed")
             return Event.objects.none()
 
+    def series_occurrences(self, start, end):
+        return series_occurrences(self.listing_filters, self.search_query, start, end)
+
+    def get_template_names(self):
+        # "load more" requests only need the next batch of cards
+        if self.request.GET.get("fragment"):
+            return ["partials/events_page.html"]
+        return super().get_template_names()
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate with a keyset cursor on (date, start_time, id).
+        ?page=N falls back to Django's offset pagination.
+        """
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        cursor = self.request.GET.get("cursor")
+        if self.feed_cacheable:
+            # the same page is shared by every client of the trainer; per-user
+            # state (joined_ids) is overlaid in get_context_data
+            params = {
+                key: self.request.GET.get(key)
+                for key in ("q", "type", "min_distance", "max_distance")
+            }
+            params.update(cursor=cursor, page_size=page_size)
+            events, self.next_cursor = get_feed_page(
+                self.feed_trainer_id,
+                params,
+                lambda: keyset_page(queryset, cursor, page_size, virtual=self.series_occurrences),
+            )
+        else:
+            events, self.next_cursor = keyset_page(queryset, cursor, page_size)
+        return None, None, events, self.next_cursor is not None
+
+    def _next_page_query(self, page_obj):
+        """Query string for the next page, keeping the active filters."""
+        params = self.request.GET.copy()
+        for key in ("cursor", self.page_kwarg, "fragment"):
+            params.pop(key, None)
+
+        if page_obj is not None:
+            if not page_obj.has_next():
+                return None
+            params[self.page_kwarg] = page_obj.next_page_number()
+        else:
+            next_cursor = getattr(self, "next_cursor", None)
+            if not next_cursor:
+                return None
+            params["cursor"] = next_cursor
+        return params.urlencode()
+
     def get_context_data(self, **kwargs):
         try:
             context = super().get_context_data(**kwargs)
+            context["search_query"] = self.request.GET.get("q", "")
             context["type_filter"] = self.request.GET.get("type")
             context["min_distance"] = self.request.GET.get("min_distance")
             context["max_distance"] = self.request.GET.get("max_distance")
+            context["next_page_query"] = self._next_page_query(context.get("page_obj"))
 
             joined_ids = set()
             trainer_profile = None
@@ -179,6 +332,9 @@ class EventDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "event"
     pk_url_kwarg = "event_id"
 
+    def get_queryset(self):
+        return Event.objects.select_related("trainer", "trainer__user").with_availability()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         registration = EventRegistration.objects.filter(
@@ -243,6 +399,9 @@ def edit_event(request, event_id):
             updated_event = form.save(commit=False)
             if trainer_profile:
                 updated_event.trainer = trainer_profile
+            if updated_event.series_id:
+                # keep this occurrence's own changes when the series is edited
+                updated_event.series_detached = True
             updated_event.save()
             messages.success(request, "Event updated successfully.")
             return redirect("trainer_dashboard")
@@ -275,7 +434,13 @@ def delete_event(request, event_id):
         event = get_object_or_404(Event, id=event_id, trainer=trainer_profile)
 
     if request.method == "POST":
-        event.delete()
+        if event.series_id:
+            # keep the row so the series does not expand this occurrence again
+            event.is_cancelled = True
+            event.series_detached = True
+            event.save()
+        else:
+            event.delete()
         messages.success(request, "Event deleted successfully.")
         return redirect("trainer_dashboard")
 
@@ -284,6 +449,14 @@ def delete_event(request, event_id):
 
 @login_required
 def join_event(request, event_id):
+    return _join(request, lambda: event_id)
+
+
+def _join(request, resolve_event_id):
+    """
+    Book the current user onto an event.
+    resolve_event_id is only called once the user is allowed to book.
+    """
     if request.method != "POST":
         return redirect("events")
 
@@ -292,25 +465,26 @@ def join_event(request, event_id):
         messages.error(request, "Only clients can join events.")
         return redirect("events")
 
-    if not getattr(profile, "has_active_membership", False):
+    if not request.membership:
         messages.error(request, "You need an active membership to join events.")
         return redirect("events")
 
-    event = get_object_or_404(Event, id=event_id)
+    try:
+        result = book_event(request.user, resolve_event_id())
+    except Event.DoesNotExist:
+        raise Http404("Event not found")
 
-    if getattr(event, "is_full", False) or getattr(event, "is_past", False):
-        messages.error(request, "You cannot join this event.")
+    if result is BookingResult.ALREADY_BOOKED:
+        messages.info(request, "You’ve already joined this event.")
         return redirect("events")
 
-    registration, created = EventRegistration.objects.get_or_create(
-        user=request.user,
-        event=event,
-        defaults={"status": "booked"},
-    )
+    if result is BookingResult.CANCELLED:
+        messages.error(request, "This event has been cancelled.")
+        return redirect("events")
 
-    if not created and registration.status == "cancelled":
-        registration.status = "booked"
-        registration.save()
+    if result is not BookingResult.BOOKED:
+        messages.error(request, "You cannot join this event.")
+        return redirect("events")
 
     messages.success(request, "You’ve joined this event.")
     return redirect("events")
@@ -321,11 +495,130 @@ def leave_event(request, event_id):
     if request.method != "POST":
         return redirect("events")
 
-    EventRegistration.objects.filter(user=request.user, event_id=event_id).delete()
+    with transaction.atomic():
+        EventRegistration.objects.filter(user=request.user, event_id=event_id).delete()
     messages.success(request, "You’ve left this event.")
     return redirect("events")
 
 
+# -------------------------
+# RECURRING SERIES
+# -------------------------
+
+def _get_occurrence(series_id, day, **filters):
+    """Return (series, date) for an upcoming occurrence, or raise Http404."""
+    series = get_object_or_404(EventSeries, id=series_id, is_active=True, **filters)
+    try:
+        occurrence_date = date.fromisoformat(day)
+    except ValueError:
+        raise Http404("Invalid occurrence date")
+    if occurrence_date < timezone.now().date() or not series.occurs_on(occurrence_date):
+        raise Http404("No such occurrence")
+    return series, occurrence_date
+
+
+@login_required
+def join_occurrence(request, series_id, day):
+    def materialize():
+        series, occurrence_date = _get_occurrence(series_id, day)
+        return series.materialize(occurrence_date).id
+
+    return _join(request, materialize)
+
+
+@login_required
+def edit_occurrence(request, series_id, day):
+    if not is_trainer(request.user):
+        messages.error(request, "Only trainers can edit events.")
+        return redirect("events")
+
+    filters = {}
+    if not request.user.is_staff:
+        filters["trainer"] = getattr(request.user, "trainer_profile", None)
+
+    series, occurrence_date = _get_occurrence(series_id, day, **filters)
+    event = Event.objects.filter(series=series, occurrence_date=occurrence_date).first()
+    if event:
+        return redirect("edit_event", event_id=event.id)
+
+    # the row is only created when the edit is saved
+    occurrence = series.build_occurrence(occurrence_date)
+    if request.method == "POST":
+        form = EventForm(request.POST, instance=occurrence)
+        if form.is_valid():
+            with transaction.atomic():
+                # a booking may have materialised the occurrence since the form was opened
+                event = series.materialize(occurrence_date)
+                for field, value in form.cleaned_data.items():
+                    setattr(event, field, value)
+                event.series_detached = True
+                event.save()
+            messages.success(request, "Event updated successfully.")
+            return redirect("trainer_dashboard")
+    else:
+        form = EventForm(instance=occurrence)
+
+    return render(
+        request,
+        "event_form.html",
+        {
+            "form": form,
+            "page_title": "Edit Event",
+            "submit_text": "Save Changes",
+        },
+    )
+
+
+def _series_form(request, series=None):
+    if not is_trainer(request.user):
+        messages.error(request, "Only trainers can manage recurring events.")
+        return redirect("events")
+
+    trainer_profile = getattr(request.user, "trainer_profile", None)
+
+    if not request.user.is_staff and not trainer_profile:
+        messages.error(request, "Trainer profile not found.")
+        return redirect("trainer_dashboard")
+
+    if request.method == "POST":
+        form = EventSeriesForm(request.POST, instance=series)
+        if form.is_valid():
+            saved = form.save(commit=False)
+            if trainer_profile:
+                saved.trainer = trainer_profile
+            saved.save()
+            messages.success(request, "Recurring event saved.")
+            return redirect("trainer_dashboard")
+    else:
+        form = EventSeriesForm(instance=series)
+
+    return render(
+        request,
+        "event_form.html",
+        {
+            "form": form,
+            "page_title": "Edit Recurring Event" if series else "Create Recurring Event",
+            "submit_text": "Save Changes" if series else "Create Series",
+        },
+    )
+
+
+@login_required
+def create_series(request):
+    return _series_form(request)
+
+
+@login_required
+def edit_series(request, series_id):
+    if request.user.is_staff:
+        series = get_object_or_404(EventSeries, id=series_id)
+    else:
+        series = get_object_or_404(
+            EventSeries, id=series_id, trainer=getattr(request.user, "trainer_profile", None)
+        )
+    return _series_form(request, series)
+
+
 # -------------------------
 # AUTH & DASHBOARDS
 # -------------------------
@@ -343,6 +636,25 @@ def dashboard(request):
     return redirect("home")
 
 
+# Upcoming bookings shown on the client dashboard
+CLIENT_DASHBOARD_BOOKINGS = 5
+# Registrations per page of the My Events history
+MY_EVENTS_PAGE_SIZE = 20
+
+
+def _registrations(user):
+    """The user's registrations with their events and trainers, for listing."""
+    return (EventRegistration.objects
+            .filter(user=user)
+            .select_related("event__trainer__user"))
+
+
+def _upcoming_bookings(user, today):
+    return (_registrations(user)
+            .filter(status="booked", event__date__gte=today)
+            .order_by("event__date", "event__start_time", "pk"))
+
+
 @login_required
 def client_dashboard(request):
     profile = getattr(request.user, "client_profile", None)
@@ -350,78 +662,511 @@ def client_dashboard(request):
         messages.error(request, "You need a client profile.")
         return redirect("home")
 
+    today = timezone.now().date()
     events = Event.objects.filter(
         trainer=profile.primary_trainer,
-        date__gte=timezone.now().date(),
+        date__gte=today,
         is_cancelled=False,
-    )
+    ).with_availability()
 
-    registrations = EventRegistration.objects.filter(
-        user=request.user
-    ).select_related("event")
+    counts = EventRegistration.objects.filter(user=request.user).aggregate(
+        total=Count("pk"),
+        upcoming=Count("pk", filter=Q(status="booked", event__date__gte=today)),
+    )
 
     return render(
         request,
         "client/dashboard.html",
         {
-            "membership": getattr(profile, "active_membership", None),
+            "membership": request.membership or None,
             "upcoming_events": events[:5],
-            "my_registrations": registrations,
+            "my_registrations": _upcoming_bookings(request.user, today)[:CLIENT_DASHBOARD_BOOKINGS],
+            "registration_count": counts["total"],
+            "more_upcoming": max(counts["upcoming"] - CLIENT_DASHBOARD_BOOKINGS, 0),
+            "profile": profile,
         },
     )
 
 
 @login_required
 def my_events(request):
-    registrations = EventRegistration.objects.filter(
-        user=request.user
-    ).select_related("event")
-    return render(request, "my_events.html", {"registrations": registrations})
+    today = timezone.now().date()
+    # past events and cancelled bookings, newest first
+    history = (_registrations(request.user)
+               .exclude(status="booked", event__date__gte=today)
+               .order_by("-event__date", "-event__start_time", "-pk"))
+    page = Paginator(history, MY_EVENTS_PAGE_SIZE).get_page(request.GET.get("page"))
+
+    return render(request, "my_events.html", {
+        "upcoming": _upcoming_bookings(request.user, today)[:MY_EVENTS_PAGE_SIZE],
+        "upcoming_limit": MY_EVENTS_PAGE_SIZE,
+        "page_obj": page,
+        "registrations": page.object_list,
+    })
 
 
 # -------------------------
 # TRAINER / ADMIN
 # -------------------------
 
+# Upcoming and past events listed on the trainer dashboard, each
+DASHBOARD_EVENTS_LIMIT = 10
+DASHBOARD_CLIENTS_LIMIT = 10
+
+
+def _trainer_summary(user, trainer, today):
+    """
+    Dashboard counts for trainer, in one query.
+    Each count is a subquery grouped by the trainer column, hung off the
+    user's own row, so it also works for staff without a trainer profile
+    (trainer None: unassigned clients, trainerless events, house plans).
+    """
+    events = Event.objects.filter(trainer=trainer)
+    upcoming = Q(date__gte=today)
+
+    def total(queryset, group_by, expression):
+        return Coalesce(_subquery_aggregate(queryset, group_by, n=expression), 0)
+
+    return (User.objects
+            .filter(pk=user.pk)
+            .annotate(
+                client_count=total(
+                    ClientProfile.objects.filter(primary_trainer=trainer),
+                    "primary_trainer", Count("pk"),
+                ),
+                event_count=total(events, "trainer", Count("pk")),
+                upcoming_count=total(events, "trainer", Count("pk", filter=upcoming)),
+                past_count=total(events, "trainer", Count("pk", filter=Q(date__lt=today))),
+                upcoming_booked=total(
+                    events, "trainer", Sum("booked_count", filter=upcoming & Q(is_cancelled=False))
+                ),
+                active_memberships=total(
+                    Membership.objects.filter(plan__trainer=trainer),
+                    "plan__trainer", Count("pk", filter=Q(status="active")),
+                ),
+            )
+            .values(
+                "client_count", "event_count", "upcoming_count", "past_count",
+                "upcoming_booked", "active_memberships",
+            )
+            .get())
+
+
 @login_required
 @user_passes_test(is_trainer)
 def trainer_dashboard(request):
+    # cached on request.user by is_trainer
     trainer = getattr(request.user, "trainer_profile", None)
-
-    clients = ClientProfile.objects.filter(primary_trainer=trainer)
-    events = Event.objects.filter(trainer=trainer).order_by("date", "start_time")
-    memberships = Membership.objects.filter(plan__trainer=trainer)
+    today = timezone.now().date()
+
+    events = Event.objects.filter(trainer=trainer)
+    upcoming_events = (events
+                       .filter(date__gte=today)
+                       .order_by("date", "start_time")
+                       .with_availability()[:DASHBOARD_EVENTS_LIMIT])
+    past_events = (events
+                   .filter(date__lt=today)
+                   .order_by("-date", "-start_time")
+                   .with_availability()[:DASHBOARD_EVENTS_LIMIT])
+
+    # each client's latest membership, read in the same query as the clients
+    latest_membership = (Membership.objects
+                         .filter(user=OuterRef("user_id"))
+                         .order_by("-end_date", "-pk"))
+    clients = (ClientProfile.objects
+               .filter(primary_trainer=trainer)
+               .select_related("user")
+               .annotate(
+                   membership_status=Subquery(latest_membership.values("status")[:1]),
+                   membership_end=Subquery(latest_membership.values("end_date")[:1]),
+               )
+               .order_by("-pk")[:DASHBOARD_CLIENTS_LIMIT])
 
     return render(
         request,
         "trainer/dashboard.html",
         {
-            "client_count": clients.count(),
-            "event_count": events.count(),
-            "active_memberships": memberships.filter(status="active").count(),
-            "clients": clients[:10],
-            "events": events,
+            "summary": _trainer_summary(request.user, trainer, today),
+            "today": today,
+            "clients": clients,
+            "upcoming_events": upcoming_events,
+            "past_events": past_events,
+            "series_list": EventSeries.objects.filter(trainer=trainer),
         },
     )
 
 
+# Days of history charted on the admin dashboard
+ADMIN_DASHBOARD_DAYS = 30
+
+
 @staff_member_required
 def admin_dashboard(request):
+    # one DailyMetrics row per day and trainer, see the rollup_metrics command
+    today = timezone.now().date()
+    days = daily_totals(today - timedelta(days=ADMIN_DASHBOARD_DAYS - 1), today)
+    totals = {field: sum(day[field] for day in days) for field in METRIC_FIELDS}
+    peak = {field: max(day[field] for day in days) for field in METRIC_FIELDS}
+
     return render(
         request,
         "admin_dashboard.html",
         {
-            "total_users": User.objects.count(),
-            "active_memberships": Membership.objects.filter(
-                end_date__gte=timezone.now().date()
-            ).count(),
-            "upcoming_events": Event.objects.filter(
-                date__gte=timezone.now().date(),
-                is_cancelled=False,
-            ).count(),
+            "active_memberships": days[-1]["active_memberships"],
+            "totals": totals,
+            "revenue_total": totals["revenue_cents"] / 100,
+            "peak": peak,
+            "days": days,
+            "trend_days": ADMIN_DASHBOARD_DAYS,
+            "metrics_updated_at": max(
+                (day["updated_at"] for day in days if day["updated_at"]), default=None
+            ),
+            "events_feed_cache": feed_cache_stats(),
+            "exercise_plan_cache": plan_cache_stats(),
+        },
+    )
+
+
+# -------------------------
+# ATTENDANCE
+# -------------------------
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def event_roster(request, event_id):
+    """
+    Compact JSON roster of an event's booked clients for its trainer.
+    POST a check-in batch ({"user_ids": [...]} or {"attended": [...],
+    "absent": [...]}) to apply it in one UPDATE and get the roster back.
+    """
+    if not is_trainer(request.user):
+        return JsonResponse(
+            {"success": False, "error": "Only trainers can take attendance."}, status=403
+        )
+    events = Event.objects.only("id", "title", "date", "start_time", "capacity")
+    if request.user.is_staff:
+        event = get_object_or_404(events, id=event_id)
+    else:
+        event = get_object_or_404(
+            events, id=event_id, trainer=getattr(request.user, "trainer_profile", None)
+        )
+
+    data = {}
+    if request.method == "POST":
+        try:
+            attended, absent = parse_check_in(json.loads(request.body))
+        except (json.JSONDecodeError, CheckInError) as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=400)
+        data["updated"] = check_in(event.pk, attended, absent)
+
+    rows = roster(event.pk)
+    if request.method == "POST":
+        data["unknown"] = sorted((attended | absent) - {row[0] for row in rows})
+
+    data.update(
+        event={
+            "id": event.pk,
+            "title": event.title,
+            "date": event.date,
+            "start_time": event.start_time,
+            "capacity": event.capacity,
         },
+        fields=ROSTER_FIELDS,
+        roster=rows,
+    )
+    return JsonResponse({"success": True, "data": data})
+
+
+# -------------------------
+# CSV EXPORTS
+# -------------------------
+
+@login_required
+@user_passes_test(is_trainer)
+@require_GET
+def export_csv(request, name):
+    """
+    Stream one of the CSV exports, filtered by ?start=&end=&trainer=&event=&status=.
+    Trainers only ever get their own data; staff may pick any trainer.
+    """
+    export = EXPORTS.get(name)
+    if export is None:
+        raise Http404("Unknown export")
+
+    try:
+        filters = parse_filters(request.GET)
+        if not request.user.is_staff:
+            trainer = getattr(request.user, "trainer_profile", None)
+            filters["trainer"] = trainer.pk
+        rows = stream_csv(export, filters)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(rows, content_type="text/csv; charset=utf-8")
+    filename = f"{name}-{timezone.now().date():%Y-%m-%d}.csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# -------------------------
+# EVENTS API
+# -------------------------
+
+# Columns returned for each event, read with values() so no model instances are built
+EVENTS_API_FIELDS = (
+    "id", "series_id", "trainer_id", "title", "description", "event_type",
+    "date", "start_time", "end_time", "location", "distance_km", "target_reps",
+    "capacity", "price_member", "price_non_member",
+)
+EVENTS_API_DEFAULT_LIMIT = 50
+EVENTS_API_MAX_LIMIT = 100
+
+
+def _events_api_filters(request):
+    """Listing filters for the API; ?trainer= picks the trainer explicitly."""
+    filters = listing_filters(request)
+    trainer = request.GET.get("trainer")
+    if trainer:
+        try:
+            filters["trainer_id"] = int(trainer)
+        except ValueError:
+            pass
+    return filters, request.GET.get("q", "").strip()
+
+
+def _events_api_validators(request):
+    """
+    Return (etag, last_modified) of the listing the request would get.
+    Two aggregate queries; the result is kept on the request because the
+    ETag and Last-Modified checks both need it.
+    """
+    if not hasattr(request, "_events_api_validators"):
+        filters, search_query = _events_api_filters(request)
+        events = upcoming_events(filters, search_query).aggregate(
+            total=Count("id"),
+            booked=Sum("booked_count"),
+            updated=Max("updated_at"),
+        )
+        series = EventSeries.objects.filter(**filters).aggregate(
+            total=Count("id"),
+            updated=Max("updated_at"),
+        )
+        state = (
+            timezone.now().date(), sorted(filters.items()), search_query,
+            events["total"], events["booked"], events["updated"],
+            series["total"], series["updated"],
+        )
+        etag = hashlib.md5(repr(state).encode(), usedforsecurity=False).hexdigest()
+        last_modified = max(
+            (stamp for stamp in (events["updated"], series["updated"]) if stamp),
+            default=None,
+        )
+        request._events_api_validators = (etag, last_modified)
+    return request._events_api_validators
+
+
+def _occurrence_row(event):
+    """API row for an unsaved series occurrence."""
+    row = {field: getattr(event, field) for field in EVENTS_API_FIELDS}
+    row.update(booked=0, spots_left=event.capacity)
+    return row
+
+
+@require_GET
+@vary_on_cookie
+@condition(
+    etag_func=lambda request: _events_api_validators(request)[0],
+    last_modified_func=lambda request: _events_api_validators(request)[1],
+)
+def events_api(request):
+    """
+    Upcoming events as JSON, with the filters of the events page.
+    Unchanged listings are answered with 304 Not Modified before the
+    listing query runs.
+    """
+    filters, search_query = _events_api_filters(request)
+
+    try:
+        limit = int(request.GET.get("limit", EVENTS_API_DEFAULT_LIMIT))
+    except ValueError:
+        limit = EVENTS_API_DEFAULT_LIMIT
+    limit = min(max(limit, 1), EVENTS_API_MAX_LIMIT)
+
+    rows = upcoming_events(filters, search_query).values(
+        *EVENTS_API_FIELDS,
+        booked=F("booked_count"),
+        spots_left=Greatest(F("capacity") - F("booked_count"), 0),
     )
 
+    def virtual(start, end):
+        return [
+            _occurrence_row(event)
+            for event in series_occurrences(filters, search_query, start, end)
+        ]
+
+    events, next_cursor = keyset_page(rows, request.GET.get("cursor"), limit, virtual=virtual)
+    return JsonResponse({"events": events, "next_cursor": next_cursor})
+
+
+# -------------------------
+# CALENDAR FEEDS
+# -------------------------
+
+# How far ahead recurring series are expanded in calendar feeds
+CALENDAR_SERIES_HORIZON = timedelta(days=90)
+CALENDAR_CHUNK_SIZE = 500
+
+
+def _subquery_aggregate(queryset, group_by, **aggregate):
+    """Correlated subquery computing one aggregate over queryset, grouped by group_by."""
+    (name, expression), = aggregate.items()
+    return Subquery(queryset.order_by().values(group_by).annotate(**{name: expression}).values(name))
+
+
+def _calendar_validators(state):
+    """(etag, last_modified) for a feed from its aggregate state row."""
+    today = timezone.now().date()
+    etag = hashlib.md5(
+        repr((today, sorted(state.items()))).encode(), usedforsecurity=False
+    ).hexdigest()
+    stamps = [value for key, value in state.items() if key.endswith("_updated") and value]
+    return etag, max(stamps, default=None)
+
+
+def _trainer_calendar_state(request, trainer_id):
+    """
+    Everything the trainer feed depends on, in one query.
+    Raises Http404 for an unknown trainer.
+    """
+    if not hasattr(request, "_calendar_state"):
+        events = Event.objects.filter(
+            trainer=OuterRef("pk"), date__gte=timezone.now().date(), is_cancelled=False
+        )
+        series = EventSeries.objects.filter(trainer=OuterRef("pk"))
+        state = (TrainerProfile.objects
+                 .filter(pk=trainer_id)
+                 .annotate(
+                     events_total=_subquery_aggregate(events, "trainer", n=Count("pk")),
+                     events_updated=_subquery_aggregate(events, "trainer", m=Max("updated_at")),
+                     series_total=_subquery_aggregate(series, "trainer", n=Count("pk")),
+                     series_updated=_subquery_aggregate(series, "trainer", m=Max("updated_at")),
+                 )
+                 .values(
+                     "user__username", "user__first_name", "user__last_name",
+                     "events_total", "events_updated", "series_total", "series_updated",
+                 )
+                 .first())
+        if state is None:
+            raise Http404("Trainer not found")
+        request._calendar_state = state
+    return request._calendar_state
+
+
+def _client_calendar_state(request, token):
+    """
+    Everything the client feed depends on, in one query.
+    Changing a booking bumps the event's updated_at through its counter,
+    so the latest updated_at over all of the client's registrations moves too.
+    Raises Http404 for an unknown token.
+    """
+    if not hasattr(request, "_calendar_state"):
+        registrations = EventRegistration.objects.filter(
+            user=OuterRef("user_id"), event__date__gte=timezone.now().date()
+        )
+        state = (ClientProfile.objects
+                 .filter(calendar_token=token)
+                 .annotate(
+                     booked_total=_subquery_aggregate(
+                         registrations.filter(status="booked"), "user", n=Count("pk")
+                     ),
+                     events_updated=_subquery_aggregate(
+                         registrations, "user", m=Max("event__updated_at")
+                     ),
+                 )
+                 .values("user_id", "booked_total", "events_updated")
+                 .first())
+        if state is None:
+            raise Http404("Calendar not found")
+        request._calendar_state = state
+    return request._calendar_state
+
+
+def _calendar_row(event):
+    """Calendar row for an unsaved series occurrence."""
+    row = {field: getattr(event, field) for field in CALENDAR_FIELDS}
+    row["updated_at"] = event.series.updated_at
+    return row
+
+
+def _calendar_response(request, name, rows):
+    response = StreamingHttpResponse(
+        stream_calendar(
+            name,
+            rows,
+            event_url=lambda event_id: request.build_absolute_uri(
+                reverse("event_detail", args=[event_id])
+            ),
+        ),
+        content_type="text/calendar; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'inline; filename="events.ics"'
+    return response
+
+
+@require_GET
+@condition(
+    etag_func=lambda request, trainer_id: _calendar_validators(
+        _trainer_calendar_state(request, trainer_id))[0],
+    last_modified_func=lambda request, trainer_id: _calendar_validators(
+        _trainer_calendar_state(request, trainer_id))[1],
+)
+def trainer_calendar(request, trainer_id):
+    """Subscribable iCalendar feed of a trainer's upcoming events."""
+    today = timezone.now().date()
+    state = _trainer_calendar_state(request, trainer_id)
+
+    stored = (Event.objects
+              .filter(trainer_id=trainer_id, date__gte=today, is_cancelled=False)
+              .order_by(*KEYSET_ORDERING)
+              .values(*CALENDAR_FIELDS)
+              .iterator(chunk_size=CALENDAR_CHUNK_SIZE))
+
+    def occurrences():
+        series = EventSeries.objects.filter(trainer_id=trainer_id)
+        for event in series.virtual_occurrences(today, today + CALENDAR_SERIES_HORIZON):
+            yield _calendar_row(event)
+
+    full_name = f"{state['user__first_name']} {state['user__last_name']}".strip()
+    name = f"SinMancha – {full_name or state['user__username']}"
+    return _calendar_response(request, name, chain(stored, occurrences()))
+
+
+@require_GET
+@condition(
+    etag_func=lambda request, token: _calendar_validators(
+        _client_calendar_state(request, token))[0],
+    last_modified_func=lambda request, token: _calendar_validators(
+        _client_calendar_state(request, token))[1],
+)
+def client_calendar(request, token):
+    """
+    Subscribable iCalendar feed of a client's booked upcoming events.
+    The URL carries the client's secret calendar token instead of a login.
+    """
+    user_id = _client_calendar_state(request, token)["user_id"]
+
+    rows = (Event.objects
+            .filter(
+                registrations__user_id=user_id,
+                registrations__status="booked",
+                date__gte=timezone.now().date(),
+                is_cancelled=False,
+            )
+            .order_by(*KEYSET_ORDERING)
+            .values(*CALENDAR_FIELDS)
+            .iterator(chunk_size=CALENDAR_CHUNK_SIZE))
+    return _calendar_response(request, "SinMancha – My bookings", rows)
+
 
 # -------------------------
 # EXERCISE RECOMMENDATIONS API
@@ -442,9 +1187,16 @@ def get_exercise_recommendations(request):
                 status=400,
             )
 
-        plan = generate_exercise_plan(weight_kg, height_cm, goal)
+        profile = getattr(request.user, "client_profile", None)
+        level = profile.level if profile else None
+
+        # the plan JSON is pre-encoded; splice it into the response envelope
+        plan = exercise_plan_json(weight_kg, height_cm, goal, level)
 
-        return JsonResponse({"success": True, "data": plan})
+        return HttpResponse(
+            b'{"success": true, "data": ' + plan + b"}",
+            content_type="application/json",
+        )
 
     except (ValueError, KeyError, json.JSONDecodeError) as e:
         return JsonResponse(
@@ -459,7 +1211,137 @@ def get_exercise_recommendations(request):
         )
 
 
+# Seconds browsers and shared caches may reuse a plan lookup response
+EXERCISE_PLAN_MAX_AGE = 3600
+
+
+def _exercise_plan_lookup(request):
+    """
+    (query, body, etag) of the plan lookup the request asks for, where query
+    is the canonical parameters; (None, error, None) for invalid parameters.
+    Kept on the request because the ETag check and the view both need it.
+    """
+    if not hasattr(request, "_exercise_plan_lookup"):
+        try:
+            query = plan_query(request.GET)
+        except ValueError as e:
+            request._exercise_plan_lookup = (None, str(e), None)
+        else:
+            body, etag = cached_exercise_plan(**query)
+            request._exercise_plan_lookup = (query, body, etag)
+    return request._exercise_plan_lookup
+
+
+def _canonical_plan_etag(request):
+    query, _, etag = _exercise_plan_lookup(request)
+    if query and request.META.get("QUERY_STRING") == urlencode(format_plan_query(query)):
+        return etag
+    return None
+
+
+@require_GET
+@cache_control(public=True, max_age=EXERCISE_PLAN_MAX_AGE)
+@vary_on_headers("Accept-Encoding")
+@condition(etag_func=_canonical_plan_etag)
+def exercise_plan_api(request):
+    """
+    Cacheable GET variant of the exercise recommendations API. The response
+    is a function of the query alone (weight_kg, height_cm, goal, level), so
+    it is public; other query strings redirect to the canonical, bucketed one.
+    """
+    query, body, _ = _exercise_plan_lookup(request)
+    if query is None:
+        return JsonResponse({"success": False, "error": body}, status=400)
+    canonical = urlencode(format_plan_query(query))
+    if request.META.get("QUERY_STRING") != canonical:
+        return redirect(f"{request.path}?{canonical}")
+    return HttpResponse(body, content_type="application/json")
+
+
+@require_http_methods(["POST"])
+@login_required
+def batch_exercise_recommendations(request):
+    """
+    Recommendations for a batch of clients in one request, for trainers.
+    POST {"records": [{"weight_kg", "height_cm", "goal"?, "level"?}, ...]}, or
+    {"clients": "mine" or [client id, ...], "goal"?} for the trainer's clients
+    from their latest logged measurements; each result names its plan by
+    reference and each plan is sent once.
+    """
+    if not is_trainer(request.user):
+        return JsonResponse(
+            {"success": False, "error": "Only trainers can request batch recommendations."},
+            status=403,
+        )
+    try:
+        body = json.loads(request.body)
+        if isinstance(body, dict) and "clients" in body:
+            trainer = getattr(request.user, "trainer_profile", None)
+            clients, weights, heights, goals, levels = parse_client_batch(trainer, body)
+        else:
+            clients = None
+            weights, heights, goals, levels = parse_batch(body)
+    except (json.JSONDecodeError, BatchError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    data = batch_recommendations_json(weights, heights, goals, levels, clients)
+    return HttpResponse(
+        b'{"success": true, "data": ' + data + b"}",
+        content_type="application/json",
+    )
+
+
 @login_required
 def exercise_plan_page(request):
-    user_has_profile = getattr(request.user, "client_profile", None) is not None
-    return render(request, "exercise_plan.html", {"user_has_profile": user_has_profile})
+    profile = getattr(request.user, "client_profile", None)
+    metric = latest_metric(profile) if profile else None
+    return render(request, "exercise_plan.html", {
+        "user_has_profile": profile is not None,
+        "level": profile.level if profile else "",
+        # the page regenerates the plan from it without a form round trip
+        "latest_metric": metric and {
+            "weight_kg": float(metric.weight_kg),
+            "height_cm": float(metric.height_cm),
+            "date": metric.date.isoformat(),
+        },
+        "progress_ranges": list(PROGRESS_RANGES),
+    })
+
+
+@require_http_methods(["GET", "POST"])
+@login_required
+def body_metrics_api(request):
+    """
+    The client's body-metric progress: GET ?range= (1m, 3m, 1y or all) and
+    ?points= for a series downsampled to at most that many points. POST
+    {"weight_kg", "height_cm"?, "date"?} to log a day's measurements.
+    """
+    profile = getattr(request.user, "client_profile", None)
+    if profile is None:
+        return JsonResponse(
+            {"success": False, "error": "Only clients can log body metrics."}, status=403
+        )
+
+    if request.method == "POST":
+        try:
+            metric = log_metric(profile, *parse_metric(json.loads(request.body)))
+        except (json.JSONDecodeError, MetricError) as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=400)
+        return JsonResponse({"success": True, "data": {
+            "date": metric.date,
+            "weight_kg": float(metric.weight_kg),
+            "height_cm": float(metric.height_cm),
+        }})
+
+    range_name = request.GET.get("range", DEFAULT_PROGRESS_RANGE)
+    if range_name not in PROGRESS_RANGES:
+        return JsonResponse(
+            {"success": False, "error": f"range must be one of {', '.join(PROGRESS_RANGES)}."},
+            status=400,
+        )
+    try:
+        points = int(request.GET.get("points", DEFAULT_PROGRESS_POINTS))
+    except ValueError:
+        points = DEFAULT_PROGRESS_POINTS
+    points = min(max(points, 3), MAX_PROGRESS_POINTS)
+    return JsonResponse({"success": True, "data": progress(profile, range_name, points)})
@@ -0,0 +1,154 @@
+"""
+Payment gateways used to charge saved cards off-session (membership renewals).
+
+The gateway is chosen with the PAYMENT_GATEWAY setting, a dotted path to a
+PaymentGateway subclass. StripeGateway is the default; FakeGateway charges
+in-process and is meant for tests and benchmarks.
+"""
+import uuid
+from dataclasses import dataclass, field
+
+import stripe
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_GATEWAY = "payments.gateways.StripeGateway"
+
+# PaymentIntent statuses that may still succeed without another charge
+PENDING_INTENT_STATUSES = {"processing", "requires_action"}
+
+
+@dataclass(frozen=True)
+class ChargeRequest:
+    """One off-session charge."""
+    # Idempotency key: retrying the same key never charges twice
+    key: str
+    user_id: int
+    amount_cents: int
+    currency: str
+    description: str
+    # Gateway data saved with the user's last successful payment
+    billing: dict = field(default_factory=dict)
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ChargeResult:
+    """Outcome of a ChargeRequest."""
+    key: str
+    succeeded: bool
+    payment_intent_id: str
+    charge_id: str = ""
+    error: str = ""
+    # Not settled yet (e.g. processing); the outcome arrives by webhook
+    pending: bool = False
+
+
+class PaymentGateway:
+    """Interface of a payment gateway."""
+
+    def charge(self, requests):
+        """
+        Charge each of requests and return a ChargeResult for each, in order.
+        Declines are reported in the result, not raised.
+        """
+        raise NotImplementedError
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Charges the card saved on the user's Stripe customer.
+    Stripe has no batch charge API, so a batch is one PaymentIntent per request.
+    """
+
+    def charge(self, requests):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        return [self._charge_one(request) for request in requests]
+
+    def _charge_one(self, request):
+        customer = request.billing.get("stripe_customer_id")
+        if not customer:
+            return ChargeResult(
+                request.key, False, f"unbillable-{request.key}", error="No saved card."
+            )
+
+        try:
+            methods = stripe.PaymentMethod.list(customer=customer, type="card", limit=1)
+            if not methods.data:
+                return ChargeResult(
+                    request.key, False, f"unbillable-{request.key}", error="No saved card."
+                )
+            intent = stripe.PaymentIntent.create(
+                amount=request.amount_cents,
+                currency=request.currency,
+                customer=customer,
+                payment_method=methods.data[0].id,
+                off_session=True,
+                confirm=True,
+                description=request.description,
+                metadata={"user_id": str(request.user_id), **request.metadata},
+                idempotency_key=request.key,
+            )
+        except stripe.error.CardError as e:
+            intent = getattr(e.error, "payment_intent", None)
+            intent_id = intent["id"] if intent else f"declined-{request.key}"
+            return ChargeResult(request.key, False, intent_id, error=str(e.user_message or e))
+        except stripe.error.StripeError as e:
+            return ChargeResult(request.key, False, f"error-{request.key}", error=str(e))
+
+        return ChargeResult(
+            request.key,
+            intent.status == "succeeded",
+            intent.id,
+            charge_id=intent.get("latest_charge") or "",
+            error="" if intent.status == "succeeded" else f"Payment {intent.status}.",
+            pending=intent.status in PENDING_INTENT_STATUSES,
+        )
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process gateway for tests and benchmarks.
+    Users in decline_user_ids are declined and charges of users in
+    pending_user_ids are left processing. Like Stripe, a repeated key returns
+    the first result instead of charging again.
+    """
+
+    def __init__(self, decline_user_ids=(), pending_user_ids=()):
+        self.decline_user_ids = set(decline_user_ids)
+        self.pending_user_ids = set(pending_user_ids)
+        self.results = {}
+        self.charged_cents = 0
+        self.batches = 0
+
+    def charge(self, requests):
+        self.batches += 1
+        results = []
+        for request in requests:
+            if request.key not in self.results and request.user_id in self.pending_user_ids:
+                self.results[request.key] = ChargeResult(
+                    request.key,
+                    False,
+                    f"fake_pi_{uuid.uuid4().hex}",
+                    error="Payment processing.",
+                    pending=True,
+                )
+            elif request.key not in self.results:
+                succeeded = request.user_id not in self.decline_user_ids
+                if succeeded:
+                    self.charged_cents += request.amount_cents
+                self.results[request.key] = ChargeResult(
+                    request.key,
+                    succeeded,
+                    f"fake_pi_{uuid.uuid4().hex}",
+                    charge_id=f"fake_ch_{uuid.uuid4().hex}" if succeeded else "",
+                    error="" if succeeded else "Your card was declined.",
+                )
+            results.append(self.results[request.key])
+        return results
+
+
+def get_gateway():
+    """Return an instance of the gateway configured in settings.PAYMENT_GATEWAY."""
+    return import_string(getattr(settings, "PAYMENT_GATEWAY", DEFAULT_GATEWAY))()
@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from club.models import Membership, MembershipPlan
+from payments.gateways import FakeGateway
+from payments.renewals import renew_due_memberships
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure renewal throughput with the in-process fake gateway. "
+        "All benchmark data is created in a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--renewals",
+            type=int,
+            default=10000,
+            help="Number of due renewals to process (default: 10000).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of memberships claimed and charged per batch (default: 100).",
+        )
+        parser.add_argument(
+            "--decline-every",
+            type=int,
+            default=20,
+            help="Decline the card of every Nth user, 0 for none (default: 20).",
+        )
+
+    def handle(self, *args, **options):
+        count = max(options["renewals"], 1)
+        decline_every = max(options["decline_every"], 0)
+
+        with transaction.atomic():
+            users = self._create_due_memberships(count)
+            declined = users[::decline_every] if decline_every else []
+            gateway = FakeGateway(decline_user_ids=[user.pk for user in declined])
+
+            started = time.perf_counter()
+            stats = renew_due_memberships(gateway=gateway, batch_size=max(options["batch_size"], 1))
+            elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        rate = stats.claimed / elapsed if elapsed else float("inf")
+        self.stdout.write(
+            f"renewed: {stats.renewed}\nfailed: {stats.failed}\ngateway batches: {gateway.batches}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats.claimed} renewals in {elapsed:.3f}s ({rate:.0f} renewals/s)"
+        ))
+
+    def _create_due_memberships(self, count):
+        prefix = f"renew-bench-{int(time.time())}-"
+        today = timezone.now().date()
+        users = User.objects.bulk_create(
+            [User(username=f"{prefix}{i}") for i in range(count)]
+        )
+        plan = MembershipPlan.objects.create(
+            name="Benchmark plan", price=25, billing_interval="monthly"
+        )
+        Membership.objects.bulk_create([
+            Membership(
+                user=user,
+                plan=plan,
+                start_date=today - timedelta(days=28 + i % 3),
+                end_date=today + timedelta(days=2 - i % 3),
+                auto_renew=True,
+            )
+            for i, user in enumerate(users)
+        ])
+        return users
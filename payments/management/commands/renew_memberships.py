@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from club.models import Membership
+from payments.renewals import renew_due_memberships
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge and renew auto-renewing memberships that end soon. "
+        "Safe to run concurrently and repeatedly, e.g. daily from the Heroku scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=3,
+            help="Renew memberships ending within this many days (default: 3).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of memberships claimed and charged per batch (default: 100).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count due memberships without charging them.",
+        )
+
+    def handle(self, *args, **options):
+        window_days = max(options["window_days"], 0)
+
+        if options["dry_run"]:
+            due = Membership.objects.due_for_renewal(timezone.now().date(), window_days).count()
+            self.stdout.write(self.style.SUCCESS(f"{due} memberships due for renewal."))
+            return
+
+        stats = renew_due_memberships(
+            window_days=window_days,
+            batch_size=max(options["batch_size"], 1),
+        )
+        pending = f"{stats.pending} pending, " if stats.pending else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Claimed {stats.claimed} memberships: {stats.renewed} renewed, "
+            f"{pending}{stats.failed} failed."
+        ))
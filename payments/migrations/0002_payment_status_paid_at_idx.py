@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'paid_at'], name='payments_pa_status_bed4b8_idx'),
+        ),
+    ]
@@ -46,6 +46,8 @@ class Payment(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['stripe_payment_intent_id']),
+            # daily revenue rollup: succeeded payments by paid_at
+            models.Index(fields=['status', 'paid_at']),
         ]
     
     def __str__(self):
@@ -0,0 +1,248 @@
+"""
+Membership auto-renewal.
+
+Due memberships are claimed in batches with a conditional UPDATE, so two
+renewal runs never charge the same membership: a row is only claimed while it
+has no live claim, and the database serialises competing claims. Each claimed
+batch is charged through the configured gateway, then the successor
+memberships and payments are written with bulk_create in one transaction.
+"""
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from club.models import Membership
+
+from .gateways import ChargeRequest, get_gateway
+from .models import Payment
+from .utils import to_cents
+
+logger = logging.getLogger(__name__)
+
+RENEWAL_CURRENCY = "gbp"
+
+# A claim older than this is treated as abandoned (e.g. the run crashed)
+# and may be taken over; charges are idempotent per renewal and day
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+@dataclass
+class RenewalStats:
+    """Counts of one renewal run."""
+    claimed: int = 0
+    renewed: int = 0
+    pending: int = 0
+    failed: int = 0
+
+
+def _unclaimed(now):
+    return Q(renewal_claim__isnull=True) | Q(renewal_claimed_at__lt=now - CLAIM_TIMEOUT)
+
+
+def claim_batch(token, batch_size, day, window_days, after=None):
+    """
+    Claim up to batch_size due memberships for token, in (end_date, pk) order
+    and starting after the (end_date, pk) position after.
+
+    Returns (claimed, position): the memberships this run won, with their
+    plans, and the position of the last candidate. Candidates taken by a
+    concurrent run are skipped, so claimed may be shorter than the batch.
+    """
+    now = timezone.now()
+    # a renewal still being confirmed is settled by the webhook, not charged again
+    due = (Membership.objects
+           .due_for_renewal(day, window_days)
+           .exclude(pk__in=_pending_renewals()))
+    if after:
+        end_date, pk = after
+        due = due.filter(Q(end_date__gt=end_date) | Q(end_date=end_date, pk__gt=pk))
+    candidates = list(
+        due.filter(_unclaimed(now))
+        .order_by("end_date", "pk")
+        .values_list("end_date", "pk")[:batch_size]
+    )
+    if not candidates:
+        return [], None
+
+    ids = [pk for _, pk in candidates]
+    # only rows still unclaimed when the UPDATE runs are taken
+    (Membership.objects
+     .filter(_unclaimed(now), pk__in=ids)
+     .update(renewal_claim=token, renewal_claimed_at=now))
+    claimed = list(
+        Membership.objects
+        .filter(pk__in=ids, renewal_claim=token)
+        .select_related("plan")
+        .order_by("end_date", "pk")
+    )
+    return claimed, candidates[-1]
+
+
+def _pending_renewals():
+    """Ids of the memberships whose renewal payment is not settled yet."""
+    rows = (Payment.objects
+            .filter(status="pending", metadata__has_key="renewal_of")
+            .values_list("metadata", flat=True))
+    return {metadata["renewal_of"] for metadata in rows}
+
+
+def _billing_details(user_ids):
+    """
+    Gateway data of each user's latest successful payment that saved a
+    Stripe customer, by user id.
+    """
+    details = {}
+    rows = (Payment.objects
+            .filter(user_id__in=user_ids, status="succeeded",
+                    metadata__has_key="stripe_customer_id")
+            .order_by("user_id", "-created_at")
+            .values_list("user_id", "metadata"))
+    for user_id, metadata in rows:
+        if metadata.get("stripe_customer_id"):
+            details.setdefault(user_id, metadata)
+    return details
+
+
+def successor(membership):
+    """The unsaved membership renewing membership from the day after it ends."""
+    start_date = membership.end_date + timedelta(days=1)
+    return Membership(
+        user_id=membership.user_id,
+        plan=membership.plan,
+        start_date=start_date,
+        end_date=membership.plan.term_end(start_date),
+        auto_renew=True,
+        renewed_from=membership,
+    )
+
+
+def confirm_renewal(payment):
+    """
+    Create the successor of the membership a succeeded renewal payment paid
+    for, e.g. when a charge that was still processing succeeds later.
+    Returns the successor, or None if the renewed membership is gone.
+    """
+    membership = (Membership.objects
+                  .select_related("plan")
+                  .filter(pk=payment.metadata.get("renewal_of"))
+                  .first())
+    if membership is None:
+        return None
+    renewal = successor(membership)
+    renewal, _ = Membership.objects.get_or_create(
+        renewed_from=membership,
+        defaults={
+            "user_id": renewal.user_id,
+            "plan": renewal.plan,
+            "start_date": renewal.start_date,
+            "end_date": renewal.end_date,
+            "auto_renew": True,
+        },
+    )
+    return renewal
+
+
+def charge_batch(memberships, gateway, token, day):
+    """
+    Charge claimed memberships and write their renewals.
+    Returns (renewed, pending, failed); pending renewals are confirmed by webhook.
+    """
+    billing = _billing_details({membership.user_id for membership in memberships})
+    requests = [
+        ChargeRequest(
+            # one charge per membership and day, however often the run is retried
+            key=f"renewal-{membership.pk}-{day:%Y%m%d}",
+            user_id=membership.user_id,
+            amount_cents=to_cents(membership.plan.price),
+            currency=RENEWAL_CURRENCY,
+            description=f"Renewal: {membership.plan.name}",
+            billing=billing.get(membership.user_id, {}),
+            metadata={"renewal_of": str(membership.pk)},
+        )
+        for membership in memberships
+    ]
+    results = gateway.charge(requests)
+
+    paid_at = timezone.now()
+    payments = []
+    successors = []
+    pending = 0
+    for membership, request, result in zip(memberships, requests, results):
+        metadata = {"renewal_of": membership.pk, "error": result.error}
+        # later renewals bill the customer saved with this payment
+        if request.billing.get("stripe_customer_id"):
+            metadata["stripe_customer_id"] = request.billing["stripe_customer_id"]
+        if result.succeeded:
+            status = "succeeded"
+        elif result.pending:
+            status = "pending"
+        else:
+            status = "failed"
+        payments.append(Payment(
+            user_id=membership.user_id,
+            stripe_payment_intent_id=result.payment_intent_id,
+            stripe_charge_id=result.charge_id or None,
+            membership_plan=membership.plan,
+            amount_cents=request.amount_cents,
+            amount_currency=RENEWAL_CURRENCY.upper(),
+            status=status,
+            paid_at=paid_at if result.succeeded else None,
+            metadata=metadata,
+        ))
+        if result.succeeded:
+            successors.append(successor(membership))
+        elif result.pending:
+            pending += 1
+            logger.info("Renewal of membership %s is pending: %s", membership.pk, result.error)
+        else:
+            logger.warning(
+                "Renewal of membership %s failed: %s", membership.pk, result.error
+            )
+
+    with transaction.atomic():
+        # a retried charge returns the intent recorded by the earlier attempt
+        Payment.objects.bulk_create(payments, ignore_conflicts=True)
+        # renewed_from is unique, so a membership can never renew twice
+        Membership.objects.bulk_create(successors, ignore_conflicts=True)
+        (Membership.objects
+         .filter(pk__in=[membership.pk for membership in memberships], renewal_claim=token)
+         .update(renewal_claim=None, renewal_claimed_at=None))
+
+    return len(successors), pending, len(memberships) - len(successors) - pending
+
+
+def renew_due_memberships(gateway=None, day=None, window_days=3, batch_size=100):
+    """
+    Renew every auto-renewing membership ending within window_days of day.
+    Failed charges are retried by later runs while the membership is in the window;
+    pending ones are left to the payment webhook.
+    """
+    gateway = gateway or get_gateway()
+    day = day or timezone.now().date()
+    token = uuid.uuid4()
+    stats = RenewalStats()
+    position = None
+
+    while True:
+        # declined memberships stay due, so walk forward rather than re-query
+        batch, position = claim_batch(token, batch_size, day, window_days, after=position)
+        if position is None:
+            break
+        if not batch:
+            continue
+        stats.claimed += len(batch)
+        renewed, pending, failed = charge_batch(batch, gateway, token, day)
+        stats.renewed += renewed
+        stats.pending += pending
+        stats.failed += failed
+
+    logger.info(
+        "Renewal run: %d claimed, %d renewed, %d pending, %d failed",
+        stats.claimed, stats.renewed, stats.pending, stats.failed,
+    )
+    return stats
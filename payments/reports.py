@@ -0,0 +1,169 @@
+"""
+Monthly revenue report over Payment rows.
+
+Months are aggregated in the database: one grouped query (TruncMonth, plan,
+trainer, currency) with a conditional Sum/Count per status. Closed months are
+cached without expiry under a per-month version token. Saving or deleting a
+payment replaces the tokens of the months it touches, e.g. a late refund or a
+pending payment that succeeds. The current month is always recomputed.
+
+A payment belongs to the month it was paid in, or created in if it was never
+paid. Refunds are netted out of the month of the original payment.
+"""
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Payment
+
+_VERSION_KEY = "revenue_report:version:{month}"
+_MONTH_KEY = "revenue_report:month:{month}:{version}"
+
+# statuses that were paid at some point, and so count towards gross revenue
+PAID_STATUSES = ("succeeded", "refunded")
+AMOUNT_FIELDS = ("gross_cents", "refunded_cents", "net_cents")
+COUNT_FIELDS = ("succeeded", "refunded", "failed", "pending")
+
+
+def month_start(day):
+    """First day of the month of day."""
+    return day.replace(day=1)
+
+
+def next_month(month):
+    """First day of the month after month."""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def recent_months(count, until=None):
+    """The count months up to the month of until (default today), oldest first."""
+    month = month_start(until or timezone.now().date())
+    months = [month]
+    for _ in range(count - 1):
+        month = month_start(month - timedelta(days=1))
+        months.append(month)
+    return months[::-1]
+
+
+def _bounds(first, last):
+    """Aware datetimes from the start of month first to the end of month last."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(first, time.min, tzinfo=tz),
+        datetime.combine(next_month(last), time.min, tzinfo=tz),
+    )
+
+
+def payment_months(payment):
+    """Months whose report payment can appear in: its creation and payment month."""
+    stamps = [payment.created_at, payment.paid_at]
+    return {month_start(timezone.localtime(stamp).date()) for stamp in stamps if stamp}
+
+
+def _version_keys(months):
+    return {month: _VERSION_KEY.format(month=f"{month:%Y-%m}") for month in months}
+
+
+def _month_versions(months):
+    """Current version token of each month, creating missing ones."""
+    keys = _version_keys(months)
+    found = cache.get_many(keys.values())
+    missing = {key: uuid.uuid4().hex for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {month: found[key] for month, key in keys.items()}
+
+
+def invalidate_months(months):
+    """Drop the cached report of each of months."""
+    cache.set_many({key: uuid.uuid4().hex for key in _version_keys(months).values()}, None)
+
+
+def compute_months(first, last):
+    """
+    Report rows of the months first to last, aggregated in one query.
+    Returns {month: [row, ...]}; months without payments are absent.
+    """
+    since, until = _bounds(first, last)
+    paid = Q(status__in=PAID_STATUSES)
+    rows = (Payment.objects
+            .filter(
+                Q(paid_at__gte=since, paid_at__lt=until)
+                | Q(paid_at__isnull=True, created_at__gte=since, created_at__lt=until)
+            )
+            .annotate(month=TruncMonth(Coalesce("paid_at", "created_at")))
+            .values(
+                "month",
+                "amount_currency",
+                plan_id=F("membership_plan"),
+                plan=F("membership_plan__name"),
+                trainer_id=F("membership_plan__trainer"),
+                trainer=F("membership_plan__trainer__user__username"),
+            )
+            .annotate(
+                gross_cents=Coalesce(Sum("amount_cents", filter=paid), 0),
+                refunded_cents=Coalesce(Sum("amount_cents", filter=Q(status="refunded")), 0),
+                **{status: Count("pk", filter=Q(status=status)) for status in COUNT_FIELDS},
+            )
+            .annotate(net_cents=F("gross_cents") - F("refunded_cents"))
+            .order_by("month", "amount_currency", "plan", "plan_id"))
+
+    months = {}
+    for row in rows:
+        month = row.pop("month")
+        # TruncMonth gives a datetime for a DateTimeField
+        month = month_start(timezone.localtime(month).date() if isinstance(month, datetime) else month)
+        row["currency"] = row.pop("amount_currency").upper()
+        months.setdefault(month, []).append(row)
+    return months
+
+
+def revenue_report(months):
+    """
+    Report of each of months (first days of months, oldest first), as a list
+    of {"month", "closed", "rows", "totals"} dicts. Closed months come from
+    the cache when possible; everything missing is computed in one query.
+    """
+    current = month_start(timezone.now().date())
+    closed = [month for month in months if month < current]
+    versions = _month_versions(closed)
+    keys = {month: _MONTH_KEY.format(month=f"{month:%Y-%m}", version=versions[month]) for month in closed}
+    cached = cache.get_many(keys.values())
+
+    rows = {month: cached[keys[month]] for month in closed if keys[month] in cached}
+    missing = [month for month in months if month not in rows]
+    if missing:
+        computed = compute_months(min(missing), max(missing))
+        for month in missing:
+            rows[month] = computed.get(month, [])
+        cache.set_many(
+            {keys[month]: rows[month] for month in missing if month in keys},
+            None,
+        )
+
+    return [
+        {
+            "month": month,
+            "closed": month < current,
+            "rows": rows[month],
+            "totals": revenue_totals(rows[month]),
+        }
+        for month in months
+    ]
+
+
+def revenue_totals(rows):
+    """Amounts and counts of rows summed per currency."""
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(
+            row["currency"], dict.fromkeys(AMOUNT_FIELDS + COUNT_FIELDS, 0)
+        )
+        for field in AMOUNT_FIELDS + COUNT_FIELDS:
+            total[field] += row[field]
+    return totals
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Payment
+from .reports import invalidate_months, payment_months
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_revenue_report(sender, instance, **kwargs):
+    # a refund or late success changes the report of a month already closed
+    invalidate_months(payment_months(instance))
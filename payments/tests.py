@@ -215,3 +215,328 @@ class PaymentSecurityTestCase(TestCase):
         
         # Membership should be linked to correct user
         self.assertEqual(payment.user, self.user1)
+
+
+class RenewalEngineTestCase(TestCase):
+    """Test the membership auto-renewal engine"""
+
+    def setUp(self):
+        """Create test data"""
+        from datetime import timedelta
+
+        self.today = timezone.now().date()
+        self.plan = MembershipPlan.objects.create(
+            name='Monthly', price=29.99, billing_interval='monthly'
+        )
+        self.users = [
+            User.objects.create_user(username=f'client{i}', password='testpass123')
+            for i in range(3)
+        ]
+        self.due = [
+            Membership.objects.create(
+                user=user,
+                plan=self.plan,
+                start_date=self.today - timedelta(days=29),
+                end_date=self.today + timedelta(days=1),
+                auto_renew=True,
+            )
+            for user in self.users
+        ]
+
+    def _renew(self, gateway, **kwargs):
+        from payments.renewals import renew_due_memberships
+
+        return renew_due_memberships(gateway=gateway, day=self.today, **kwargs)
+
+    def test_due_memberships_are_charged_and_renewed(self):
+        """Successors start the day after the old membership ends"""
+        from datetime import timedelta
+        from payments.gateways import FakeGateway
+
+        gateway = FakeGateway(decline_user_ids=[self.users[2].pk])
+        stats = self._renew(gateway, batch_size=2)
+
+        self.assertEqual((stats.claimed, stats.renewed, stats.failed), (3, 2, 1))
+        self.assertEqual(gateway.batches, 2)
+        self.assertEqual(gateway.charged_cents, 2 * 2999)
+        for membership in self.due[:2]:
+            renewal = membership.renewal
+            self.assertEqual(renewal.start_date, membership.end_date + timedelta(days=1))
+            self.assertEqual(renewal.end_date, renewal.start_date + timedelta(days=30))
+            self.assertTrue(renewal.auto_renew)
+        self.assertFalse(Membership.objects.filter(renewed_from=self.due[2]).exists())
+        self.assertEqual(
+            sorted(Payment.objects.values_list('status', flat=True)),
+            ['failed', 'succeeded', 'succeeded'],
+        )
+        self.assertFalse(Membership.objects.filter(renewal_claim__isnull=False).exists())
+
+    def test_second_run_charges_nothing_new(self):
+        """Renewed memberships are not due; declined ones reuse the same charge key"""
+        from payments.gateways import FakeGateway
+
+        gateway = FakeGateway(decline_user_ids=[self.users[2].pk])
+        self._renew(gateway)
+        stats = self._renew(gateway)
+
+        self.assertEqual((stats.claimed, stats.renewed), (1, 0))
+        self.assertEqual(gateway.charged_cents, 2 * 2999)
+        self.assertEqual(Payment.objects.count(), 3)
+
+    def test_concurrent_run_cannot_claim_a_batch_being_charged(self):
+        """A run started while another is charging finds nothing to claim"""
+        from payments.gateways import FakeGateway
+
+        engine = self
+
+        class InterleavingGateway(FakeGateway):
+            def charge(self, requests):
+                self.concurrent = engine._renew(FakeGateway())
+                return super().charge(requests)
+
+        gateway = InterleavingGateway()
+        stats = self._renew(gateway)
+
+        self.assertEqual(stats.renewed, 3)
+        self.assertEqual(gateway.concurrent.claimed, 0)
+        self.assertEqual(Membership.objects.filter(renewed_from__isnull=False).count(), 3)
+
+    def test_abandoned_claim_is_taken_over(self):
+        """A claim left by a crashed run expires"""
+        import uuid
+        from datetime import timedelta
+        from payments.gateways import FakeGateway
+        from payments.renewals import CLAIM_TIMEOUT
+
+        Membership.objects.filter(pk=self.due[0].pk).update(
+            renewal_claim=uuid.uuid4(), renewal_claimed_at=timezone.now() - timedelta(minutes=1)
+        )
+        Membership.objects.filter(pk=self.due[1].pk).update(
+            renewal_claim=uuid.uuid4(), renewal_claimed_at=timezone.now() - CLAIM_TIMEOUT * 2
+        )
+        stats = self._renew(FakeGateway())
+
+        self.assertEqual(stats.renewed, 2)
+        self.assertFalse(Membership.objects.filter(renewed_from=self.due[0]).exists())
+
+    def test_only_due_memberships_are_renewed(self):
+        """Manual, distant, inactive-plan and cancelled memberships are skipped"""
+        from datetime import timedelta
+        from payments.gateways import FakeGateway
+
+        Membership.objects.filter(pk=self.due[0].pk).update(auto_renew=False)
+        Membership.objects.filter(pk=self.due[1].pk).update(end_date=self.today + timedelta(days=10))
+        Membership.objects.filter(pk=self.due[2].pk).update(status='cancelled')
+
+        self.assertEqual(self._renew(FakeGateway()).claimed, 0)
+
+    def test_renewal_webhook_does_not_create_another_membership(self):
+        """payment_intent.succeeded for a renewal leaves memberships alone"""
+        from payments.gateways import FakeGateway
+        from payments.views import _handle_payment_succeeded
+
+        self._renew(FakeGateway())
+        payment = Payment.objects.filter(status='succeeded').first()
+        _handle_payment_succeeded({'id': payment.stripe_payment_intent_id})
+        self.assertEqual(Membership.objects.filter(user=payment.user).count(), 2)
+
+    def test_consecutive_renewals_bill_the_saved_customer(self):
+        """A renewal keeps the Stripe customer, so the next renewal can charge it too"""
+        from datetime import timedelta
+        from payments.gateways import ChargeResult, FakeGateway
+
+        class CustomerGateway(FakeGateway):
+            """Declines requests without a saved customer, like StripeGateway"""
+
+            def charge(self, requests):
+                self.customers = [request.billing.get('stripe_customer_id') for request in requests]
+                unbillable = {request.key for request in requests if not request.billing.get('stripe_customer_id')}
+                return [
+                    ChargeResult(result.key, False, result.payment_intent_id, error='No saved card.')
+                    if result.key in unbillable else result
+                    for result in super().charge(requests)
+                ]
+
+        for user in self.users:
+            Payment.objects.create(
+                user=user,
+                stripe_payment_intent_id=f'pi_checkout_{user.pk}',
+                membership_plan=self.plan,
+                amount_cents=2999,
+                status='succeeded',
+                paid_at=timezone.now() - timedelta(days=29),
+                metadata={'stripe_customer_id': f'cus_{user.pk}'},
+            )
+
+        gateway = CustomerGateway()
+        self.assertEqual(self._renew(gateway).renewed, 3)
+
+        renewal = Membership.objects.get(renewed_from=self.due[0])
+        self.assertEqual(
+            Payment.objects.get(metadata__renewal_of=self.due[0].pk).metadata['stripe_customer_id'],
+            f'cus_{self.users[0].pk}',
+        )
+        self.today = renewal.end_date - timedelta(days=1)
+        stats = self._renew(gateway)
+
+        self.assertEqual((stats.renewed, stats.failed), (3, 0))
+        self.assertEqual(sorted(gateway.customers), sorted(f'cus_{user.pk}' for user in self.users))
+        self.assertTrue(Membership.objects.filter(renewed_from=renewal).exists())
+
+    def test_processing_renewal_is_confirmed_by_webhook(self):
+        """A charge still processing is pending, not retried, and renews on success"""
+        from datetime import timedelta
+        from payments.gateways import FakeGateway
+        from payments.views import _handle_payment_succeeded
+
+        gateway = FakeGateway(pending_user_ids=[self.users[0].pk])
+        stats = self._renew(gateway)
+
+        self.assertEqual((stats.renewed, stats.pending, stats.failed), (2, 1, 0))
+        payment = Payment.objects.get(user=self.users[0])
+        self.assertEqual(payment.status, 'pending')
+        self.assertFalse(Membership.objects.filter(renewed_from=self.due[0]).exists())
+        self.assertEqual(self._renew(FakeGateway()).claimed, 0)
+
+        _handle_payment_succeeded({'id': payment.stripe_payment_intent_id})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'succeeded')
+        renewal = Membership.objects.get(renewed_from=self.due[0])
+        self.assertEqual(renewal.user, self.users[0])
+        self.assertEqual(renewal.start_date, self.due[0].end_date + timedelta(days=1))
+
+    def test_command_uses_configured_gateway(self):
+        """renew_memberships runs with the PAYMENT_GATEWAY setting"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        out = StringIO()
+        with override_settings(PAYMENT_GATEWAY='payments.gateways.FakeGateway'):
+            call_command('renew_memberships', '--dry-run', stdout=out)
+            call_command('renew_memberships', stdout=out)
+        self.assertIn('3 memberships due for renewal.', out.getvalue())
+        self.assertIn('Claimed 3 memberships: 3 renewed, 0 failed.', out.getvalue())
+
+
+class RevenueReportTestCase(TestCase):
+    """Test the monthly revenue report"""
+
+    def setUp(self):
+        """Create test data"""
+        from datetime import datetime, timedelta
+        from django.core.cache import cache
+        from club.models import TrainerProfile
+        from .reports import month_start
+
+        cache.clear()
+        self.this_month = month_start(timezone.now().date())
+        self.last_month = month_start(self.this_month - timedelta(days=1))
+        last_month_at = timezone.make_aware(datetime.combine(self.last_month.replace(day=15), datetime.min.time()))
+
+        coach = User.objects.create_user(username='coach', password='testpass123')
+        self.trainer = TrainerProfile.objects.create(user=coach)
+        self.plan = MembershipPlan.objects.create(
+            trainer=self.trainer, name='Monthly', price=10, billing_interval='monthly'
+        )
+        self.house_plan = MembershipPlan.objects.create(name='Club', price=5)
+        self.user = User.objects.create_user(username='client', password='testpass123')
+
+        def payment(intent, plan, cents, status, paid_at=None, currency='GBP'):
+            return Payment.objects.create(
+                user=self.user, stripe_payment_intent_id=intent, membership_plan=plan,
+                amount_cents=cents, amount_currency=currency, status=status, paid_at=paid_at,
+            )
+
+        payment('pi_1', self.plan, 1000, 'succeeded', last_month_at)
+        self.late_refund = payment('pi_2', self.plan, 1000, 'succeeded', last_month_at)
+        payment('pi_3', self.plan, 500, 'refunded', last_month_at)
+        failed = payment('pi_4', self.plan, 1000, 'failed')
+        Payment.objects.filter(pk=failed.pk).update(created_at=last_month_at)
+        payment('pi_5', self.house_plan, 500, 'succeeded', timezone.now())
+        payment('pi_6', self.plan, 2000, 'succeeded', timezone.now(), currency='usd')
+
+    def _report(self):
+        from .reports import revenue_report
+        return {month['month']: month for month in revenue_report([self.last_month, self.this_month])}
+
+    def test_monthly_rollup_nets_refunds(self):
+        """Rows are grouped by plan, trainer and currency with refunds netted out"""
+        report = self._report()
+
+        last = report[self.last_month]
+        self.assertTrue(last['closed'])
+        self.assertEqual(len(last['rows']), 1)
+        row = last['rows'][0]
+        self.assertEqual(
+            (row['plan'], row['trainer'], row['currency']), ('Monthly', 'coach', 'GBP')
+        )
+        self.assertEqual(
+            (row['gross_cents'], row['refunded_cents'], row['net_cents']), (2500, 500, 2000)
+        )
+        self.assertEqual(
+            (row['succeeded'], row['refunded'], row['failed'], row['pending']), (2, 1, 1, 0)
+        )
+
+        current = report[self.this_month]
+        self.assertFalse(current['closed'])
+        self.assertEqual(
+            {currency: total['net_cents'] for currency, total in current['totals'].items()},
+            {'GBP': 500, 'USD': 2000},
+        )
+
+    def test_closed_months_are_cached(self):
+        """Only the current month is recomputed once closed months are cached"""
+        from .reports import compute_months
+
+        self._report()
+        with self.assertNumQueries(1):
+            report = self._report()
+        self.assertEqual(report[self.last_month]['totals']['GBP']['net_cents'], 2000)
+        self.assertEqual(compute_months(self.last_month, self.last_month)[self.last_month],
+                         report[self.last_month]['rows'])
+
+    def test_late_refund_updates_closed_month(self):
+        """Saving a payment drops the cached report of its month"""
+        self._report()
+        self.late_refund.status = 'refunded'
+        self.late_refund.save()
+
+        total = self._report()[self.last_month]['totals']['GBP']
+        self.assertEqual((total['refunded_cents'], total['net_cents']), (1500, 1000))
+
+    def test_json_endpoint(self):
+        """Staff get the report as JSON, optionally for one trainer"""
+        url = reverse('payments:revenue_report_api')
+        client = Client()
+        client.login(username='client', password='testpass123')
+        self.assertEqual(client.get(url, secure=True).status_code, 302)
+
+        User.objects.create_user(username='boss', password='testpass123', is_staff=True)
+        client.login(username='boss', password='testpass123')
+        data = client.get(url, {'months': 2, 'trainer': self.trainer.pk}, secure=True).json()
+
+        self.assertEqual(
+            [month['month'] for month in data['months']],
+            [f'{self.last_month:%Y-%m}', f'{self.this_month:%Y-%m}'],
+        )
+        self.assertEqual(data['months'][1]['totals'], {'USD': {
+            'gross_cents': 2000, 'refunded_cents': 0, 'net_cents': 2000,
+            'succeeded': 1, 'refunded': 0, 'failed': 0, 'pending': 0,
+        }})
+
+    def test_html_report(self):
+        """The HTML report lists each month, newest first"""
+        from django.test import override_settings
+
+        User.objects.create_user(username='boss', password='testpass123', is_staff=True)
+        client = Client()
+        client.login(username='boss', password='testpass123')
+        with override_settings(STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }):
+            response = client.get(reverse('payments:revenue_report'), {'months': 2}, secure=True)
+
+        self.assertContains(response, '20.00')
+        self.assertContains(response, f'{self.this_month:%B %Y} (to date)')
@@ -9,4 +9,6 @@ urlpatterns = [
     path("success/", views.payment_success, name="payment_success"),
     path("cancel/", views.payment_cancel, name="payment_cancel"),
     path("webhook/", views.webhook, name="stripe_webhook"),
+    path("reports/revenue/", views.revenue_report_view, name="revenue_report"),
+    path("api/reports/revenue/", views.revenue_report_api, name="revenue_report_api"),
 ]
\ No newline at end of file
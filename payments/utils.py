@@ -0,0 +1,9 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def to_cents(amount) -> int:
+    """
+    Convert Decimal/float/string pounds to integer pennies (or cents).
+    """
+    dec = Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return int(dec * 100)
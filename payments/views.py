@@ -1,10 +1,10 @@
 # payments/views.py
 
-from decimal import Decimal, ROUND_HALF_UP
 import stripe
 
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -15,14 +15,9 @@ from django.views.decorators.csrf import csrf_exempt
 
 from club.models import MembershipPlan, Membership
 from .models import Payment
-
-
-def _to_cents(amount) -> int:
-    """
-    Convert Decimal/float/string pounds to integer pennies (or cents).
-    """
-    dec = Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    return int(dec * 100)
+from .reports import recent_months, revenue_report, revenue_totals
+from .renewals import confirm_renewal
+from .utils import to_cents
 
 
 @login_required
@@ -50,11 +45,11 @@ def create_checkout_session(request, plan_id):
             messages.error(request, "You can only buy plans from your trainer.")
             return redirect("membership_plans")
 
-    if getattr(profile, "has_active_membership", False):
+    if request.membership:
         messages.error(request, "You already have an active membership.")
         return redirect("membership_plans")
 
-    amount_cents = _to_cents(plan.price)
+    amount_cents = to_cents(plan.price)
 
     success_url = request.build_absolute_uri(
         reverse("payments:payment_success")
@@ -69,6 +64,9 @@ def create_checkout_session(request, plan_id):
         session = stripe.checkout.Session.create(
             mode="payment",
             payment_method_types=["card"],
+            # keep the card on a Stripe customer so auto-renewals can charge it
+            customer_creation="always",
+            payment_intent_data={"setup_future_usage": "off_session"},
             line_items=[
                 {
                     "price_data": {
@@ -142,9 +140,10 @@ def payment_success(request):
         defaults={
             "user": request.user,
             "membership_plan": plan,
-            "amount_cents": _to_cents(plan.price),
+            "amount_cents": to_cents(plan.price),
             "status": "succeeded",
             "paid_at": timezone.now(),
+            "metadata": {"stripe_customer_id": session.get("customer") or ""},
         },
     )
 
@@ -213,7 +212,10 @@ def _handle_payment_succeeded(intent):
         payment.paid_at = payment.paid_at or timezone.now()
         payment.save()
 
-    if payment.membership_plan:
+    # a renewal that was still processing when charged gets its successor now
+    if payment.metadata.get("renewal_of"):
+        confirm_renewal(payment)
+    elif payment.membership_plan:
         Membership.objects.get_or_create(
             user=payment.user,
             plan=payment.membership_plan,
@@ -247,4 +249,64 @@ def _handle_charge_refunded(charge):
         return
 
     payment.status = "refunded"
-    payment.save()
\ No newline at end of file
+    payment.save()
+
+# -------------------------
+# REVENUE REPORT
+# -------------------------
+
+REPORT_DEFAULT_MONTHS = 12
+REPORT_MAX_MONTHS = 36
+
+
+def _report_params(request):
+    """(months, trainer_id) asked for by ?months= and ?trainer=."""
+    try:
+        count = int(request.GET.get("months", REPORT_DEFAULT_MONTHS))
+    except ValueError:
+        count = REPORT_DEFAULT_MONTHS
+    count = min(max(count, 1), REPORT_MAX_MONTHS)
+    try:
+        trainer_id = int(request.GET["trainer"])
+    except (KeyError, ValueError):
+        trainer_id = None
+    return recent_months(count), trainer_id
+
+
+def _report(request):
+    months, trainer_id = _report_params(request)
+    report = revenue_report(months)
+    if trainer_id is not None:
+        # cached months hold every trainer, so narrow them here
+        for month in report:
+            month["rows"] = [row for row in month["rows"] if row["trainer_id"] == trainer_id]
+            month["totals"] = revenue_totals(month["rows"])
+    return report, trainer_id
+
+
+@staff_member_required
+def revenue_report_view(request):
+    report, trainer_id = _report(request)
+    return render(request, "payments/revenue_report.html", {
+        # newest month first
+        "report": report[::-1],
+        "trainer_id": trainer_id,
+        "months": len(report),
+    })
+
+
+@staff_member_required
+def revenue_report_api(request):
+    report, trainer_id = _report(request)
+    return JsonResponse({
+        "trainer": trainer_id,
+        "months": [
+            {
+                "month": f"{month['month']:%Y-%m}",
+                "closed": month["closed"],
+                "totals": month["totals"],
+                "rows": month["rows"],
+            }
+            for month in report
+        ],
+    })
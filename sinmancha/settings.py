@@ -87,6 +87,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "club.middleware.MembershipMiddleware",  # request.membership
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -178,6 +179,39 @@ STORAGES = {
 }
 
 
+# ==============================
+# CACHES
+# ==============================
+
+# Gunicorn workers only share cache invalidations through a shared backend,
+# so use Redis when REDIS_URL is set (Heroku Redis) and local memory otherwise.
+redis_url = os.environ.get("REDIS_URL", "")
+if redis_url:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": redis_url,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a cached page of a trainer's events feed may be served
+EVENTS_FEED_CACHE_TIMEOUT = int(os.environ.get("EVENTS_FEED_CACHE_TIMEOUT", "60"))
+
+# JSON catalog of exercise plans; edits are picked up without a restart
+EXERCISE_PLAN_CATALOG = os.environ.get(
+    "EXERCISE_PLAN_CATALOG", str(BASE_DIR / "club" / "data" / "exercise_plans.json")
+)
+
+# Plan lookups kept in each server process's LRU cache
+EXERCISE_PLAN_CACHE_SIZE = int(os.environ.get("EXERCISE_PLAN_CACHE_SIZE", "4096"))
+
+
 # ==============================
 # DEFAULT PK FIELD
 # ==============================
@@ -201,6 +235,9 @@ STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLIC_KEY = os.environ.get("STRIPE_PUBLIC_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 
+# Gateway used for off-session charges such as membership renewals
+PAYMENT_GATEWAY = os.environ.get("PAYMENT_GATEWAY", "payments.gateways.StripeGateway")
+
 # Provide a sane default email backend so account creation doesn't crash
 EMAIL_BACKEND = os.environ.get(
     "EMAIL_BACKEND",
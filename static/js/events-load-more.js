@@ -0,0 +1,47 @@
+/**
+ * Events "Load more" Component
+ * Fetches the next page of event cards as an HTML fragment and appends it
+ * to the grid. Without JavaScript the link still loads the next page normally.
+ */
+
+document.addEventListener('click', function(e) {
+  const link = e.target.closest('[data-load-more]');
+  if (!link) {
+    return;
+  }
+
+  const grid = document.getElementById('eventsGrid');
+  if (!grid) {
+    return;
+  }
+
+  e.preventDefault();
+  link.classList.add('loading');
+
+  const url = new URL(link.href, window.location.href);
+  url.searchParams.set('fragment', '1');
+
+  fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      return response.text();
+    })
+    .then(html => {
+      const fragment = new DOMParser().parseFromString(html, 'text/html');
+      fragment.querySelectorAll('.event-card').forEach(card => grid.appendChild(card));
+
+      const current = link.closest('.events-load-more');
+      const next = fragment.querySelector('.events-load-more');
+      if (next) {
+        current.replaceWith(next);
+      } else {
+        current.remove();
+      }
+    })
+    .catch(() => {
+      // fall back to a full page load
+      window.location.href = link.href;
+    });
+});
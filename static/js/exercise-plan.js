@@ -7,27 +7,55 @@
 document.getElementById('metricsForm').addEventListener('submit', async function(e) {
   e.preventDefault();
   
-  const weight = document.getElementById('weight').value;
-  const height = document.getElementById('height').value;
+  const weight = parseFloat(document.getElementById('weight').value);
+  const height = parseFloat(document.getElementById('height').value);
   const goal = document.getElementById('goal').value;
   
+  // Clients keep a history of their metrics; log before generating the plan
+  if (window.bodyMetricsApiUrl) {
+    await logMetric(weight, height);
+  }
+  await generatePlan(weight, height, goal);
+});
+
+// Regenerate the plan from the latest logged metrics without a form round trip
+const latestMetric = JSON.parse(document.getElementById('latestMetric').textContent);
+if (latestMetric) {
+  document.getElementById('weight').value = latestMetric.weight_kg;
+  document.getElementById('height').value = latestMetric.height_cm;
+  generatePlan(latestMetric.weight_kg, latestMetric.height_cm, document.getElementById('goal').value);
+}
+
+if (window.bodyMetricsApiUrl) {
+  document.querySelectorAll('.progress-range').forEach(button => {
+    button.addEventListener('click', () => loadProgress(button.dataset.range));
+  });
+  loadProgress('3m');
+}
+
+/**
+ * Fetch and display an exercise plan
+ * @param {number} weight - Weight in kilograms
+ * @param {number} height - Height in centimeters
+ * @param {string} goal - Fitness goal
+ */
+async function generatePlan(weight, height, goal) {
   // Show loading state and hide previous results
   document.getElementById('resultsSection').style.display = 'none';
   document.getElementById('errorState').style.display = 'none';
   document.getElementById('loadingState').style.display = 'flex';
   
   try {
-    const response = await fetch(window.exercisePlanApiUrl, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
-      },
-      body: JSON.stringify({
-        weight_kg: parseFloat(weight),
-        height_cm: parseFloat(height),
-        goal: goal,
-      })
+    // GET so the browser (and any shared cache) can reuse the response;
+    // the server redirects to its canonical, bucketed URL
+    const params = new URLSearchParams({
+      weight_kg: weight,
+      height_cm: height,
+      goal: goal,
+      level: window.exercisePlanLevel || '',
+    });
+    const response = await fetch(`${window.exercisePlanApiUrl}?${params}`, {
+      headers: { 'Accept': 'application/json' },
     });
     
     const result = await response.json();
@@ -43,7 +71,70 @@ document.getElementById('metricsForm').addEventListener('submit', async function
   } finally {
     document.getElementById('loadingState').style.display = 'none';
   }
-});
+}
+
+/**
+ * Log today's weight and height to the client's body-metric history
+ * @param {number} weight - Weight in kilograms
+ * @param {number} height - Height in centimeters
+ */
+async function logMetric(weight, height) {
+  try {
+    const response = await fetch(window.bodyMetricsApiUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+      },
+      body: JSON.stringify({ weight_kg: weight, height_cm: height }),
+    });
+    if (response.ok) {
+      loadProgress(document.querySelector('.progress-range.active')?.dataset.range || '3m');
+    }
+  } catch (error) {
+    // the plan does not depend on the history being saved
+    console.error(error);
+  }
+}
+
+/**
+ * Draw the client's downsampled weight series for a range
+ * @param {string} range - One of the progress ranges (1m, 3m, 1y, all)
+ */
+async function loadProgress(range) {
+  document.querySelectorAll('.progress-range').forEach(button => {
+    button.classList.toggle('active', button.dataset.range === range);
+  });
+  
+  const response = await fetch(`${window.bodyMetricsApiUrl}?${new URLSearchParams({ range: range, points: 300 })}`);
+  const result = await response.json();
+  if (!result.success) {
+    return;
+  }
+  
+  const series = result.data.series;
+  const line = document.getElementById('progressLine');
+  const summary = document.getElementById('progressSummary');
+  if (series.length === 0) {
+    line.setAttribute('points', '');
+    summary.textContent = 'No weights logged in this range yet.';
+    return;
+  }
+  
+  // Scale dates and weights into the 300 x 120 chart
+  const times = series.map(point => Date.parse(point.date));
+  const weights = series.map(point => point.weight_kg);
+  const [minTime, maxTime] = [Math.min(...times), Math.max(...times)];
+  const [minWeight, maxWeight] = [Math.min(...weights), Math.max(...weights)];
+  line.setAttribute('points', series.map((point, i) => {
+    const x = maxTime > minTime ? (times[i] - minTime) / (maxTime - minTime) * 300 : 150;
+    const y = maxWeight > minWeight ? 110 - (weights[i] - minWeight) / (maxWeight - minWeight) * 100 : 60;
+    return `${x.toFixed(1)},${y.toFixed(1)}`;
+  }).join(' '));
+  
+  const latest = result.data.latest;
+  summary.textContent = `${result.data.count} days logged. Latest: ${latest.weight_kg} kg (BMI ${latest.bmi}) on ${latest.date}.`;
+}
 
 /**
  * Display the exercise plan data formatted with HTML